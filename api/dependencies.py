@@ -1,28 +1,133 @@
 """Dependências compartilhadas para injeção."""
+from typing import Optional
+
+from core.config import settings
 from repositories.test_repository import TestRepository
 from services.variant_selector import VariantSelector
 from services.test_service import TestService
 from services.metrics_service import MetricsService
+from services.impression_pipeline import ImpressionPipeline
+from services.event_service import EventService
+from services.export_service import ExportService
+from services.retention_service import RetentionService
+from services.lifecycle_service import LifecycleScheduler
+from services.traffic_capture import TrafficRecorder
+
+
+def _build_repository() -> TestRepository:
+    """Cria o repositório conforme `settings.STORAGE_BACKEND`."""
+    if settings.STORAGE_BACKEND == "journal":
+        from repositories.journal_repository import JournaledTestRepository
+        return JournaledTestRepository(
+            settings.DATA_DIR,
+            fsync_interval=settings.JOURNAL_FSYNC_INTERVAL,
+            snapshot_interval=settings.JOURNAL_SNAPSHOT_INTERVAL,
+        )
+    if settings.STORAGE_BACKEND == "sqlite":
+        from repositories.sqlite_repository import SQLiteTestRepository
+        return SQLiteTestRepository(settings.SQLITE_PATH)
+    if settings.STORAGE_BACKEND == "shared":
+        from repositories.shared_repository import SharedTestRepository
+        return SharedTestRepository(
+            settings.SHARED_STATE_DIR,
+            counter_slots=settings.SHARED_COUNTER_SLOTS,
+        )
+    return TestRepository()
 
 
 # Instâncias singleton dos serviços
-_repository = TestRepository()
+_repository = _build_repository()
 _variant_selector = VariantSelector()
-_test_service = TestService(_repository, _variant_selector)
+_impression_pipeline = (
+    ImpressionPipeline(
+        _repository,
+        max_size=settings.IMPRESSION_QUEUE_MAX_SIZE,
+        flush_size=settings.IMPRESSION_FLUSH_SIZE,
+        flush_interval=settings.IMPRESSION_FLUSH_INTERVAL,
+        backpressure=settings.IMPRESSION_BACKPRESSURE,
+    )
+    if settings.IMPRESSION_PIPELINE_ENABLED
+    else None
+)
+_traffic_recorder = (
+    TrafficRecorder(
+        settings.CAPTURE_PATH,
+        sample_rate=settings.CAPTURE_SAMPLE_RATE,
+        max_size=settings.CAPTURE_BUFFER_SIZE,
+        flush_interval=settings.CAPTURE_FLUSH_INTERVAL,
+        max_body_bytes=settings.CAPTURE_MAX_BODY_BYTES,
+    )
+    if settings.CAPTURE_ENABLED
+    else None
+)
+_test_service = TestService(
+    _repository,
+    _variant_selector,
+    _impression_pipeline,
+    max_batch_size=settings.TEST_BATCH_MAX_SIZE,
+)
 _metrics_service = MetricsService(_repository)
+_event_service = EventService(_repository, settings.EVENT_BATCH_MAX_SIZE)
+_export_service = ExportService(
+    _repository,
+    batch_size=settings.EXPORT_BATCH_SIZE,
+    gzip_level=settings.EXPORT_GZIP_LEVEL,
+)
+_retention_service = RetentionService(
+    _repository,
+    _impression_pipeline,
+    ttl=settings.EVENT_RETENTION_SECONDS,
+    interval=settings.EVENT_RETENTION_INTERVAL,
+)
+_lifecycle_scheduler = LifecycleScheduler(
+    _repository,
+    interval=settings.TEST_SCHEDULER_INTERVAL,
+)
 
 
-def get_repository() -> TestRepository:
+# As dependências usadas com `Depends` são `async def`: dependências
+# síncronas seriam executadas pelo FastAPI no threadpool, um salto de
+# thread a mais em cada requisição das rotas assíncronas.
+async def get_repository() -> TestRepository:
     """Retorna instância do repositório."""
     return _repository
 
 
-def get_test_service() -> TestService:
+async def get_test_service() -> TestService:
     """Retorna instância do serviço de testes."""
     return _test_service
 
 
-def get_metrics_service() -> MetricsService:
+async def get_metrics_service() -> MetricsService:
     """Retorna instância do serviço de métricas."""
     return _metrics_service
 
+
+async def get_event_service() -> EventService:
+    """Retorna instância do serviço de ingestão de eventos."""
+    return _event_service
+
+
+async def get_export_service() -> ExportService:
+    """Retorna instância do serviço de exportação de eventos."""
+    return _export_service
+
+
+async def get_retention_service() -> RetentionService:
+    """Retorna instância do serviço de exclusão e retenção de eventos."""
+    return _retention_service
+
+
+def get_lifecycle_scheduler() -> LifecycleScheduler:
+    """Retorna o agendador que vira o status dos testes agendados."""
+    return _lifecycle_scheduler
+
+
+def get_impression_pipeline() -> Optional[ImpressionPipeline]:
+    """Retorna o pipeline de impressões, se habilitado."""
+    return _impression_pipeline
+
+
+def get_traffic_recorder() -> Optional[TrafficRecorder]:
+    """Retorna o gravador de tráfego, se a captura estiver habilitada."""
+    return _traffic_recorder
@@ -0,0 +1,139 @@
+"""Middlewares ASGI da aplicação."""
+import time
+
+from core.profiler import profiler
+from core.telemetry import HTTP_REQUEST_DURATION, telemetry
+from services.traffic_capture import TrafficRecorder
+
+
+class CaptureMiddleware:
+    """
+    Registra as requisições amostradas no `TrafficRecorder`: método,
+    caminho, rota, query, content-type, corpo, status e duração.
+    
+    Middleware ASGI puro (sem `BaseHTTPMiddleware`): requisições fora da
+    amostra seguem direto para o app, e as amostradas apenas copiam os
+    pedaços do corpo já lidos pela rota.
+    """
+    
+    def __init__(self, app, recorder: TrafficRecorder):
+        self.app = app
+        self.recorder = recorder
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.recorder.should_sample():
+            await self.app(scope, receive, send)
+            return
+        
+        max_body = self.recorder.max_body_bytes
+        chunks = []
+        body_size = 0
+        status = 500
+        
+        async def capture_receive():
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                body_size += len(chunk)
+                if chunk and body_size <= max_body:
+                    chunks.append(chunk)
+            return message
+        
+        async def capture_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            content_type = None
+            for name, value in scope["headers"]:
+                if name == b"content-type":
+                    content_type = value.decode("latin-1")
+                    break
+            # A rota resolvida pelo FastAPI (ex.: /admin/test/{test_id}/metrics)
+            route = getattr(scope.get("route"), "path", None)
+            self.recorder.record((
+                started,
+                scope["method"],
+                scope["path"],
+                route,
+                scope["query_string"].decode("latin-1"),
+                content_type,
+                b"".join(chunks) if body_size <= max_body else None,
+                status,
+                duration,
+            ))
+
+
+class TelemetryMiddleware:
+    """
+    Registra a duração de cada requisição HTTP no histograma por método,
+    rota e status.
+    
+    A rota é o caminho declarado no FastAPI (ex.:
+    /admin/test/{test_id}/metrics), não o caminho recebido, para que IDs
+    não criem séries novas; requisições sem rota contam como "unmatched".
+    Respeita `telemetry.enabled` a cada requisição.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not telemetry.enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        
+        async def telemetry_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, telemetry_send)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            telemetry.observe(
+                HTTP_REQUEST_DURATION,
+                (scope["method"], route, str(status)),
+                time.perf_counter() - start
+            )
+
+
+class ProfilerMiddleware:
+    """
+    Sorteia as requisições perfiladas e mantém o amostrador de pilhas
+    ativo enquanto elas estão em andamento.
+    
+    Com o profiler desligado, custa uma leitura de atributo por requisição.
+    As rotas do próprio profiler (/admin/profile) não são perfiladas.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not profiler.should_sample()
+            or scope["path"].startswith("/admin/profile")
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        profiler.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.end()
@@ -0,0 +1,20 @@
+"""Classes de resposta da API."""
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from core.serialization import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse serializado por `core.serialization.dumps`.
+    
+    Uma rota que retorna esta resposta já com o modelo pronto não passa
+    pela validação do `response_model` (o FastAPI só valida o que não é um
+    `Response`) e é serializada da mesma forma em qualquer versão do
+    FastAPI; o `response_model` continua documentando o schema no OpenAPI.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,104 +1,362 @@
 """Rotas administrativas."""
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
 
 from schemas.models import (
+    AdminTestBatchRequest,
+    AdminTestBatchResponse,
     AdminTestRequest,
     AdminTestUpdateRequest,
     AdminTestResponse,
+    AdminTestStatusResponse,
+    AllTestsMetricsResponse,
+    EventsDeletedResponse,
+    ProfilerSettingsRequest,
+    ProfilerStatusResponse,
     TestMetricsResponse,
     TestsListResponse,
     TestListItem,
 )
-from services.test_service import TestService
+from services.test_service import UNCHANGED, TestService
+from api.responses import FastJSONResponse
+from event_log import to_datetime
 from services.metrics_service import MetricsService
+from services.export_service import EXPORT_FORMATS, ExportService
+from services.retention_service import RetentionService
 from repositories.test_repository import TestRepository
-from api.dependencies import get_test_service, get_metrics_service, get_repository
+from api.dependencies import (
+    get_export_service,
+    get_metrics_service,
+    get_repository,
+    get_retention_service,
+    get_test_service,
+)
+from core.config import settings
+from core.exceptions import ProfilerNotAllowedError
+from core.profiler import profiler
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 
 @router.post("/test", response_model=AdminTestResponse)
-def create_test(
+async def create_test(
     request: AdminTestRequest,
     test_service: TestService = Depends(get_test_service)
 ):
     """
     Cria um novo experimento.
+    
+    `startAt`/`endAt` agendam o início e o fim (datas sem timezone são
+    tratadas como UTC) e `allocation` é o percentual de visitantes que
+    entram no teste; os demais recebem o controle, sem impressão.
     """
     # Preparar variantes
     variants_dict = [
         {
             "variantId": v.variantId,
             "distribution": v.distribution,
-            "sections": [s.dict() for s in v.sections]
+            "sections": [s.model_dump() for s in v.sections]
         }
         for v in request.variants
     ]
     
-    message = test_service.create_test(
+    message = await test_service.create_test_async(
         request.testId,
         request.name,
-        variants_dict
+        variants_dict,
+        request.startAt,
+        request.endAt,
+        request.allocation
     )
     
-    return AdminTestResponse(ok=True, message=message)
+    return FastJSONResponse(AdminTestResponse(ok=True, message=message))
 
 
 @router.put("/test/{test_id}", response_model=AdminTestResponse)
-def update_test(
+async def update_test(
     test_id: str,
     request: AdminTestUpdateRequest,
     test_service: TestService = Depends(get_test_service)
 ):
     """
-    Atualiza um experimento existente.
+    Atualiza um experimento existente, inclusive a agenda e a alocação
+    (ampliar a alocação aos poucos faz o ramp-up do tráfego). `startAt`,
+    `endAt` e `allocation` ausentes do corpo mantêm os valores atuais;
+    `null` em `startAt`/`endAt` remove a data.
     """
     # Preparar variantes
     variants_dict = [
         {
             "variantId": v.variantId,
             "distribution": v.distribution,
-            "sections": [s.dict() for s in v.sections]
+            "sections": [s.model_dump() for s in v.sections]
         }
         for v in request.variants
     ]
     
-    message = test_service.update_test(
+    given = request.model_fields_set
+    message = await test_service.update_test_async(
         test_id,
         request.name,
-        variants_dict
+        variants_dict,
+        request.startAt if "startAt" in given else UNCHANGED,
+        request.endAt if "endAt" in given else UNCHANGED,
+        request.allocation if "allocation" in given else UNCHANGED
     )
     
-    return AdminTestResponse(ok=True, message=message)
+    return FastJSONResponse(AdminTestResponse(ok=True, message=message))
+
+
+@router.post("/test/{test_id}/pause", response_model=AdminTestStatusResponse)
+async def pause_test(
+    test_id: str,
+    test_service: TestService = Depends(get_test_service)
+):
+    """
+    Pausa o experimento: `/experiment` e a configuração respondem 404
+    até ele ser retomado. Testes encerrados não podem ser pausados.
+    """
+    status = await test_service.pause_test_async(test_id)
+    return FastJSONResponse(AdminTestStatusResponse(ok=True, testId=test_id, status=status))
+
+
+@router.post("/test/{test_id}/resume", response_model=AdminTestStatusResponse)
+async def resume_test(
+    test_id: str,
+    test_service: TestService = Depends(get_test_service)
+):
+    """
+    Retoma o experimento pausado, que volta ao status da agenda
+    (`active`, `scheduled` ou `ended`).
+    """
+    status = await test_service.resume_test_async(test_id)
+    return FastJSONResponse(AdminTestStatusResponse(ok=True, testId=test_id, status=status))
 
 
 @router.get("/test/{test_id}/metrics", response_model=TestMetricsResponse)
-def get_test_metrics(
+async def get_test_metrics(
     test_id: str,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = Query(None),
+    granularity: Optional[Literal["minute", "hour"]] = Query(None),
     metrics_service: MetricsService = Depends(get_metrics_service)
 ):
     """
     Retorna as métricas de cada variante do teste.
+    
+    Com `from`/`to`/`granularity`, as métricas vêm dos rollups por minuto
+    ou por hora (datas sem timezone são tratadas como UTC), com a série
+    temporal de cada variante.
+    """
+    return FastJSONResponse(
+        await metrics_service.get_test_metrics_async(test_id, from_, to, granularity)
+    )
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Se o cabeçalho Accept-Encoding aceita gzip (ignora `gzip;q=0`)."""
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        if coding.strip() == "gzip":
+            return params.replace(" ", "").rstrip("0.") != "q="
+    return False
+
+
+@router.get("/test/{test_id}/events", response_class=StreamingResponse)
+async def export_events(
+    test_id: str,
+    request: Request,
+    export_format: Literal["ndjson", "csv", "arrow"] = Query("ndjson", alias="format"),
+    event_type: Optional[Literal["impression", "conversion"]] = Query(None, alias="type"),
+    event: Optional[List[str]] = Query(None),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = Query(None),
+    export_service: ExportService = Depends(get_export_service)
+):
     """
-    return metrics_service.get_test_metrics(test_id)
+    Exporta as impressões e conversões brutas do teste em streaming.
+    
+    `format` escolhe NDJSON (padrão), CSV ou Arrow IPC (requer pyarrow);
+    `type` restringe a impressões ou conversões e `event` (repetível) aos
+    nomes de evento de conversão informados. `from`/`to` filtram pelo
+    timestamp do evento (datas sem timezone são tratadas como UTC). Com
+    `Accept-Encoding: gzip`, a saída é comprimida.
+    """
+    compress = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    stream = await export_service.export_async(
+        test_id, export_format, event_type, from_, to, event, compress
+    )
+    encoder = EXPORT_FORMATS[export_format]
+    headers = {
+        "Content-Disposition": f'attachment; filename="events.{encoder.extension}"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(stream, media_type=encoder.media_type, headers=headers)
+
+
+@router.delete("/test/{test_id}/events", response_model=EventsDeletedResponse)
+async def delete_events(
+    test_id: str,
+    retention_service: RetentionService = Depends(get_retention_service)
+):
+    """
+    Descarta as impressões e conversões do teste, com seus contadores e
+    rollups. A definição do teste é mantida e novos eventos voltam a ser
+    registrados normalmente.
+    """
+    deleted = await retention_service.delete_test_events_async(test_id)
+    return FastJSONResponse(EventsDeletedResponse(ok=True, deleted=deleted))
+
+
+@router.get("/metrics", response_model=AllTestsMetricsResponse)
+async def get_all_metrics(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = Query(None),
+    granularity: Optional[Literal["minute", "hour"]] = Query(None),
+    metrics_service: MetricsService = Depends(get_metrics_service)
+):
+    """
+    Retorna as métricas de todos os testes ativos, com a significância de
+    cada variante em relação ao controle.
+    """
+    return FastJSONResponse(
+        await metrics_service.get_all_metrics_async(from_, to, granularity)
+    )
+
+
+def _datetime(timestamp: Optional[float]) -> Optional[datetime]:
+    return None if timestamp is None else to_datetime(timestamp)
 
 
 @router.get("/tests", response_model=TestsListResponse)
-def list_tests(repository: TestRepository = Depends(get_repository)):
+async def list_tests(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(
+        settings.ADMIN_TESTS_PAGE_SIZE, ge=1, le=settings.ADMIN_TESTS_MAX_PAGE_SIZE
+    ),
+    status: Optional[str] = Query(None),
+    name: Optional[str] = Query(None),
+    repository: TestRepository = Depends(get_repository)
+):
     """
-    Lista todos os testes cadastrados.
+    Lista os testes cadastrados em ordem de testId, paginados por cursor.
+    
+    `nextCursor` da resposta, passado em `cursor`, traz a página seguinte
+    (None na última). `status` filtra pelo status exato e `name` por
+    trecho do nome, sem diferenciar maiúsculas.
     """
-    all_tests = repository.get_all_tests()
+    page, next_cursor = await repository.list_tests_async(cursor, limit, status, name)
     
     test_items = [
         TestListItem(
             testId=test["testId"],
             name=test["name"],
             status=test["status"],
-            variantCount=len(test["variants"])
+            variantCount=len(test["variants"]),
+            startAt=_datetime(test.get("startAt")),
+            endAt=_datetime(test.get("endAt")),
+            allocation=test.get("allocation", 100)
         )
-        for test in all_tests
+        for test in page
+    ]
+    
+    return FastJSONResponse(TestsListResponse(tests=test_items, nextCursor=next_cursor))
+
+
+@router.post("/tests:batch", response_model=AdminTestBatchResponse)
+async def batch_tests(
+    request: AdminTestBatchRequest,
+    test_service: TestService = Depends(get_test_service)
+):
+    """
+    Cria, atualiza e muda o status de vários testes de uma vez.
+    
+    Cada operação tem `op` (`create`, `update` ou `status`) e `testId`;
+    `create` e `update` exigem `name` e `variants` (e aceitam `startAt`,
+    `endAt` e `allocation`), e `status` exige `status` (`paused`, ou
+    `active` para retomar pela agenda). As operações válidas são publicadas
+    como uma única versão da configuração; as inválidas são reportadas
+    pelo índice em `errors`.
+    """
+    # Agenda e alocação só entram no dict quando vieram na operação: na
+    # atualização, as ausentes mantêm os valores do teste
+    operations = [
+        {
+            **{
+                field: getattr(operation, field)
+                for field in ("startAt", "endAt", "allocation")
+                if field in operation.model_fields_set
+            },
+            "op": operation.op,
+            "testId": operation.testId,
+            "name": operation.name,
+            "variants": [
+                {
+                    "variantId": v.variantId,
+                    "distribution": v.distribution,
+                    "sections": [s.model_dump() for s in v.sections]
+                }
+                for v in operation.variants
+            ] if operation.variants is not None else None,
+            "status": operation.status
+        }
+        for operation in request.operations
     ]
     
-    return TestsListResponse(tests=test_items)
+    return FastJSONResponse(await test_service.apply_batch_async(operations))
 
+
+def _require_profiler() -> None:
+    if not settings.PROFILER_ALLOWED:
+        raise ProfilerNotAllowedError("Profiler is disabled by configuration")
+
+
+@router.get("/profile", response_class=Response)
+async def download_profile():
+    """
+    Baixa as pilhas amostradas no formato collapsed do flamegraph
+    (`raiz;...;folha contagem` por linha), para `flamegraph.pl`,
+    speedscope ou similares.
+    """
+    _require_profiler()
+    return Response(
+        content=profiler.collapsed(),
+        media_type="text/plain",
+        headers={"Content-Disposition": 'attachment; filename="profile.folded"'}
+    )
+
+
+@router.get("/profile/status", response_model=ProfilerStatusResponse)
+async def get_profile_status():
+    """
+    Retorna a configuração atual do profiler e o volume acumulado.
+    """
+    _require_profiler()
+    return FastJSONResponse(ProfilerStatusResponse(**profiler.status()))
+
+
+@router.put("/profile", response_model=ProfilerStatusResponse)
+async def configure_profile(request: ProfilerSettingsRequest):
+    """
+    Liga ou desliga o profiler e ajusta a fração de requisições amostradas,
+    sem reiniciar o servidor. As pilhas acumuladas são mantidas.
+    """
+    _require_profiler()
+    profiler.configure(request.enabled, request.sampleRate)
+    return FastJSONResponse(ProfilerStatusResponse(**profiler.status()))
+
+
+@router.delete("/profile", response_model=ProfilerStatusResponse)
+async def reset_profile():
+    """
+    Descarta as pilhas acumuladas.
+    """
+    _require_profiler()
+    profiler.reset()
+    return FastJSONResponse(ProfilerStatusResponse(**profiler.status()))
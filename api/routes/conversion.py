@@ -1,28 +1,33 @@
 """Rotas de conversão."""
 from fastapi import APIRouter, Depends
+from fastapi.responses import Response
 
 from schemas.models import (
     ConversionRequest,
     ConversionResponse,
 )
+from core.serialization import dumps
 from services.test_service import TestService
 from api.dependencies import get_test_service
 
 router = APIRouter(tags=["conversion"])
 
+# A resposta é sempre a mesma: serializada uma única vez
+CONVERSION_OK = dumps(ConversionResponse(ok=True))
+
 
 @router.post("/conversion", response_model=ConversionResponse)
-def register_conversion(
+async def register_conversion(
     request: ConversionRequest,
     test_service: TestService = Depends(get_test_service)
 ):
     """
     Registra uma conversão.
     """
-    test_service.register_conversion(
+    await test_service.register_conversion_async(
         request.testId,
         request.variantId,
         request.event
     )
-    return ConversionResponse(ok=True)
+    return Response(content=CONVERSION_OK, media_type="application/json")
 
@@ -0,0 +1,45 @@
+"""Rotas de ingestão de eventos em lote."""
+import json
+
+from fastapi import APIRouter, Depends, Request
+
+from schemas.models import EventBatchResponse
+from services.event_service import EventService, parse_json_batch, parse_ndjson_batch
+from core.exceptions import InvalidEventBatchError
+from api.dependencies import get_event_service
+from api.responses import FastJSONResponse
+
+router = APIRouter(tags=["events"])
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+@router.post("/events/batch", response_model=EventBatchResponse)
+async def ingest_events_batch(
+    request: Request,
+    event_service: EventService = Depends(get_event_service)
+):
+    """
+    Registra vários eventos de uma vez.
+    
+    Aceita JSON (`{"impressions": [...], "conversions": [...]}`) ou NDJSON
+    (`application/x-ndjson`, um evento por linha com campo `type`).
+    Qualquer outro tipo, inclusive o `text/plain` enviado pelo
+    `navigator.sendBeacon` do SDK, é lido como JSON.
+    Cada impressão tem `testId` e `variantId`; cada conversão também tem
+    `event`. `timestamp` (epoch em segundos) é opcional.
+    Eventos inválidos são reportados pelo índice em `errors`.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    
+    if content_type in NDJSON_CONTENT_TYPES:
+        items = parse_ndjson_batch(body)
+    else:
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise InvalidEventBatchError("Batch body is not valid JSON")
+        items = parse_json_batch(payload)
+    
+    return FastJSONResponse(await event_service.ingest_async(items))
@@ -1,5 +1,8 @@
 """Rotas de experimento."""
+from typing import Optional
+
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import Response
 
 from schemas.models import (
     ExperimentRequest,
@@ -10,21 +13,29 @@ from api.dependencies import get_test_service
 
 router = APIRouter(tags=["experiment"])
 
+# Cada resposta registra uma impressão: nunca pode vir de um cache
+NO_STORE = {"Cache-Control": "no-store"}
+
 
 @router.get("/experiment", response_model=ExperimentResponse)
-def get_experiment_get(
+async def get_experiment_get(
     testId: str = Query(..., description="ID do teste"),
+    visitorId: Optional[str] = Query(None, description="ID estável do visitante"),
     test_service: TestService = Depends(get_test_service)
 ):
     """
     Retorna a variante a ser exibida e registra uma impressão.
-    Aceita testId como query parameter.
+    Aceita testId e visitorId (opcional) como query parameters.
     """
-    return test_service.get_experiment(testId)
+    return Response(
+        content=await test_service.get_experiment_payload_async(testId, visitorId),
+        media_type="application/json",
+        headers=NO_STORE
+    )
 
 
 @router.post("/experiment", response_model=ExperimentResponse)
-def get_experiment_post(
+async def get_experiment_post(
     request: ExperimentRequest,
     test_service: TestService = Depends(get_test_service)
 ):
@@ -32,5 +43,11 @@ def get_experiment_post(
     Retorna a variante a ser exibida e registra uma impressão.
     Aceita JSON no body conforme documentação.
     """
-    return test_service.get_experiment(request.testId)
+    return Response(
+        content=await test_service.get_experiment_payload_async(
+            request.testId, request.visitorId
+        ),
+        media_type="application/json",
+        headers=NO_STORE
+    )
 
@@ -0,0 +1,56 @@
+"""Rotas internas de operação (telemetria)."""
+from typing import List
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
+
+from core.telemetry import (
+    CAPTURE_BUFFER_LENGTH,
+    CAPTURES_DROPPED,
+    IMPRESSION_QUEUE_LENGTH,
+    IMPRESSIONS_DROPPED,
+    STORAGE_ITEMS,
+    STORAGE_MEMORY,
+    GaugeSample,
+    telemetry,
+)
+from repositories.test_repository import TestRepository
+from api.dependencies import get_impression_pipeline, get_repository, get_traffic_recorder
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=Response)
+async def get_internal_metrics(repository: TestRepository = Depends(get_repository)):
+    """
+    Métricas do processo no formato texto do Prometheus.
+    
+    Inclui os histogramas de latência (rotas, seleção de variante, escritas
+    no repositório e cálculo de métricas), os contadores de atribuições e
+    conversões por teste e variante, e gauges do armazenamento, da fila de
+    impressões e da captura de tráfego, calculados no momento da coleta.
+    Com vários workers, cada processo expõe apenas os próprios valores.
+    """
+    stats = await repository.get_storage_stats_async()
+    gauges: List[GaugeSample] = [
+        (STORAGE_ITEMS, (structure,), count)
+        for structure, count in stats["items"].items()
+    ]
+    gauges.extend(
+        (STORAGE_MEMORY, (structure,), size)
+        for structure, size in stats["bytes"].items()
+    )
+    pipeline = get_impression_pipeline()
+    if pipeline is not None:
+        gauges.append((IMPRESSION_QUEUE_LENGTH, (), len(pipeline)))
+        gauges.append((IMPRESSIONS_DROPPED, (), pipeline.dropped))
+    recorder = get_traffic_recorder()
+    if recorder is not None:
+        gauges.append((CAPTURE_BUFFER_LENGTH, (), len(recorder)))
+        gauges.append((CAPTURES_DROPPED, (), recorder.dropped))
+    return Response(
+        content=telemetry.render(gauges),
+        media_type=PROMETHEUS_CONTENT_TYPE
+    )
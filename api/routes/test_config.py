@@ -0,0 +1,59 @@
+"""Rotas de configuração pública dos testes (cacheáveis)."""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import Response
+
+from core.config import settings
+from schemas.models import TestConfigResponse
+from services.test_service import TestService
+from api.dependencies import get_test_service
+
+router = APIRouter(tags=["config"])
+
+CACHE_CONTROL = (
+    f"public, max-age={settings.TEST_CONFIG_MAX_AGE}, "
+    f"stale-while-revalidate={settings.TEST_CONFIG_STALE_WHILE_REVALIDATE}"
+)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara `If-None-Match` com o ETag (comparação fraca, como manda a RFC 9110)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+@router.get(
+    "/test/{test_id}/config",
+    response_model=TestConfigResponse,
+    responses={304: {"description": "Not Modified"}}
+)
+async def get_test_config(
+    test_id: str,
+    if_none_match: Optional[str] = Header(None),
+    test_service: TestService = Depends(get_test_service)
+):
+    """
+    Retorna a configuração compilada de um teste ativo: parâmetros de
+    bucketing e, por variante, a faixa de buckets e as seções.
+
+    Não registra impressão. A resposta tem ETag forte e `Cache-Control`
+    com `stale-while-revalidate`; requisições condicionais com o ETag
+    atual recebem `304 Not Modified`.
+    """
+    compiled = await test_service.get_active_routing_async(test_id)
+    headers = {"ETag": compiled.etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, compiled.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=compiled.config_payload,
+        media_type="application/json",
+        headers=headers
+    )
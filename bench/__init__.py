@@ -0,0 +1,9 @@
+"""Benchmarks - Medições de desempenho do backend.
+
+Cada módulo pode ser executado a partir da raiz do projeto, por exemplo:
+
+    python -m bench.metrics_latency
+
+`python -m bench` executa a suíte (carga HTTP e microbenchmarks) e grava um
+único JSON com o commit, para comparar execuções.
+"""
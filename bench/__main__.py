@@ -0,0 +1,90 @@
+"""
+Executa a suíte de benchmarks e grava um único JSON para comparar commits.
+
+Cada benchmark roda em um processo separado (estado global limpo) e o
+resultado inclui o commit, a versão do Python e a data da execução.
+
+Uso:
+    python -m bench [--output arquivo.json] [--quick] [benchmark ...]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+
+# Argumentos de cada benchmark: (padrão, --quick)
+SUITE: Dict[str, tuple] = {
+    "load": ([], ["--requests", "3000", "--warmup", "300"]),
+    "variant_selection": ([], ["10000"]),
+    "storage_backends": ([], ["20000"]),
+    "metrics_latency": ([], ["100000"]),
+    "metrics_statistics": ([], ["100", "10"]),
+    "telemetry_overhead": ([], ["200", "7"]),
+    "async_routes": ([], ["--requests", "3000", "--warmup", "300"]),
+    "json_responses": ([], ["500", "3"]),
+    "storage_concurrency": ([], ["10000", "8"]),
+    "event_export": ([], ["200000"]),
+    "event_retention": ([], ["200000", "20"]),
+    "admin_tests": ([], ["2000", "200"]),
+    "test_lifecycle": ([], ["20000", "2000"]),
+}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(name: str, args: List[str]) -> object:
+    completed = subprocess.run(
+        [sys.executable, "-m", f"bench.{name}", *args],
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"código de saída {completed.returncode}"}
+    return json.loads(completed.stdout)["results"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    parser.add_argument(
+        "benchmarks", nargs="*", help=f"padrão: todos ({', '.join(SUITE)})"
+    )
+    parser.add_argument("--output", help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--quick", action="store_true", help="volumes reduzidos")
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in SUITE]
+    if unknown:
+        parser.error(f"benchmark desconhecido: {', '.join(unknown)}")
+
+    results = {}
+    for name in args.benchmarks or list(SUITE):
+        print(f"bench.{name}...", file=sys.stderr)
+        results[name] = run_benchmark(name, SUITE[name][1 if args.quick else 0])
+
+    report = json.dumps({
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "quick": args.quick,
+        "results": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Administração com muitos testes: listagem paginada e criação em lote.
+
+Com o armazenamento em memória e `testes` testes cadastrados (um décimo
+pausado), mede:
+
+- `list`: ms por requisição de `GET /admin/tests` paginado (primeira
+  página, página do meio, com `status` e com `name` raro) contra a
+  listagem anterior, que montava um `TestListItem` para cada teste
+- `create`: criar `criacoes` testes novos um por requisição
+  (`create_test`) contra um único `apply_batch`, com as versões da
+  configuração publicadas em cada caso
+
+Uso:
+    python -m bench.admin_tests [testes] [criacoes]
+"""
+import asyncio
+import time
+
+import storage
+from bench.common import emit, int_arg
+from bench.load import RawClient
+from repositories.test_repository import TestRepository
+from services.test_service import TestService
+from services.variant_selector import VariantSelector
+
+
+VARIANTS = [
+    {"variantId": "A", "distribution": 50, "sections": []},
+    {"variantId": "B", "distribution": 50, "sections": []},
+]
+
+
+def build_app():
+    """App com as rotas de admin e a listagem anterior em /legacy/tests."""
+    from fastapi import FastAPI
+
+    from api.responses import FastJSONResponse
+    from api.routes import admin
+    from schemas.models import TestListItem, TestsListResponse
+
+    app = FastAPI()
+    app.include_router(admin.router)
+
+    @app.get("/legacy/tests")
+    async def legacy_list_tests():
+        return FastJSONResponse(TestsListResponse(tests=[
+            TestListItem(
+                testId=test["testId"],
+                name=test["name"],
+                status=test["status"],
+                variantCount=len(test["variants"])
+            )
+            for test in storage.get_all_tests()
+        ]))
+
+    return app
+
+
+def operations(prefix: str, count: int) -> list:
+    return [
+        {
+            "op": "create",
+            "testId": f"{prefix}_{index:06d}",
+            "name": f"Landing {index}",
+            "variants": VARIANTS,
+            "status": "paused" if index % 10 == 0 else None,
+        }
+        for index in range(count)
+    ]
+
+
+async def per_request_ms(client: RawClient, path: str, query: str, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        status = await client.request("GET", path, query, b"")
+        assert status == 200, status
+    return round((time.perf_counter() - start) / number * 1e3, 4)
+
+
+async def measure_list(tests: int) -> dict:
+    client = RawClient(build_app())
+    middle = f"bench_{tests // 2:06d}"
+    number = max(5, 200_000 // tests)
+    return {
+        "legacy_all_tests_ms": await per_request_ms(client, "/legacy/tests", "", max(3, number // 20)),
+        "first_page_ms": await per_request_ms(client, "/admin/tests", "limit=100", number),
+        "middle_page_ms": await per_request_ms(
+            client, "/admin/tests", f"limit=100&cursor={middle}", number
+        ),
+        "status_page_ms": await per_request_ms(
+            client, "/admin/tests", "limit=100&status=paused", number
+        ),
+        "rare_name_page_ms": await per_request_ms(
+            client, "/admin/tests", f"limit=100&name=landing%20{tests - 1}", number
+        ),
+    }
+
+
+def measure_create(service: TestService, creations: int) -> dict:
+    version = storage.get_config_version()
+    start = time.perf_counter()
+    for operation in operations("single", creations):
+        service.create_test(operation["testId"], operation["name"], operation["variants"])
+    single_s = time.perf_counter() - start
+    single_versions = storage.get_config_version() - version
+
+    version = storage.get_config_version()
+    start = time.perf_counter()
+    response = service.apply_batch(operations("batch", creations))
+    batch_s = time.perf_counter() - start
+    assert response.ok and response.applied == creations
+    return {
+        "single_ms": round(single_s * 1e3, 2),
+        "single_config_versions": single_versions,
+        "batch_ms": round(batch_s * 1e3, 2),
+        "batch_config_versions": storage.get_config_version() - version,
+    }
+
+
+def main() -> None:
+    tests = int_arg(1, 10_000)
+    creations = int_arg(2, 1000)
+    storage.reset()
+    service = TestService(TestRepository(), VariantSelector(), max_batch_size=max(tests, creations))
+    service.apply_batch(operations("bench", tests))
+
+    results = {
+        "tests": tests,
+        "list": asyncio.run(measure_list(tests)),
+        "create": measure_create(service, creations),
+    }
+    storage.reset()
+    emit("admin_tests", results)
+
+
+if __name__ == "__main__":
+    main()
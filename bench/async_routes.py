@@ -0,0 +1,151 @@
+"""
+Rotas síncronas (como eram antes) contra as rotas assíncronas atuais, com
+muitas requisições simultâneas.
+
+Os dois apps usam os mesmos serviços, o mesmo lifespan e o mix de
+`bench.load` (`GET /experiment`, `POST /conversion` e métricas de um
+teste). No app `sync`, rotas e dependências são `def` e cada requisição
+passa pelo threadpool do Starlette (40 threads); no app `async` são as
+rotas de `api/routes`, que só saem do event loop para o executor dedicado
+(métricas e, com `--backend sqlite`, as consultas ao banco).
+
+Com `--backend sqlite`, o banco fica em um diretório temporário.
+
+Uso:
+    python -m bench.async_routes [--requests N] [--concurrency C]
+        [--tests N] [--backend memory|sqlite]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+from typing import Optional
+
+from bench.common import emit, percentiles
+from bench.load import ENDPOINTS, RawClient, make_test, parse_mix, plan, run
+
+
+def build_sync_app(lifespan, test_service, metrics_service):
+    """App com as rotas síncronas, equivalentes às anteriores."""
+    from fastapi import Depends, FastAPI, Query
+    from fastapi.responses import Response
+
+    from schemas.models import ConversionRequest, ConversionResponse
+
+    def provide_test_service():
+        return test_service
+
+    def provide_metrics_service():
+        return metrics_service
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/experiment")
+    def get_experiment(
+        testId: str = Query(...),
+        visitorId: Optional[str] = Query(None),
+        service=Depends(provide_test_service)
+    ):
+        return Response(
+            content=service.get_experiment_payload(testId, visitorId),
+            media_type="application/json",
+            headers={"Cache-Control": "no-store"}
+        )
+
+    @app.post("/conversion", response_model=ConversionResponse)
+    def register_conversion(request: ConversionRequest, service=Depends(provide_test_service)):
+        service.register_conversion(request.testId, request.variantId, request.event)
+        return ConversionResponse(ok=True)
+
+    @app.get("/admin/test/{test_id}/metrics")
+    def get_test_metrics(test_id: str, service=Depends(provide_metrics_service)):
+        return service.get_test_metrics(test_id)
+
+    return app
+
+
+def build_async_app(lifespan):
+    """App com as rotas atuais de `api/routes`."""
+    from fastapi import FastAPI
+
+    from api.routes import admin, conversion, experiment
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(experiment.router)
+    app.include_router(conversion.router)
+    app.include_router(admin.router)
+    return app
+
+
+async def measure(app, args: argparse.Namespace) -> dict:
+    async with app.router.lifespan_context(app):
+        client = RawClient(app)
+        warmup = plan(args.warmup, args.tests, args.variants, args.mix, args.seed + 1)
+        await run(client, warmup, args.concurrency)
+        requests = plan(args.requests, args.tests, args.variants, args.mix, args.seed)
+        latencies, errors, elapsed = await run(client, requests, args.concurrency)
+    everything = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_sec": round(len(requests) / elapsed),
+        "latency": percentiles(everything),
+        "endpoints": {
+            kind: {"count": len(latencies[kind]), **percentiles(latencies[kind])}
+            for kind in ENDPOINTS
+            if latencies[kind]
+        },
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    # As configurações são lidas na importação de `core.config`
+    os.environ["AB_STORAGE_BACKEND"] = args.backend
+    if args.backend == "sqlite":
+        os.environ["AB_SQLITE_PATH"] = os.path.join(args.data_dir, "bench.sqlite3")
+
+    import storage
+    from api.dependencies import get_metrics_service, get_test_service
+    from main import lifespan
+
+    storage.reset()
+    test_service = await get_test_service()
+    metrics_service = await get_metrics_service()
+    for index in range(args.tests):
+        test = make_test(index, args.variants)
+        test_service.create_test(test["testId"], test["name"], test["variants"])
+
+    results = {
+        "backend": args.backend,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "tests": args.tests,
+        "mix": args.mix,
+        "sync": await measure(build_sync_app(lifespan, test_service, metrics_service), args),
+        "async": await measure(build_async_app(lifespan), args),
+    }
+    storage.reset()
+    results["speedup"] = round(
+        results["async"]["requests_per_sec"] / results["sync"]["requests_per_sec"], 2
+    )
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bench.async_routes")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--warmup", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--tests", type=int, default=50)
+    parser.add_argument("--variants", type=int, default=2)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("95,4,1"))
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    with tempfile.TemporaryDirectory() as data_dir:
+        arguments.data_dir = data_dir
+        emit("async_routes", asyncio.run(main(arguments)))
@@ -0,0 +1,54 @@
+"""Utilitários compartilhados pelos benchmarks."""
+import json
+import math
+import sys
+import time
+from typing import Callable, Dict, List
+
+
+def time_call(func: Callable[[], object], repeat: int = 5) -> Dict[str, float]:
+    """
+    Executa `func` várias vezes e retorna o melhor e a mediana em milissegundos.
+    """
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "best_ms": round(samples[0], 4),
+        "median_ms": round(samples[len(samples) // 2], 4),
+    }
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """
+    p50, p95, p99 e máximo de amostras em milissegundos (posto mais próximo).
+    """
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+
+    def rank(q: float) -> float:
+        return round(ordered[min(last, max(0, math.ceil(q * len(ordered)) - 1))], 4)
+
+    return {
+        "p50_ms": rank(0.50),
+        "p95_ms": rank(0.95),
+        "p99_ms": rank(0.99),
+        "max_ms": round(ordered[last], 4),
+    }
+
+
+def int_arg(index: int, default: int) -> int:
+    """Lê um argumento inteiro posicional da linha de comando."""
+    if len(sys.argv) > index:
+        return int(sys.argv[index])
+    return default
+
+
+def emit(name: str, results: object) -> None:
+    """Imprime o resultado do benchmark em JSON."""
+    print(json.dumps({"benchmark": name, "results": results}, indent=2))
@@ -0,0 +1,121 @@
+"""
+Exportação dos eventos brutos de um teste: throughput por formato e
+memória de pico contra montar a resposta inteira.
+
+O armazenamento em memória recebe `eventos` impressões e um décimo disso
+em conversões, divididos entre 4 testes; exporta-se um deles.
+
+- `formats`: eventos/s e bytes gerados por `ExportService` em cada
+  formato, com e sem gzip (Arrow só com pyarrow instalado)
+- `memory`: pico de memória alocada (tracemalloc) durante a exportação
+  NDJSON em streaming e no caminho ingênuo, que itera o log linha a
+  linha (`EventLog.__iter__`) e monta a lista de dicts antes de
+  serializar, com metade e com todo o volume
+
+Uso:
+    python -m bench.event_export [eventos]
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+
+import storage
+from bench.common import emit, int_arg
+from repositories.test_repository import TestRepository
+from services.export_service import EXPORT_FORMATS, ExportService, pa
+
+
+TESTS = [f"bench_export_{i}" for i in range(4)]
+TEST_ID = TESTS[0]
+START = 1_700_000_000.0
+
+
+def populate(total: int) -> int:
+    """Preenche o armazenamento; retorna quantos eventos são de TEST_ID."""
+    storage.reset()
+    variants = [{"variantId": v, "distribution": 50, "sections": []} for v in ("A", "B")]
+    for test_id in TESTS:
+        storage.save_test(test_id, test_id, variants)
+    storage.add_impressions([
+        (TESTS[i % len(TESTS)], "AB"[i % 2], START + i * 0.01) for i in range(total)
+    ])
+    conversions = total // 10
+    storage.add_conversions([
+        (TESTS[i % len(TESTS)], "AB"[i % 2], ("lead", "purchase")[i % 2], START + i * 0.1)
+        for i in range(conversions)
+    ])
+    return len(range(0, total, len(TESTS))) + len(range(0, conversions, len(TESTS)))
+
+
+async def consume(service: ExportService, export_format: str, compress: bool) -> int:
+    stream = await service.export_async(TEST_ID, export_format, compress=compress)
+    size = 0
+    async for chunk in stream:
+        size += len(chunk)
+    return size
+
+
+def measure_format(service: ExportService, export_format: str, compress: bool, events: int) -> dict:
+    start = time.perf_counter()
+    size = asyncio.run(consume(service, export_format, compress))
+    elapsed = time.perf_counter() - start
+    return {
+        "events_per_sec": round(events / elapsed),
+        "mb": round(size / 2 ** 20, 2),
+        "mb_per_sec": round(size / 2 ** 20 / elapsed, 1),
+    }
+
+
+def naive_export() -> int:
+    """Lista de dicts de todos os eventos do teste serializada de uma vez."""
+    rows = [
+        dict(row, type=kind)
+        for kind, log in (("impression", storage.impressions), ("conversion", storage.conversions))
+        for row in log
+        if row["testId"] == TEST_ID
+    ]
+    return len(json.dumps(rows, default=str))
+
+
+def peak_mb(func) -> float:
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 2 ** 20, 1)
+
+
+def main() -> None:
+    total = int_arg(1, 2_000_000)
+    service = ExportService(TestRepository())
+
+    events = populate(total)
+    formats = {}
+    for export_format in EXPORT_FORMATS:
+        if export_format == "arrow" and pa is None:
+            continue
+        for compress in (False, True):
+            name = f"{export_format}+gzip" if compress else export_format
+            formats[name] = measure_format(service, export_format, compress, events)
+
+    memory = {}
+    for volume in (total // 2, total):
+        count = populate(volume)
+        memory[str(count)] = {
+            "streaming_peak_mb": peak_mb(lambda: asyncio.run(consume(service, "ndjson", False))),
+            "naive_peak_mb": peak_mb(naive_export),
+        }
+    storage.reset()
+
+    emit("event_export", {
+        "stored_events": total + total // 10,
+        "exported_events": events,
+        "batch_size": service.batch_size,
+        "formats": formats,
+        "memory_by_exported_events": memory,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Carga de ingestão: um evento por chamada (`POST /conversion`) vs lotes
+(`POST /events/batch`), com o app ASGI executado no próprio processo.
+
+Requer httpx.
+
+Uso:
+    python -m bench.event_ingestion [eventos] [tamanho_lote]
+"""
+import asyncio
+import time
+
+import httpx
+
+import storage
+from bench.common import emit, int_arg
+from main import app
+
+
+TEST = {
+    "testId": "bench_ingest",
+    "name": "Bench",
+    "variants": [
+        {"variantId": "A", "distribution": 50, "sections": [{"id": "h", "contentUrl": "a"}]},
+        {"variantId": "B", "distribution": 50, "sections": [{"id": "h", "contentUrl": "b"}]},
+    ],
+}
+
+
+def conversion(i: int) -> dict:
+    return {"testId": TEST["testId"], "variantId": "AB"[i % 2], "event": "lead"}
+
+
+async def run_single(client: httpx.AsyncClient, total: int) -> float:
+    start = time.perf_counter()
+    for i in range(total):
+        response = await client.post("/conversion", json=conversion(i))
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run_batch(client: httpx.AsyncClient, total: int, batch_size: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, total, batch_size):
+        events = [conversion(i) for i in range(offset, min(offset + batch_size, total))]
+        response = await client.post("/events/batch", json={"conversions": events})
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def main() -> None:
+    total = int_arg(1, 20_000)
+    batch_size = int_arg(2, 1000)
+
+    storage.reset()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        (await client.post("/admin/test", json=TEST)).raise_for_status()
+        single = await run_single(client, total)
+        batch = await run_batch(client, total, batch_size)
+
+    storage.reset()
+    emit("event_ingestion", {
+        "events": total,
+        "batch_size": batch_size,
+        "single_events_per_sec": round(total / single),
+        "batch_events_per_sec": round(total / batch),
+        "speedup": round(single / batch, 1),
+    })
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
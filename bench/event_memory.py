@@ -0,0 +1,79 @@
+"""
+Memória por evento: lista de dicts (layout antigo) vs log colunar.
+
+O layout antigo é medido numa amostra e extrapolado, já que 10M dicts
+exigiriam vários GB; o log colunar é preenchido com o volume completo.
+
+Uso:
+    python -m bench.event_memory [eventos] [amostra_layout_antigo]
+"""
+import time
+import tracemalloc
+from datetime import datetime
+from uuid import uuid4
+
+from bench.common import emit, int_arg
+from event_log import EventLog, Interner
+
+
+TESTS = [f"landing_{i:03d}" for i in range(20)]
+VARIANTS = ["A", "B", "C"]
+
+
+def measure_legacy(sample: int) -> float:
+    """Bytes por impressão no formato dict + uuid + datetime."""
+    tracemalloc.start()
+    events = []
+    for i in range(sample):
+        events.append({
+            "id": str(uuid4()),
+            "testId": TESTS[i % len(TESTS)],
+            "variantId": VARIANTS[i % len(VARIANTS)],
+            "timestamp": datetime.utcnow(),
+        })
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / sample
+
+
+def measure_columnar(total: int) -> dict:
+    """Bytes por impressão no log colunar, com o volume completo."""
+    interner = Interner()
+    log = EventLog(interner)
+    tracemalloc.start()
+    start = time.perf_counter()
+    now = time.time()
+    for i in range(total):
+        log.append(TESTS[i % len(TESTS)], VARIANTS[i % len(VARIANTS)], timestamp=now)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "traced_bytes_per_event": round(current / total, 2),
+        "column_bytes_per_event": round(log.nbytes() / total, 2),
+        "appends_per_sec": round(total / elapsed),
+    }
+
+
+def main() -> None:
+    total = int_arg(1, 10_000_000)
+    sample = int_arg(2, 200_000)
+
+    legacy = measure_legacy(sample)
+    columnar = measure_columnar(total)
+    emit("event_memory", {
+        "events": total,
+        "legacy": {
+            "sample": sample,
+            "bytes_per_event": round(legacy, 2),
+            "projected_mb": round(legacy * total / 2 ** 20, 1),
+        },
+        "columnar": dict(
+            columnar,
+            projected_mb=round(columnar["traced_bytes_per_event"] * total / 2 ** 20, 1),
+        ),
+    })
+
+
+if __name__ == "__main__":
+    main()
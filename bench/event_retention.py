@@ -0,0 +1,97 @@
+"""
+Custo das operações por teste e da retenção com o log particionado.
+
+O armazenamento em memória recebe `eventos` impressões divididas entre
+`testes` testes, espalhadas por 8 horas. Com metade e com todo o volume:
+
+- `read_ms`: leitura de todos os eventos de um teste (`read_events`, só a
+  partição dele) contra varrer o log inteiro filtrando por teste, como
+  toda operação por teste fazia com as listas globais (`EventLog.__iter__`)
+- `purge_ms`: `delete_test_events` de um teste
+- `retention_ms`: `drop_events_before` descartando a primeira hora, com a
+  quantidade de segmentos e de eventos descartados
+
+Uso:
+    python -m bench.event_retention [eventos] [testes]
+"""
+import time
+
+import storage
+from bench.common import emit, int_arg
+
+
+START = 1_700_000_000.0
+SPAN = 8 * 3600.0
+VARIANTS = ("A", "B")
+
+
+def populate(total: int, tests: int) -> None:
+    storage.reset()
+    for index in range(tests):
+        storage.save_test(f"bench_retention_{index}", f"Teste {index}", [
+            {"variantId": variant, "distribution": 50, "sections": []} for variant in VARIANTS
+        ])
+    step = SPAN / total
+    batch = 100_000
+    for offset in range(0, total, batch):
+        storage.add_impressions([
+            (f"bench_retention_{i % tests}", VARIANTS[i % 2], START + i * step)
+            for i in range(offset, min(offset + batch, total))
+        ])
+
+
+def read_partition(test_id: str) -> int:
+    count = 0
+    position = 0
+    while position is not None:
+        batch, position = storage.read_events("impression", test_id, position, 16384)
+        count += len(batch.ids)
+    return count
+
+
+def scan_all(test_id: str) -> int:
+    return sum(1 for row in storage.impressions if row["testId"] == test_id)
+
+
+def elapsed_ms(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return round((time.perf_counter() - start) * 1e3, 3), result
+
+
+def measure(total: int, tests: int) -> dict:
+    populate(total, tests)
+    read_ms, read = elapsed_ms(read_partition, "bench_retention_0")
+    scan_ms, scanned = elapsed_ms(scan_all, "bench_retention_0")
+    assert read == scanned
+    purge_ms, purged = elapsed_ms(storage.delete_test_events, "bench_retention_1")
+    retention_ms, dropped = elapsed_ms(storage.drop_events_before, START + 3600.0)
+    return {
+        "events_per_test": read,
+        "read_ms": read_ms,
+        "full_scan_ms": scan_ms,
+        "purge_ms": purge_ms,
+        "purged_events": purged,
+        "retention_ms": retention_ms,
+        "dropped_segments": dropped["segments"],
+        "dropped_events": dropped["events"],
+        "segments_left": storage.impressions.segment_count(),
+    }
+
+
+def main() -> None:
+    total = int_arg(1, 2_000_000)
+    tests = int_arg(2, 50)
+    results = {
+        "tests": tests,
+        "segment_size": storage.impressions.segment_size,
+        "by_stored_events": {
+            str(volume): measure(volume, tests) for volume in (total // 2, total)
+        },
+    }
+    storage.reset()
+    emit("event_retention", results)
+
+
+if __name__ == "__main__":
+    main()
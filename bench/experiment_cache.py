@@ -0,0 +1,71 @@
+"""
+Custo de invalidação do cache de testes compilados de `/experiment`.
+
+Com N testes ativos e aquecidos, atualiza um único teste e mede a primeira
+rodada de requisições (uma por teste) logo depois. Compara a invalidação
+antiga, que descartava todos os testes compilados a cada alteração, com a
+invalidação por versão de teste, que recompila apenas o teste alterado.
+
+Uso:
+    python -m bench.experiment_cache [testes]
+"""
+import time
+
+import storage
+from bench.common import emit, int_arg
+from repositories.test_repository import TestRepository
+from services.test_service import TestService
+from services.variant_selector import VariantSelector
+
+
+VARIANTS = [
+    {
+        "variantId": v,
+        "distribution": 50,
+        "sections": [
+            {"id": "hero", "contentUrl": f"https://cdn.exemplo.com/{v}/hero.html"},
+            {"id": "cta", "contentUrl": f"https://cdn.exemplo.com/{v}/cta.html"},
+        ],
+    }
+    for v in ("A", "B")
+]
+
+
+def round_ms(service: TestService, test_ids) -> float:
+    """Tempo de uma requisição para cada teste, em milissegundos."""
+    start = time.perf_counter()
+    for test_id in test_ids:
+        service.get_experiment_payload(test_id, "visitor-1")
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def measure(tests: int, flush_all: bool) -> dict:
+    storage.reset()
+    service = TestService(TestRepository(), VariantSelector())
+    test_ids = [f"bench_cache_{i}" for i in range(tests)]
+    for test_id in test_ids:
+        service.create_test(test_id, test_id, VARIANTS)
+    round_ms(service, test_ids)
+
+    warm = round_ms(service, test_ids)
+    service.update_test(test_ids[0], "alterado", VARIANTS)
+    if flush_all:
+        # Comportamento antigo: qualquer alteração descartava todo o cache
+        service._routing.clear()
+    after_update = round_ms(service, test_ids)
+    return {"warm_round_ms": warm, "round_after_update_ms": after_update}
+
+
+def main() -> None:
+    tests = int_arg(1, 1000)
+    results = {
+        "tests": tests,
+        "flush_all": measure(tests, flush_all=True),
+        "per_test_version": measure(tests, flush_all=False),
+    }
+    storage.reset()
+    emit("experiment_cache", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Tempo de reinício do repositório com journal: snapshot + cauda vs replay
+completo de todos os segmentos.
+
+O snapshot apaga os segmentos anteriores a ele; para o replay completo,
+uma cópia desses segmentos é guardada antes do snapshot e recebe depois
+os segmentos da cauda. `journal_mb` é o que fica em disco com o
+snapshot; `full_journal_mb`, o journal inteiro.
+
+Uso:
+    python -m bench.journal_restart [eventos] [eventos_na_cauda]
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import storage
+from bench.common import emit, int_arg
+from repositories.journal import list_segments, segment_name
+from repositories.journal_repository import JournaledTestRepository
+
+
+BATCH = 50_000
+TESTS = [f"landing_{i:03d}" for i in range(20)]
+VARIANTS = ["A", "B", "C"]
+
+
+def write_events(repository: JournaledTestRepository, total: int) -> None:
+    now = time.time()
+    for offset in range(0, total, BATCH):
+        repository.add_impressions([
+            (TESTS[i % len(TESTS)], VARIANTS[i % len(VARIANTS)], now)
+            for i in range(offset, min(offset + BATCH, total))
+        ])
+
+
+def crash(repository: JournaledTestRepository) -> None:
+    """Fecha o journal sem o snapshot final, como numa queda do processo."""
+    repository._closed.set()
+    repository._snapshot_thread.join()
+    repository.journal.close()
+
+
+def restart(directory: str) -> float:
+    storage.reset()
+    start = time.perf_counter()
+    repository = JournaledTestRepository(directory, snapshot_interval=3600)
+    elapsed = time.perf_counter() - start
+    crash(repository)
+    return elapsed
+
+
+def copy_segments(source: str, target: str) -> None:
+    for sequence in list_segments(source):
+        name = segment_name(sequence)
+        shutil.copyfile(os.path.join(source, name), os.path.join(target, name))
+
+
+def directory_bytes(directory: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for name in os.listdir(directory)
+    )
+
+
+def main() -> None:
+    total = int_arg(1, 2_000_000)
+    tail = int_arg(2, 100_000)
+    directory = tempfile.mkdtemp(prefix="ab-journal-")
+    full_directory = tempfile.mkdtemp(prefix="ab-journal-full-")
+    try:
+        storage.reset()
+        repository = JournaledTestRepository(directory, snapshot_interval=3600)
+        write_events(repository, total - tail)
+        repository.journal.sync()
+        copy_segments(directory, full_directory)
+        repository.snapshot()
+        write_events(repository, tail)
+        crash(repository)
+        copy_segments(directory, full_directory)
+
+        journal_bytes = directory_bytes(directory)
+        full_journal_bytes = directory_bytes(full_directory)
+        with_snapshot = restart(directory)
+        restored = sum(count for _, _, count in storage.export_state()["impressions"])
+
+        full_replay = restart(full_directory)
+    finally:
+        storage.reset()
+        shutil.rmtree(directory, ignore_errors=True)
+        shutil.rmtree(full_directory, ignore_errors=True)
+
+    emit("journal_restart", {
+        "events": total,
+        "tail_events": tail,
+        "journal_mb": round(journal_bytes / 2 ** 20, 1),
+        "full_journal_mb": round(full_journal_bytes / 2 ** 20, 1),
+        "restored_impressions": restored,
+        "restart_with_snapshot_s": round(with_snapshot, 3),
+        "restart_full_replay_s": round(full_replay, 3),
+    })
+
+
+if __name__ == "__main__":
+    main()
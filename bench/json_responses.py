@@ -0,0 +1,182 @@
+"""
+Custo de serialização de cada tipo de resposta da API.
+
+Para cada modelo, mede em microssegundos por resposta:
+
+- `encoder`: serializadores isolados sobre o modelo já validado —
+  `jsonable_encoder` + `json.dumps` (o caminho do `response_model` nas
+  versões do FastAPI sem serialização direta pelo pydantic),
+  `model_dump_json` (usado por `core.serialization.dumps`), e orjson e o
+  `JSONEncoder` pré-criado sobre `model_dump()`
+- `http`: a requisição completa pelo app ASGI, retornando o modelo com
+  `response_model` (nova validação + serialização do FastAPI instalado)
+  contra retornar `FastJSONResponse` (o melhor de rodadas alternadas)
+
+Versões recentes do FastAPI já serializam o `response_model` pelo
+pydantic quando a rota não define uma classe de resposta; nelas a
+diferença em `http` se resume à validação do modelo.
+
+Uso:
+    python -m bench.json_responses [repeticoes] [rodadas]
+"""
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+
+from api.responses import FastJSONResponse
+from bench.common import emit, int_arg
+from bench.load import RawClient
+from core import serialization
+from schemas.models import (
+    AdminTestResponse,
+    AllTestsMetricsResponse,
+    ConversionResponse,
+    EventBatchResponse,
+    TestListItem,
+    TestMetricsResponse,
+    TestsListResponse,
+)
+
+
+def test_metrics(test_id: str, buckets: int) -> TestMetricsResponse:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return TestMetricsResponse(
+        testId=test_id,
+        variants=[
+            {
+                "variantId": variant,
+                "impressions": 24_000,
+                "conversions": 480,
+                "conversionRate": 0.02,
+                "conversionsByEvent": {"lead": 400, "purchase": 80},
+                "isControl": variant == "A",
+                "confidenceInterval": {"lower": 0.0183, "upper": 0.0218},
+                "pValue": None if variant == "A" else 0.0421,
+                "probabilityToBeatControl": None if variant == "A" else 0.979,
+                "series": [
+                    {
+                        "start": start + timedelta(hours=hour),
+                        "impressions": 1000,
+                        "conversions": 20,
+                        "conversionRate": 0.02,
+                        "conversionsByEvent": {"lead": 17, "purchase": 3},
+                    }
+                    for hour in range(buckets)
+                ],
+            }
+            for variant in ("A", "B")
+        ],
+        granularity="hour",
+        start=start,
+        end=start + timedelta(hours=buckets),
+    )
+
+
+def responses() -> Dict[str, object]:
+    return {
+        "conversion": ConversionResponse(ok=True),
+        "admin_test": AdminTestResponse(ok=True, message="Test created"),
+        "events_batch": EventBatchResponse(
+            ok=False, accepted=99, rejected=1,
+            errors=[{"type": "impression", "index": 7, "detail": "Test x not found"}],
+        ),
+        "tests_list": TestsListResponse(tests=[
+            TestListItem(testId=f"t{i}", name=f"Teste {i}", status="active", variantCount=2)
+            for i in range(50)
+        ]),
+        "test_metrics": test_metrics("t0", 24),
+        "all_metrics": AllTestsMetricsResponse(tests=[
+            test_metrics(f"t{i}", 0) for i in range(50)
+        ]),
+    }
+
+
+def per_call_us(func: Callable[[], object], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return round((time.perf_counter() - start) / number * 1e6, 3)
+
+
+def encoder_costs(model, number: int) -> Dict[str, float]:
+    costs = {
+        "jsonable_encoder_us": per_call_us(
+            lambda: json.dumps(
+                jsonable_encoder(model), ensure_ascii=False, allow_nan=False,
+                indent=None, separators=(",", ":")
+            ).encode("utf-8"),
+            number
+        ),
+        "model_dump_json_us": per_call_us(lambda: serialization.dumps(model), number),
+        "stdlib_us": per_call_us(
+            lambda: serialization._dumps_stdlib(model.model_dump()), number
+        ),
+    }
+    if serialization.orjson is not None:
+        costs["orjson_us"] = per_call_us(
+            lambda: serialization._dumps_orjson(model.model_dump()), number
+        )
+    return costs
+
+
+def add_routes(app: FastAPI, name: str, model) -> None:
+    """Rotas sem parâmetros que retornam o mesmo modelo pelos dois caminhos."""
+    async def default():
+        return model
+
+    async def fast():
+        return FastJSONResponse(model)
+
+    app.get(f"/default/{name}", response_model=type(model))(default)
+    app.get(f"/fast/{name}", response_model=type(model))(fast)
+
+
+def build_app(models: Dict[str, object]) -> FastAPI:
+    app = FastAPI()
+    for name, model in models.items():
+        add_routes(app, name, model)
+    return app
+
+
+async def http_costs(app: FastAPI, name: str, number: int, rounds: int) -> Dict[str, float]:
+    client = RawClient(app)
+    best = {"default": float("inf"), "fast": float("inf")}
+    for _ in range(rounds):
+        for mode in best:
+            path = f"/{mode}/{name}"
+            start = time.perf_counter()
+            for _ in range(number):
+                await client.request("GET", path, "", b"")
+            best[mode] = min(best[mode], (time.perf_counter() - start) / number * 1e6)
+    return {
+        "response_model_us": round(best["default"], 3),
+        "fast_response_us": round(best["fast"], 3),
+        "saved_us": round(best["default"] - best["fast"], 3),
+    }
+
+
+def main() -> None:
+    number = int_arg(1, 2000)
+    rounds = int_arg(2, 5)
+    models = responses()
+    app = build_app(models)
+    results = {"json_backend": serialization.JSON_BACKEND, "responses": {}}
+    for name, model in models.items():
+        # Respostas grandes: menos repetições para um tempo total parecido
+        size = len(serialization.dumps(model))
+        repeat = max(10, number * 200 // max(size, 200))
+        results["responses"][name] = {
+            "bytes": size,
+            "encoder": encoder_costs(model, repeat),
+            "http": asyncio.run(http_costs(app, name, max(20, repeat // 4), rounds)),
+        }
+    emit("json_responses", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Carga HTTP com o app ASGI de `main.py` executado no próprio processo.
+
+Sorteia as requisições segundo um mix (padrão: 95% `GET /experiment`,
+4% `POST /conversion` e 1% `GET /admin/test/{id}/metrics`) sobre N testes
+ativos com M variantes e as dispara com C requisições simultâneas.
+Reporta req/s e a latência p50/p95/p99 por endpoint e no total.
+
+O cliente padrão chama o app diretamente pela interface ASGI, sem o custo
+do httpx em cada requisição; `--client httpx` usa `httpx.ASGITransport`.
+O `lifespan` do app é executado, então o pipeline de impressões funciona
+como no servidor.
+
+Uso:
+    python -m bench.load [--requests N] [--concurrency C] [--tests N]
+        [--variants M] [--mix 95,4,1] [--client raw|httpx] [--seed S]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode
+
+import storage
+from bench.common import emit, percentiles
+
+
+ENDPOINTS = ("experiment", "conversion", "metrics")
+
+# (endpoint, método, caminho, query string, corpo)
+Request = Tuple[str, str, str, str, bytes]
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Lê o mix "experiment,conversion,metrics" (pesos relativos)."""
+    weights = [float(part) for part in value.split(",")]
+    if len(weights) != len(ENDPOINTS) or min(weights) < 0 or sum(weights) <= 0:
+        raise argparse.ArgumentTypeError(
+            "o mix deve ter três pesos não negativos, ex.: 95,4,1"
+        )
+    return dict(zip(ENDPOINTS, weights))
+
+
+def make_test(index: int, variants: int) -> dict:
+    return {
+        "testId": f"bench_load_{index}",
+        "name": f"Bench {index}",
+        "variants": [
+            {
+                "variantId": f"V{v}",
+                "distribution": 100 / variants,
+                "sections": [
+                    {"id": "hero", "contentUrl": f"https://cdn.exemplo.com/{index}/{v}/hero.html"},
+                    {"id": "cta", "contentUrl": f"https://cdn.exemplo.com/{index}/{v}/cta.html"},
+                ],
+            }
+            for v in range(variants)
+        ],
+    }
+
+
+def plan(total: int, tests: int, variants: int, mix: Dict[str, float], seed: int) -> List[Request]:
+    """Sequência de requisições sorteada antes da medição."""
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=total)
+    requests: List[Request] = []
+    for kind in kinds:
+        test_id = f"bench_load_{rng.randrange(tests)}"
+        if kind == "experiment":
+            query = urlencode({"testId": test_id, "visitorId": f"visitor-{rng.randrange(1_000_000)}"})
+            requests.append((kind, "GET", "/experiment", query, b""))
+        elif kind == "conversion":
+            body = json.dumps({
+                "testId": test_id,
+                "variantId": f"V{rng.randrange(variants)}",
+                "event": "lead",
+            }).encode()
+            requests.append((kind, "POST", "/conversion", "", body))
+        else:
+            requests.append((kind, "GET", f"/admin/test/{test_id}/metrics", "", b""))
+    return requests
+
+
+class RawClient:
+    """Chama o app ASGI diretamente, sem camada de transporte."""
+
+    def __init__(self, application):
+        self.app = application
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        query: str,
+        body: bytes,
+        content_type: str = "application/json"
+    ) -> int:
+        headers = [(b"host", b"bench")]
+        if body:
+            headers.append((b"content-type", content_type.encode("latin-1")))
+            headers.append((b"content-length", str(len(body)).encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+        pending = [{"type": "http.request", "body": body, "more_body": False}]
+        status = 0
+
+        async def receive():
+            if pending:
+                return pending.pop()
+            # Cliente conectado até o fim da resposta
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        # Como a leitura do socket no servidor, cede o event loop antes de
+        # cada requisição: com rotas que terminam sem suspender, uma única
+        # tarefa do cliente monopolizaria o loop
+        await asyncio.sleep(0)
+        await self.app(scope, receive, send)
+        return status
+
+    async def aclose(self) -> None:
+        pass
+
+
+class HttpxClient:
+    """Cliente httpx com `ASGITransport`."""
+
+    def __init__(self, application):
+        import httpx
+
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=application), base_url="http://bench"
+        )
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        query: str,
+        body: bytes,
+        content_type: str = "application/json"
+    ) -> int:
+        url = f"{path}?{query}" if query else path
+        headers = {"content-type": content_type} if body else None
+        response = await self.client.request(method, url, content=body or None, headers=headers)
+        return response.status_code
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+async def run(client, requests: List[Request], concurrency: int) -> Tuple[Dict[str, List[float]], int, float]:
+    """Dispara as requisições com `concurrency` tarefas; retorna latências em ms."""
+    latencies: Dict[str, List[float]] = {kind: [] for kind in ENDPOINTS}
+    errors = 0
+    position = 0
+
+    async def worker() -> None:
+        nonlocal errors, position
+        while position < len(requests):
+            kind, method, path, query, body = requests[position]
+            position += 1
+            start = time.perf_counter()
+            status = await client.request(method, path, query, body)
+            latencies[kind].append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def main(args: argparse.Namespace) -> dict:
+    # Importado aqui: outros benchmarks usam este módulo e podem ajustar
+    # as configurações (variáveis AB_*) antes de o app ser criado
+    from main import app
+
+    storage.reset()
+    async with app.router.lifespan_context(app):
+        client = RawClient(app) if args.client == "raw" else HttpxClient(app)
+        try:
+            for index in range(args.tests):
+                body = json.dumps(make_test(index, args.variants)).encode()
+                status = await client.request("POST", "/admin/test", "", body)
+                if status != 200:
+                    raise RuntimeError(f"falha ao criar o teste {index}: HTTP {status}")
+
+            warmup = plan(args.warmup, args.tests, args.variants, args.mix, args.seed + 1)
+            await run(client, warmup, args.concurrency)
+            requests = plan(args.requests, args.tests, args.variants, args.mix, args.seed)
+            latencies, errors, elapsed = await run(client, requests, args.concurrency)
+        finally:
+            await client.aclose()
+    storage.reset()
+
+    everything = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "client": args.client,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "tests": args.tests,
+        "variants": args.variants,
+        "mix": args.mix,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_sec": round(len(requests) / elapsed),
+        "latency": percentiles(everything),
+        "endpoints": {
+            kind: {"count": len(samples), **percentiles(samples)}
+            for kind, samples in latencies.items()
+            if samples
+        },
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bench.load")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--warmup", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--tests", type=int, default=50)
+    parser.add_argument("--variants", type=int, default=2)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("95,4,1"))
+    parser.add_argument("--client", choices=("raw", "httpx"), default="raw")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    emit("load", asyncio.run(main(parse_args())))
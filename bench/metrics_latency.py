@@ -0,0 +1,82 @@
+"""
+Latência de `MetricsService.get_test_metrics` em função do volume de eventos.
+
+Compara a varredura linear antiga (soma sobre as listas globais) com o
+índice de contadores mantido na escrita.
+
+Uso:
+    python -m bench.metrics_latency [max_eventos]
+"""
+import storage
+from bench.common import emit, int_arg, time_call
+from repositories.test_repository import TestRepository
+from services.metrics_service import MetricsService
+
+
+TEST_ID = "bench_metrics"
+VARIANTS = ["A", "B", "C", "D"]
+
+
+def legacy_count(events, test_id: str, variant_id: str) -> int:
+    """Contagem por varredura linear, como era feito antes do índice."""
+    return sum(
+        1 for e in events
+        if e["testId"] == test_id and e["variantId"] == variant_id
+    )
+
+
+# Cópia dos eventos no formato antigo (lista de dicts) para a medição "before"
+legacy_impressions: list = []
+legacy_conversions: list = []
+
+
+def legacy_metrics(test_id: str) -> None:
+    """Reproduz o custo antigo: duas varreduras completas por variante."""
+    for variant_id in VARIANTS:
+        legacy_count(legacy_impressions, test_id, variant_id)
+        legacy_count(legacy_conversions, test_id, variant_id)
+
+
+def populate(total: int) -> None:
+    """Gera `total` eventos, 10% deles conversões, espalhados entre testes."""
+    storage.reset()
+    legacy_impressions.clear()
+    legacy_conversions.clear()
+    storage.save_test(
+        TEST_ID,
+        "Bench",
+        [{"variantId": v, "distribution": 25, "sections": []} for v in VARIANTS],
+    )
+    for i in range(total):
+        # Metade do tráfego pertence a outros testes, como em produção
+        test_id = TEST_ID if i % 2 == 0 else f"other_{i % 7}"
+        variant_id = VARIANTS[i % len(VARIANTS)]
+        if i % 10 == 0:
+            legacy_conversions.append(storage.add_conversion(test_id, variant_id, "lead"))
+        else:
+            legacy_impressions.append(storage.add_impression(test_id, variant_id))
+
+
+def main() -> None:
+    max_events = int_arg(1, 1_000_000)
+    service = MetricsService(TestRepository())
+
+    results = []
+    volume = 10_000
+    while volume <= max_events:
+        populate(volume)
+        results.append({
+            "events": volume,
+            "before": time_call(lambda: legacy_metrics(TEST_ID), repeat=3),
+            "after": time_call(lambda: service.get_test_metrics(TEST_ID), repeat=50),
+        })
+        volume *= 10
+
+    storage.reset()
+    legacy_impressions.clear()
+    legacy_conversions.clear()
+    emit("metrics_latency", results)
+
+
+if __name__ == "__main__":
+    main()
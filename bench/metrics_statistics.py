@@ -0,0 +1,100 @@
+"""
+Latência das métricas com significância estatística para todos os testes.
+
+Carrega contadores de N testes x M variantes (via `storage.import_state`,
+sem gerar eventos brutos) e mede:
+
+- `compare_to_control` sozinho, com NumPy (se instalado) e em Python puro
+- `MetricsService.get_all_metrics` completo (contadores + modelos + estatística)
+
+O cenário "low_traffic" usa poucas impressões por variante, o que força a
+soma exata da probabilidade bayesiana em vez da aproximação normal.
+
+Uso:
+    python -m bench.metrics_statistics [testes] [variantes]
+"""
+import random
+
+import storage
+from bench.common import emit, int_arg, time_call
+from core.config import settings
+from repositories.test_repository import TestRepository
+from services import statistics
+from services.metrics_service import MetricsService
+
+
+def populate(tests: int, variants: int, max_impressions: int) -> None:
+    """Cria os testes e seus contadores agregados."""
+    rng = random.Random(42)
+    state = {"tests": [], "impressions": [], "conversions": []}
+    for t in range(tests):
+        test_id = f"bench_stats_{t}"
+        state["tests"].append({
+            "testId": test_id,
+            "name": test_id,
+            "status": "active",
+            "variants": [
+                {"variantId": f"v{v}", "distribution": 100 / variants, "sections": []}
+                for v in range(variants)
+            ],
+        })
+        for v in range(variants):
+            impressions = rng.randint(max_impressions // 2, max_impressions)
+            conversions = int(impressions * rng.uniform(0.02, 0.12))
+            state["impressions"].append([test_id, f"v{v}", impressions])
+            state["conversions"].append([test_id, f"v{v}", "lead", conversions])
+    storage.reset()
+    storage.import_state(state)
+
+
+def engine_inputs(tests: int, variants: int):
+    """Arrays planos no formato de `compare_to_control`."""
+    impressions, conversions, controls = [], [], []
+    for t in range(tests):
+        test_id = f"bench_stats_{t}"
+        control = len(impressions)
+        for v in range(variants):
+            impressions.append(storage.count_impressions(test_id, f"v{v}"))
+            conversions.append(storage.count_conversions(test_id, f"v{v}"))
+            controls.append(control)
+    return impressions, conversions, controls
+
+
+def run_engine(inputs, use_numpy: bool) -> None:
+    saved = statistics.np
+    if not use_numpy:
+        statistics.np = None
+    try:
+        statistics.compare_to_control(
+            *inputs,
+            normal_approx_min=settings.METRICS_NORMAL_APPROX_MIN
+        )
+    finally:
+        statistics.np = saved
+
+
+def main() -> None:
+    tests = int_arg(1, 500)
+    variants = int_arg(2, 10)
+    service = MetricsService(TestRepository())
+
+    results = {"tests": tests, "variants": variants, "numpy": statistics.np is not None}
+    for scenario, max_impressions in (("high_traffic", 50_000), ("low_traffic", 40)):
+        populate(tests, variants, max_impressions)
+        inputs = engine_inputs(tests, variants)
+        scenario_results = {
+            "engine_python": time_call(lambda: run_engine(inputs, False), repeat=3),
+            "get_all_metrics": time_call(service.get_all_metrics, repeat=10),
+        }
+        if statistics.np is not None:
+            scenario_results["engine_numpy"] = time_call(
+                lambda: run_engine(inputs, True), repeat=10
+            )
+        results[scenario] = scenario_results
+
+    storage.reset()
+    emit("metrics_statistics", results)
+
+
+if __name__ == "__main__":
+    main()
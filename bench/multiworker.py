@@ -0,0 +1,91 @@
+"""
+Escalabilidade do modo "shared" com vários processos.
+
+Cada processo simula um worker do uvicorn: cria seu próprio
+`SharedTestRepository` no mesmo diretório e executa atribuições
+(`get_experiment_payload`, que registra a impressão). Ao final, confere
+que as contagens somadas entre os workers batem com o total executado.
+
+Uso:
+    python -m bench.multiworker [operacoes_por_worker] [max_workers]
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from bench.common import emit, int_arg
+
+
+TEST_ID = "bench_shared"
+VARIANTS = [
+    {"variantId": "A", "distribution": 50, "sections": [{"id": "h", "contentUrl": "a"}]},
+    {"variantId": "B", "distribution": 50, "sections": [{"id": "h", "contentUrl": "b"}]},
+]
+
+
+def worker(directory: str, operations: int, start_barrier, results) -> None:
+    from repositories.shared_repository import SharedTestRepository
+    from services.test_service import TestService
+    from services.variant_selector import VariantSelector
+
+    repository = SharedTestRepository(directory)
+    service = TestService(repository, VariantSelector())
+    start_barrier.wait()
+    start = time.perf_counter()
+    for i in range(operations):
+        service.get_experiment_payload(TEST_ID, f"visitor-{os.getpid()}-{i}")
+    results.put(time.perf_counter() - start)
+    repository.close()
+
+
+def run(workers: int, operations: int) -> dict:
+    from repositories.shared_repository import SharedTestRepository
+
+    directory = tempfile.mkdtemp(prefix="ab-shared-")
+    try:
+        admin = SharedTestRepository(directory)
+        admin.save_test(TEST_ID, "Bench", VARIANTS)
+
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(workers)
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(directory, operations, barrier, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        elapsed = max(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+
+        counted = sum(admin.count_impressions(TEST_ID, v["variantId"]) for v in VARIANTS)
+        admin.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    total = workers * operations
+    return {
+        "workers": workers,
+        "ops_per_sec": round(total / elapsed),
+        "expected_impressions": total,
+        "counted_impressions": counted,
+    }
+
+
+def main() -> None:
+    operations = int_arg(1, 100_000)
+    max_workers = int_arg(2, os.cpu_count() or 1)
+
+    results = []
+    workers = 1
+    while workers <= max_workers:
+        results.append(run(workers, operations))
+        workers *= 2
+    emit("multiworker", results)
+
+
+if __name__ == "__main__":
+    main()
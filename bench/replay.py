@@ -0,0 +1,220 @@
+"""
+Replay de uma captura de tráfego (`AB_CAPTURE_ENABLED=1`) no app ASGI de
+`main.py`, executado no próprio processo.
+
+O arquivo é lido em streaming, linha a linha. Velocidades:
+
+- `original`: cada requisição sai no mesmo instante relativo da captura
+- um número (ex.: `4`): os intervalos da captura divididos pelo fator
+- `max`: sem pausas, com até `--concurrency` requisições simultâneas;
+  alterações em `/admin` são executadas sozinhas, na ordem da captura
+
+Nos modos com tempo, as requisições são disparadas sem esperar as
+anteriores (até `--max-inflight` em andamento); `schedule_lag` mostra
+quanto o replay atrasou em relação ao agendado.
+
+Reporta, por rota, a latência do replay e a latência registrada na
+captura, para comparar com a produção. Sem `--state`, o replay começa com
+o armazenamento vazio: a captura deve incluir a criação dos testes, ou o
+estado pode vir de um snapshot do journal ou de `storage.export_state`.
+
+Uso:
+    python -m bench.replay CAPTURA [--speed original|N|max] [--concurrency C]
+        [--max-inflight N] [--state ARQUIVO] [--limit N]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+import storage
+from bench.common import emit, percentiles
+from bench.load import RawClient
+from main import app
+
+
+def parse_speed(value: str) -> Optional[float]:
+    """"original" = 1.0, "max" = None (sem pausas), ou um fator positivo."""
+    if value == "original":
+        return 1.0
+    if value == "max":
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("a velocidade deve ser positiva")
+    return speed
+
+
+def read_capture(path: str) -> Iterator[dict]:
+    """Lê as linhas da captura sem carregar o arquivo inteiro."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def entry_body(entry: dict) -> bytes:
+    if "body" in entry:
+        return entry["body"].encode("utf-8")
+    if "bodyBase64" in entry:
+        return base64.b64decode(entry["bodyBase64"])
+    return b""
+
+
+class RouteStats:
+    """Latências e status de uma rota."""
+
+    def __init__(self):
+        self.replayed: List[float] = []
+        self.captured: List[float] = []
+        self.statuses: Dict[str, int] = {}
+
+    def report(self) -> dict:
+        return {
+            "count": len(self.replayed),
+            "statuses": self.statuses,
+            "replay": percentiles(self.replayed),
+            "captured": percentiles(self.captured),
+        }
+
+
+class Replay:
+    """Executa as requisições da captura e agrega os resultados por rota."""
+
+    def __init__(self, client: RawClient):
+        self.client = client
+        self.routes: Dict[str, RouteStats] = {}
+        self.lag: List[float] = []
+        self.omitted_bodies = 0
+
+    async def send(self, entry: dict) -> None:
+        if entry.get("bodyOmitted"):
+            self.omitted_bodies += 1
+        start = time.perf_counter()
+        status = await self.client.request(
+            entry["method"],
+            entry["path"],
+            entry.get("query") or "",
+            entry_body(entry),
+            entry.get("contentType") or "application/json",
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        route = f"{entry['method']} {entry.get('route') or entry['path']}"
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = RouteStats()
+        stats.replayed.append(elapsed)
+        if "durationMs" in entry:
+            stats.captured.append(entry["durationMs"])
+        stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+
+    async def run_max(self, entries: Iterator[dict], concurrency: int) -> None:
+        loop = asyncio.get_running_loop()
+        inflight = asyncio.Semaphore(concurrency)
+        tasks = set()
+        for entry in entries:
+            if entry["method"] != "GET" and entry["path"].startswith("/admin/"):
+                # Alterações de testes esperam as requisições anteriores e
+                # só então liberam as seguintes, preservando a ordem da captura
+                if tasks:
+                    await asyncio.gather(*tasks)
+                await self.send(entry)
+                continue
+            await inflight.acquire()
+            self._spawn(loop, tasks, inflight, entry)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def run_timed(self, entries: Iterator[dict], speed: float, max_inflight: int) -> None:
+        loop = asyncio.get_running_loop()
+        inflight = asyncio.Semaphore(max_inflight)
+        tasks = set()
+        first_ts = None
+        start = loop.time()
+        for entry in entries:
+            if first_ts is None:
+                first_ts = entry["ts"]
+            due = start + (entry["ts"] - first_ts) / speed
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await inflight.acquire()
+            self.lag.append(max(0.0, loop.time() - due) * 1000)
+            self._spawn(loop, tasks, inflight, entry)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def _spawn(self, loop, tasks: set, inflight: asyncio.Semaphore, entry: dict) -> None:
+        """Dispara a requisição sem esperar a resposta (libera o semáforo ao fim)."""
+        async def send() -> None:
+            try:
+                await self.send(entry)
+            finally:
+                inflight.release()
+
+        task = loop.create_task(send())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+
+def load_state(path: str) -> None:
+    """Carrega testes e contadores (snapshot do journal ou `export_state`)."""
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    storage.import_state(state.get("state", state))
+
+
+async def main(args: argparse.Namespace) -> dict:
+    storage.reset()
+    if args.state:
+        load_state(args.state)
+    entries = read_capture(args.capture)
+    if args.limit:
+        entries = islice(entries, args.limit)
+
+    replay = Replay(RawClient(app))
+    async with app.router.lifespan_context(app):
+        start = time.perf_counter()
+        if args.speed is None:
+            await replay.run_max(entries, args.concurrency)
+        else:
+            await replay.run_timed(entries, args.speed, args.max_inflight)
+        elapsed = time.perf_counter() - start
+    storage.reset()
+
+    total = sum(len(stats.replayed) for stats in replay.routes.values())
+    results = {
+        "capture": args.capture,
+        "speed": "max" if args.speed is None else args.speed,
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_sec": round(total / elapsed) if elapsed > 0 else 0,
+        "omitted_bodies": replay.omitted_bodies,
+        "latency": percentiles([
+            sample for stats in replay.routes.values() for sample in stats.replayed
+        ]),
+        "routes": {
+            route: stats.report() for route, stats in sorted(replay.routes.items())
+        },
+    }
+    if args.speed is not None:
+        results["schedule_lag"] = percentiles(replay.lag)
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bench.replay")
+    parser.add_argument("capture", help="arquivo JSONL gerado pela captura")
+    parser.add_argument("--speed", type=parse_speed, default=parse_speed("original"))
+    parser.add_argument("--concurrency", type=int, default=32, help="modo max")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="modos com tempo")
+    parser.add_argument("--state", help="snapshot do journal ou JSON de export_state")
+    parser.add_argument("--limit", type=int, help="replay só das N primeiras requisições")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    emit("replay", asyncio.run(main(parse_args())))
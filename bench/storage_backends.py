@@ -0,0 +1,79 @@
+"""
+Backend em memória vs SQLite: vazão de inserção (unitária e em lote) e
+latência de métricas.
+
+Uso:
+    python -m bench.storage_backends [eventos] [tamanho_lote]
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import storage
+from bench.common import emit, int_arg, time_call
+from repositories.sqlite_repository import SQLiteTestRepository
+from repositories.test_repository import TestRepository
+from services.metrics_service import MetricsService
+
+
+TEST_ID = "bench_backends"
+VARIANTS = ["A", "B", "C", "D"]
+
+
+def measure(repository: TestRepository, total: int, batch_size: int) -> dict:
+    repository.save_test(
+        TEST_ID,
+        "Bench",
+        [{"variantId": v, "distribution": 25, "sections": []} for v in VARIANTS],
+    )
+
+    single = min(total, 10_000)
+    start = time.perf_counter()
+    for i in range(single):
+        repository.add_impression(TEST_ID, VARIANTS[i % len(VARIANTS)])
+    single_elapsed = time.perf_counter() - start
+
+    now = time.time()
+    start = time.perf_counter()
+    for offset in range(0, total, batch_size):
+        repository.add_impressions([
+            (TEST_ID, VARIANTS[i % len(VARIANTS)], now)
+            for i in range(offset, min(offset + batch_size, total))
+        ])
+    batch_elapsed = time.perf_counter() - start
+
+    service = MetricsService(repository)
+    return {
+        "single_inserts_per_sec": round(single / single_elapsed),
+        "batch_inserts_per_sec": round(total / batch_elapsed),
+        "metrics": time_call(lambda: service.get_test_metrics(TEST_ID), repeat=50),
+    }
+
+
+def main() -> None:
+    total = int_arg(1, 500_000)
+    batch_size = int_arg(2, 1000)
+
+    storage.reset()
+    memory = measure(TestRepository(), total, batch_size)
+    storage.reset()
+
+    directory = tempfile.mkdtemp(prefix="ab-sqlite-")
+    try:
+        repository = SQLiteTestRepository(os.path.join(directory, "bench.sqlite3"))
+        sqlite = measure(repository, total, batch_size)
+        repository.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    emit("storage_backends", {
+        "events": total,
+        "batch_size": batch_size,
+        "memory": memory,
+        "sqlite": sqlite,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Escritas concorrentes no armazenamento em memória: exatidão dos contadores
+e throughput com 1 a N threads.
+
+Cada thread escritora grava impressões e conversões (`add_impression` e
+`add_conversion`, alternadas) em poucas chaves, enquanto uma thread leitora
+consulta contadores e rollups e salva testes sem parar. Ao final, os
+contadores e rollups são conferidos com o total escrito.
+
+Modos:
+- `sharded`: o `storage.py` atual (shards por thread, testes copy-on-write)
+- `legacy`: contadores em dicts globais sem sincronização (como antes),
+  para mostrar incrementos perdidos
+
+`purge`: as escritoras gravam em um único teste enquanto outra thread
+chama `delete_test_events` sem parar. Ao final, os contadores de cada
+variante devem bater com os eventos brutos que restaram no log. Compara
+a exclusão atual (`locked`, com os shards travados) com a exclusão sem
+sincronização (`unlocked`, como antes), em que um incremento lido antes
+da exclusão regrava o valor antigo ou um evento descartado é contado.
+
+O intervalo de troca de threads do interpretador é reduzido durante a
+medição para forçar intercalações.
+
+Uso:
+    python -m bench.storage_concurrency [escritas_por_thread] [max_threads]
+"""
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+
+import storage
+from bench.common import emit, int_arg
+from event_log import EventLog, Interner, to_datetime
+
+
+KEYS = [(f"bench_test_{t}", f"V{v}") for t in range(4) for v in range(2)]
+TIMESTAMP = 1_700_000_000.0
+SWITCH_INTERVAL = 1e-5
+
+
+class LegacyCounters:
+    """
+    Log de eventos + contadores e rollups em dicts compartilhados sem lock
+    (a escrita do `storage.py` antes dos shards).
+    """
+
+    def __init__(self):
+        interner = Interner()
+        self.impressions = EventLog(interner)
+        self.conversions = EventLog(interner, with_event=True)
+        self.impression_counts: Dict[Tuple[str, str], int] = {}
+        self.conversion_counts: Dict[Tuple[str, str], int] = {}
+        self.conversion_event_counts: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self.impression_rollups: Dict[Tuple[str, str, str], Dict[int, int]] = {}
+        self.conversion_rollups: Dict[Tuple[str, str, str], Dict[int, Dict[str, int]]] = {}
+        self.tests: Dict[str, dict] = {}
+
+    def add_impression(self, test_id: str, variant_id: str, timestamp: float) -> dict:
+        event_id, timestamp = self.impressions.append(test_id, variant_id, timestamp=timestamp)
+        key = (test_id, variant_id)
+        self.impression_counts[key] = self.impression_counts.get(key, 0) + 1
+        for granularity, step in storage.ROLLUP_GRANULARITIES.items():
+            buckets = self.impression_rollups.get((test_id, variant_id, granularity))
+            if buckets is None:
+                buckets = self.impression_rollups.setdefault((test_id, variant_id, granularity), {})
+            bucket = int(timestamp // step) * step
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        return {
+            "id": str(event_id),
+            "testId": test_id,
+            "variantId": variant_id,
+            "timestamp": to_datetime(timestamp)
+        }
+
+    def add_conversion(self, test_id: str, variant_id: str, event: str, timestamp: float) -> dict:
+        event_id, timestamp = self.conversions.append(test_id, variant_id, event, timestamp)
+        key = (test_id, variant_id)
+        self.conversion_counts[key] = self.conversion_counts.get(key, 0) + 1
+        by_event = self.conversion_event_counts.setdefault(key, {})
+        by_event[event] = by_event.get(event, 0) + 1
+        for granularity, step in storage.ROLLUP_GRANULARITIES.items():
+            buckets = self.conversion_rollups.get((test_id, variant_id, granularity))
+            if buckets is None:
+                buckets = self.conversion_rollups.setdefault((test_id, variant_id, granularity), {})
+            bucket = int(timestamp // step) * step
+            by_event = buckets.get(bucket)
+            if by_event is None:
+                by_event = buckets.setdefault(bucket, {})
+            by_event[event] = by_event.get(event, 0) + 1
+        return {
+            "id": str(event_id),
+            "testId": test_id,
+            "variantId": variant_id,
+            "event": event,
+            "timestamp": to_datetime(timestamp)
+        }
+
+    def count_impressions(self, test_id: str, variant_id: str) -> int:
+        return self.impression_counts.get((test_id, variant_id), 0)
+
+    def count_conversions_by_event(self, test_id: str, variant_id: str) -> Dict[str, int]:
+        return dict(self.conversion_event_counts.get((test_id, variant_id), {}))
+
+    def get_rollups(self, test_id: str, variant_id: str, granularity: str) -> list:
+        key = (test_id, variant_id, granularity)
+        impression_buckets = self.impression_rollups.get(key, {})
+        conversion_buckets = self.conversion_rollups.get(key, {})
+        return [
+            (bucket, impression_buckets.get(bucket, 0), dict(conversion_buckets.get(bucket) or {}))
+            for bucket in sorted(set(impression_buckets) | set(conversion_buckets))
+        ]
+
+    def save_test(self, test_id: str, name: str, variants: list, status: str) -> None:
+        self.tests[test_id] = {
+            "testId": test_id, "name": name, "variants": variants, "status": status
+        }
+
+    def get_all_tests(self) -> List[dict]:
+        return list(self.tests.values())
+
+    def totals(self) -> Dict[str, int]:
+        return {
+            "impressions": sum(self.impression_counts.values()),
+            "conversions": sum(self.conversion_counts.values()),
+            "impression_rollups": sum(
+                sum(buckets.values())
+                for (_, _, granularity), buckets in self.impression_rollups.items()
+                if granularity == "minute"
+            ),
+        }
+
+
+def sharded_totals() -> Dict[str, int]:
+    return {
+        "impressions": sum(storage.count_impressions(t, v) for t, v in KEYS),
+        "conversions": sum(storage.count_conversions(t, v) for t, v in KEYS),
+        "impression_rollups": sum(
+            impressions
+            for t, v in KEYS
+            for _, impressions, _ in storage.get_rollups(t, v, "minute")
+        ),
+    }
+
+
+def writer(add_impression: Callable, add_conversion: Callable, writes: int, offset: int) -> None:
+    for i in range(writes):
+        test_id, variant_id = KEYS[(i + offset) % len(KEYS)]
+        if i % 2:
+            add_conversion(test_id, variant_id, "lead", TIMESTAMP)
+        else:
+            add_impression(test_id, variant_id, TIMESTAMP)
+
+
+def reader(target, stop: threading.Event, reads: List[int], errors: List[str]) -> None:
+    """
+    Lê contadores e rollups e salva testes até as escritoras terminarem.
+
+    `target` é o módulo `storage` ou um `LegacyCounters` (mesmos métodos).
+    """
+    count = 0
+    try:
+        while not stop.is_set():
+            for test_id, variant_id in KEYS:
+                target.count_impressions(test_id, variant_id)
+                target.count_conversions_by_event(test_id, variant_id)
+                target.get_rollups(test_id, variant_id, "minute")
+            target.save_test("bench_reader", "Leitora", [], "active")
+            target.get_all_tests()
+            count += 1
+    except Exception as exc:  # o que importa é se houve erro, não qual
+        errors.append(repr(exc))
+    reads.append(count)
+
+
+def run(mode: str, threads: int, writes: int) -> dict:
+    storage.reset()
+    target = LegacyCounters() if mode == "legacy" else storage
+
+    stop = threading.Event()
+    reads: List[int] = []
+    errors: List[str] = []
+    read_thread = threading.Thread(target=reader, args=(target, stop, reads, errors))
+    writers = [
+        threading.Thread(target=writer, args=(target.add_impression, target.add_conversion, writes, n))
+        for n in range(threads)
+    ]
+    read_thread.start()
+    start = time.perf_counter()
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    read_thread.join()
+
+    expected_impressions = threads * ((writes + 1) // 2)
+    expected = {
+        "impressions": expected_impressions,
+        "conversions": threads * (writes // 2),
+        "impression_rollups": expected_impressions,
+    }
+    totals = target.totals() if mode == "legacy" else sharded_totals()
+    storage.reset()
+    return {
+        "threads": threads,
+        "writes_per_sec": round(threads * writes / elapsed),
+        "reader_passes": reads[0] if reads else 0,
+        "lost_updates": {key: expected[key] - totals[key] for key in expected},
+        "exact": totals == expected,
+        "reader_errors": errors,
+    }
+
+
+PURGE_TEST = "bench_purge"
+PURGE_VARIANTS = ("A", "B")
+
+
+def unlocked_delete(test_id: str) -> int:
+    """`delete_test_events` sem travar os shards (a exclusão anterior)."""
+    dropped = storage.impressions.drop_test(test_id) + storage.conversions.drop_test(test_id)
+    storage._drop_test_counts(storage._read_shards(), test_id, PURGE_VARIANTS)
+    return dropped
+
+
+def purge_writer(writes: int, offset: int) -> None:
+    for i in range(writes):
+        variant_id = PURGE_VARIANTS[(i + offset) % len(PURGE_VARIANTS)]
+        if i % 2:
+            storage.add_conversion(PURGE_TEST, variant_id, "lead", TIMESTAMP)
+        else:
+            storage.add_impression(PURGE_TEST, variant_id, TIMESTAMP)
+
+
+def logged_events(kind: str) -> Counter:
+    """Eventos brutos do teste no log, por variante."""
+    counts: Counter = Counter()
+    position = 0
+    while position is not None:
+        batch, position = storage.read_events(kind, PURGE_TEST, position, 16384)
+        counts.update(batch.variants)
+    return counts
+
+
+def run_purge(mode: str, threads: int, writes: int) -> dict:
+    storage.reset()
+    delete = storage.delete_test_events if mode == "locked" else unlocked_delete
+    stop = threading.Event()
+    purges = [0]
+
+    def purger() -> None:
+        while not stop.is_set():
+            delete(PURGE_TEST)
+            purges[0] += 1
+
+    purge_thread = threading.Thread(target=purger)
+    writers = [
+        threading.Thread(target=purge_writer, args=(writes, n)) for n in range(threads)
+    ]
+    purge_thread.start()
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    purge_thread.join()
+
+    impressions = logged_events("impression")
+    conversions = logged_events("conversion")
+    mismatched = {
+        variant_id: {
+            "impressions": storage.count_impressions(PURGE_TEST, variant_id)
+            - impressions[variant_id],
+            "conversions": storage.count_conversions(PURGE_TEST, variant_id)
+            - conversions[variant_id],
+        }
+        for variant_id in PURGE_VARIANTS
+    }
+    storage.reset()
+    return {
+        "threads": threads,
+        "purges": purges[0],
+        "counts_minus_logged": mismatched,
+        "exact": all(not any(diff.values()) for diff in mismatched.values()),
+    }
+
+
+def main() -> None:
+    writes = int_arg(1, 100_000)
+    max_threads = int_arg(2, 16)
+    counts = []
+    threads = 1
+    while threads <= max_threads:
+        counts.append(threads)
+        threads *= 2
+
+    saved = sys.getswitchinterval()
+    sys.setswitchinterval(SWITCH_INTERVAL)
+    try:
+        results = {
+            "writes_per_thread": writes,
+            "switch_interval_s": SWITCH_INTERVAL,
+            "free_threaded": bool(sysconfig.get_config_var("Py_GIL_DISABLED")),
+            "modes": {
+                mode: [run(mode, n, writes) for n in counts]
+                for mode in ("sharded", "legacy")
+            },
+            "purge": {
+                mode: [run_purge(mode, n, writes) for n in counts]
+                for mode in ("locked", "unlocked")
+            },
+        }
+    finally:
+        sys.setswitchinterval(saved)
+    emit("storage_concurrency", results)
+
+
+if __name__ == "__main__":
+    main()
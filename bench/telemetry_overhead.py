@@ -0,0 +1,138 @@
+"""
+Custo da telemetria no caminho de `/experiment`.
+
+Mede, no mesmo processo, com `telemetry.enabled` ligado e desligado em
+rodadas alternadas (o melhor de cada lado, para reduzir o ruído):
+
+- `service`: `TestService.get_experiment_payload` (histograma da seleção
+  de variante, que também conta as atribuições)
+- `middleware`: `TelemetryMiddleware` em volta de um app ASGI vazio
+- `http`: `GET /experiment` pelo app ASGI completo, uma requisição por vez
+  (inclui também o middleware de duração por rota)
+
+A medição HTTP oscila bastante entre rodadas (o pipeline de impressões
+grava os lotes no meio das medições); `estimated_http_overhead_pct` soma os custos isolados
+do serviço e do middleware e divide pela requisição HTTP sem telemetria.
+
+Uso:
+    python -m bench.telemetry_overhead [requisicoes] [rodadas]
+"""
+import asyncio
+import json
+import time
+
+import storage
+from bench.common import emit, int_arg
+from api.middleware import TelemetryMiddleware
+from bench.load import RawClient
+from core.telemetry import telemetry
+from main import app
+from repositories.test_repository import TestRepository
+from services.test_service import TestService
+from services.variant_selector import VariantSelector
+
+
+TEST = {
+    "testId": "bench_telemetry",
+    "name": "Bench",
+    "variants": [
+        {"variantId": "A", "distribution": 50, "sections": [{"id": "h", "contentUrl": "a"}]},
+        {"variantId": "B", "distribution": 50, "sections": [{"id": "h", "contentUrl": "b"}]},
+    ],
+}
+
+
+def summary(best: dict) -> dict:
+    disabled, enabled = best[False], best[True]
+    return {
+        "disabled_us": round(disabled, 3),
+        "enabled_us": round(enabled, 3),
+        "overhead_pct": round((enabled - disabled) / disabled * 100, 2),
+    }
+
+
+def service_overhead(number: int, rounds: int) -> dict:
+    storage.reset()
+    service = TestService(TestRepository(), VariantSelector())
+    service.create_test(TEST["testId"], TEST["name"], TEST["variants"])
+    best = {False: float("inf"), True: float("inf")}
+    for _ in range(rounds):
+        for enabled in (False, True):
+            telemetry.enabled = enabled
+            start = time.perf_counter()
+            for _ in range(number):
+                service.get_experiment_payload(TEST["testId"], "visitor-42")
+            best[enabled] = min(best[enabled], (time.perf_counter() - start) / number * 1e6)
+    storage.reset()
+    return summary(best)
+
+
+async def middleware_overhead(number: int, rounds: int) -> dict:
+    async def empty_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = TelemetryMiddleware(empty_app)
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    best = {False: float("inf"), True: float("inf")}
+    for _ in range(rounds):
+        for enabled in (False, True):
+            telemetry.enabled = enabled
+            start = time.perf_counter()
+            for _ in range(number):
+                await middleware(scope, receive, send)
+            best[enabled] = min(best[enabled], (time.perf_counter() - start) / number * 1e6)
+    return summary(best)
+
+
+async def http_overhead(number: int, rounds: int) -> dict:
+    storage.reset()
+    best = {False: float("inf"), True: float("inf")}
+    async with app.router.lifespan_context(app):
+        client = RawClient(app)
+        await client.request("POST", "/admin/test", "", json.dumps(TEST).encode())
+        query = f"testId={TEST['testId']}&visitorId=visitor-42"
+        for _ in range(rounds):
+            for enabled in (False, True):
+                telemetry.enabled = enabled
+                start = time.perf_counter()
+                for _ in range(number):
+                    await client.request("GET", "/experiment", query, b"")
+                best[enabled] = min(best[enabled], (time.perf_counter() - start) / number * 1e6)
+    storage.reset()
+    return summary(best)
+
+
+def main() -> None:
+    number = int_arg(1, 500)
+    rounds = int_arg(2, 15)
+    saved = telemetry.enabled
+    try:
+        results = {
+            "requests": number,
+            "rounds": rounds,
+            "service": service_overhead(number * 20, rounds),
+            "middleware": asyncio.run(middleware_overhead(number * 20, rounds)),
+            "http": asyncio.run(http_overhead(number, rounds)),
+        }
+    finally:
+        telemetry.enabled = saved
+    added_us = sum(
+        results[part]["enabled_us"] - results[part]["disabled_us"]
+        for part in ("service", "middleware")
+    )
+    results["estimated_http_overhead_pct"] = round(
+        added_us / results["http"]["disabled_us"] * 100, 2
+    )
+    emit("telemetry_overhead", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Custo do ciclo de vida dos testes no caminho quente e no agendador.
+
+- `experiment_us`: µs por `get_experiment_payload` com o armazenamento em
+  memória, para um teste sem agenda, um teste com início e fim agendados
+  (janela compilada no `CompiledTest`), o mesmo teste conferido a cada
+  requisição como seria sem a compilação (lê o teste e compara datas) e
+  um teste com 50% de alocação, com a fração de impressões registradas
+- `scheduler`: com `testes` testes cadastrados (um décimo agendado),
+  ms de uma passada do `LifecycleScheduler` sem nada a fazer e de uma
+  passada que varre todos os testes e grava as viradas
+
+Uso:
+    python -m bench.test_lifecycle [requisicoes] [testes]
+"""
+import time
+from datetime import datetime, timezone
+
+import storage
+from bench.common import emit, int_arg
+from core.exceptions import TestInactiveError
+from repositories.test_repository import TestRepository
+from services.lifecycle_service import LifecycleScheduler
+from services.test_service import TestService
+from services.variant_selector import VariantSelector
+
+
+VARIANTS = [
+    {
+        "variantId": v,
+        "distribution": 50,
+        "sections": [{"id": "hero", "contentUrl": f"https://cdn.exemplo.com/{v}/hero.html"}],
+    }
+    for v in ("A", "B")
+]
+
+
+def to_utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def datetime_check(repository: TestRepository, test_id: str) -> None:
+    """Conferência por requisição, sem a janela compilada."""
+    test = repository.get_test_or_raise(test_id)
+    now = datetime.now(timezone.utc)
+    if (
+        test["status"] != "active"
+        or (test["startAt"] is not None and now < to_utc(test["startAt"]))
+        or (test["endAt"] is not None and now >= to_utc(test["endAt"]))
+    ):
+        raise TestInactiveError(f"Test {test_id} is not active")
+
+
+def per_request_us(func, requests: int) -> float:
+    start = time.perf_counter()
+    for index in range(requests):
+        func(f"visitor-{index}")
+    return round((time.perf_counter() - start) / requests * 1e6, 3)
+
+
+def measure_experiment(requests: int) -> dict:
+    storage.reset()
+    repository = TestRepository()
+    service = TestService(repository, VariantSelector())
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    service.create_test("bench_plain", "plain", VARIANTS)
+    service.create_test(
+        "bench_window", "window", VARIANTS,
+        start_at=now.replace(year=now.year - 1), end_at=now.replace(year=now.year + 1)
+    )
+    service.create_test("bench_allocation", "allocation", VARIANTS, allocation=50)
+
+    def with_datetime_check(visitor_id: str) -> bytes:
+        datetime_check(repository, "bench_window")
+        return service.get_experiment_payload("bench_window", visitor_id)
+
+    results = {
+        "no_lifecycle": per_request_us(
+            lambda visitor: service.get_experiment_payload("bench_plain", visitor), requests
+        ),
+        "compiled_window": per_request_us(
+            lambda visitor: service.get_experiment_payload("bench_window", visitor), requests
+        ),
+        "datetime_check_per_request": per_request_us(with_datetime_check, requests),
+        "allocation_50pct": per_request_us(
+            lambda visitor: service.get_experiment_payload("bench_allocation", visitor),
+            requests
+        ),
+    }
+    impressions = sum(
+        storage.count_impressions("bench_allocation", variant["variantId"])
+        for variant in VARIANTS
+    )
+    return {
+        "experiment_us": results,
+        "allocation_impression_ratio": round(impressions / requests, 3),
+    }
+
+
+def measure_scheduler(tests: int) -> dict:
+    storage.reset()
+    repository = TestRepository()
+    now = time.time()
+    repository.save_tests([
+        {
+            "testId": f"bench_{index:06d}",
+            "name": f"Teste {index}",
+            "variants": VARIANTS,
+            "status": "scheduled" if index % 10 == 0 else "active",
+            "startAt": now + 0.5 if index % 10 == 0 else None,
+            "endAt": None,
+        }
+        for index in range(tests)
+    ])
+    scheduler = LifecycleScheduler(repository)
+    scheduler.apply_schedule(now)
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        scheduler.apply_schedule(now)
+    idle_ms = (time.perf_counter() - start) / 1000 * 1e3
+
+    start = time.perf_counter()
+    flipped = scheduler.apply_schedule(now + 1.0)
+    flip_ms = (time.perf_counter() - start) * 1e3
+    assert len(flipped) == len(range(0, tests, 10))
+    return {
+        "tests": tests,
+        "idle_pass_ms": round(idle_ms, 5),
+        "flip_pass_ms": round(flip_ms, 3),
+        "flipped": len(flipped),
+    }
+
+
+def main() -> None:
+    requests = int_arg(1, 200_000)
+    tests = int_arg(2, 10_000)
+    results = {
+        "requests": requests,
+        **measure_experiment(requests),
+        "scheduler": measure_scheduler(tests),
+    }
+    storage.reset()
+    emit("test_lifecycle", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Microbenchmark da seleção de variantes para testes com 2, 10 e 100 variantes.
+
+Compara a soma cumulativa refeita a cada chamada (implementação antiga) com
+a busca na tabela de buckets pré-compilada, e o caminho completo de
+`get_experiment` (modelos pydantic) com `get_experiment_payload` (bytes).
+
+Uso:
+    python -m bench.variant_selection [iteracoes]
+"""
+import random
+import timeit
+from typing import Dict, List
+
+import storage
+from bench.common import emit, int_arg
+from repositories.test_repository import TestRepository
+from schemas.models import ExperimentResponse, Section
+from services.routing import compile_test
+from services.test_service import TestService
+from services.variant_selector import VariantSelector
+
+
+def legacy_select(variants: List[Dict]) -> Dict:
+    """Seleção antiga: soma cumulativa em float a cada requisição."""
+    random_percentage = random.random() * 100
+    cumulative = 0
+    for variant in variants:
+        cumulative += variant["distribution"]
+        if random_percentage <= cumulative:
+            return variant
+    return variants[-1]
+
+
+def legacy_get_experiment(repository: TestRepository, test_id: str) -> ExperimentResponse:
+    """Caminho antigo completo: busca, soma cumulativa, impressão e modelos."""
+    test = repository.get_active_test_or_raise(test_id)
+    variant = legacy_select(test["variants"])
+    repository.add_impression(test_id, variant["variantId"])
+    return ExperimentResponse(
+        variantId=variant["variantId"],
+        sections=[Section(**section) for section in variant["sections"]],
+    )
+
+
+def make_variants(count: int) -> List[Dict]:
+    share = 100 / count
+    return [
+        {
+            "variantId": f"V{i}",
+            "distribution": share,
+            "sections": [{"id": "hero", "contentUrl": f"https://cdn.exemplo.com/{i}.html"}],
+        }
+        for i in range(count)
+    ]
+
+
+def per_call_us(stmt, number: int) -> float:
+    return round(min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6, 3)
+
+
+def main() -> None:
+    number = int_arg(1, 100_000)
+    selector = VariantSelector()
+    results = []
+
+    for count in (2, 10, 100):
+        variants = make_variants(count)
+        test_id = f"bench_{count}"
+        compiled = compile_test(
+            {"testId": test_id, "status": "active", "variants": variants},
+            selector.bucket_count,
+        )
+        table = compiled.bucket_table
+
+        storage.reset()
+        repository = TestRepository()
+        service = TestService(repository, selector)
+        service.create_test(test_id, "Bench", variants)
+
+        results.append({
+            "variants": count,
+            "legacy_select_us": per_call_us(lambda: legacy_select(variants), number),
+            "table_random_us": per_call_us(
+                lambda: selector.select_index(table, test_id), number
+            ),
+            "table_visitor_us": per_call_us(
+                lambda: selector.select_index(table, test_id, "visitor-42"), number
+            ),
+            "legacy_get_experiment_us": per_call_us(
+                lambda: legacy_get_experiment(repository, test_id), number // 10
+            ),
+            "get_experiment_us": per_call_us(
+                lambda: service.get_experiment(test_id), number // 10
+            ),
+            "get_experiment_payload_us": per_call_us(
+                lambda: service.get_experiment_payload(test_id), number // 10
+            ),
+        })
+
+    storage.reset()
+    emit("variant_selection", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 """Configurações centralizadas da aplicação."""
+import os
 from typing import List
 
 
@@ -14,6 +15,87 @@ class Settings:
     CORS_CREDENTIALS: bool = True
     CORS_METHODS: List[str] = ["*"]
     CORS_HEADERS: List[str] = ["*"]
+    CORS_EXPOSE_HEADERS: List[str] = ["ETag"]
+    
+    # Bucketing determinístico (alterar o salt reembaralha todos os visitantes)
+    BUCKETING_SALT: str = "ab-v1"
+    BUCKET_COUNT: int = 10000
+    
+    # Cache HTTP de GET /test/{testId}/config (navegador e CDN)
+    TEST_CONFIG_MAX_AGE: int = 60  # segundos
+    TEST_CONFIG_STALE_WHILE_REVALIDATE: int = 600  # segundos
+    
+    # Ingestão de impressões em lotes, fora do caminho de /experiment
+    IMPRESSION_PIPELINE_ENABLED: bool = True
+    IMPRESSION_QUEUE_MAX_SIZE: int = 100_000
+    IMPRESSION_FLUSH_SIZE: int = 1000
+    IMPRESSION_FLUSH_INTERVAL: float = 0.05  # segundos
+    IMPRESSION_BACKPRESSURE: str = "sync"  # "sync", "drop" ou "drop_oldest"
+    
+    # Ingestão em lote (POST /events/batch)
+    EVENT_BATCH_MAX_SIZE: int = 10_000
+    
+    # Administração de testes (GET /admin/tests e POST /admin/tests:batch)
+    ADMIN_TESTS_PAGE_SIZE: int = 100
+    ADMIN_TESTS_MAX_PAGE_SIZE: int = 1000
+    TEST_BATCH_MAX_SIZE: int = 1000
+    
+    # Agenda dos testes: intervalo máximo entre as passadas do agendador,
+    # que grava as viradas de status (0 = desligado; a janela de cada
+    # teste continua valendo em /experiment)
+    TEST_SCHEDULER_INTERVAL: float = 1.0  # segundos
+    
+    # Exportação de eventos brutos (GET /admin/test/{test_id}/events)
+    EXPORT_BATCH_SIZE: int = 16384  # eventos lidos e serializados por vez
+    EXPORT_GZIP_LEVEL: int = 6
+    
+    # Retenção dos eventos brutos e dos buckets de rollup (0 = mantém tudo);
+    # os contadores de todo o período não expiram
+    EVENT_RETENTION_SECONDS: float = float(os.getenv("AB_EVENT_RETENTION_SECONDS", "0"))
+    EVENT_RETENTION_INTERVAL: float = 60.0  # segundos entre as passadas
+    
+    # Persistência: "memory" (padrão), "journal", "sqlite" ou "shared"
+    STORAGE_BACKEND: str = os.getenv("AB_STORAGE_BACKEND", "memory")
+    DATA_DIR: str = os.getenv("AB_DATA_DIR", "data")
+    JOURNAL_FSYNC_INTERVAL: float = 0.05  # segundos entre group commits
+    JOURNAL_SNAPSHOT_INTERVAL: float = 300.0  # segundos entre snapshots
+    SQLITE_PATH: str = os.getenv("AB_SQLITE_PATH", os.path.join(DATA_DIR, "ab.sqlite3"))
+    # "shared": estado visível a todos os workers (uvicorn --workers N)
+    SHARED_STATE_DIR: str = os.getenv(
+        "AB_SHARED_STATE_DIR", os.path.join(DATA_DIR, "shared")
+    )
+    SHARED_COUNTER_SLOTS: int = 65536
+    # Threads do executor que roda as chamadas bloqueantes dos backends com
+    # E/S síncrona (SQLite) e o cálculo de métricas, fora do event loop
+    BLOCKING_EXECUTOR_WORKERS: int = int(os.getenv("AB_BLOCKING_EXECUTOR_WORKERS", "8"))
+    
+    # Serialização das respostas: "auto" (orjson se instalado), "orjson" ou "stdlib"
+    JSON_BACKEND: str = os.getenv("AB_JSON_BACKEND", "auto")
+    
+    # Telemetria (contadores e histogramas em GET /internal/metrics)
+    TELEMETRY_ENABLED: bool = os.getenv("AB_TELEMETRY_ENABLED", "1") == "1"
+    
+    # Profiler por amostragem de pilhas (ligado e ajustado em PUT /admin/profile)
+    # Opcional: só com AB_PROFILER_ALLOWED=1 as rotas /admin/profile existem
+    # e o middleware é instalado; desligado, as rotas respondem 403
+    PROFILER_ALLOWED: bool = os.getenv("AB_PROFILER_ALLOWED", "0") == "1"
+    PROFILER_ENABLED: bool = os.getenv("AB_PROFILER_ENABLED", "0") == "1"
+    PROFILER_SAMPLE_RATE: float = 0.01  # fração das requisições perfiladas
+    PROFILER_INTERVAL: float = 0.005  # segundos entre leituras das pilhas
+    PROFILER_MAX_STACKS: int = 10_000  # pilhas distintas guardadas
+    
+    # Captura de tráfego em JSONL para replay (python -m bench.replay)
+    CAPTURE_ENABLED: bool = os.getenv("AB_CAPTURE_ENABLED", "0") == "1"
+    CAPTURE_PATH: str = os.getenv("AB_CAPTURE_PATH", os.path.join(DATA_DIR, "capture.jsonl"))
+    CAPTURE_SAMPLE_RATE: float = float(os.getenv("AB_CAPTURE_SAMPLE_RATE", "1.0"))
+    CAPTURE_BUFFER_SIZE: int = 10_000  # requisições aguardando gravação
+    CAPTURE_FLUSH_INTERVAL: float = 1.0  # segundos
+    CAPTURE_MAX_BODY_BYTES: int = 65536  # corpos maiores não são guardados
+    
+    # Significância estatística (a primeira variante de cada teste é o controle)
+    # Menor parâmetro das posteriores Beta para usar a aproximação normal
+    # (abaixo dele, a probabilidade de superar o controle usa a soma exata)
+    METRICS_NORMAL_APPROX_MIN: int = 50
 
 
 settings = Settings()
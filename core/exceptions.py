@@ -30,3 +30,42 @@ class TestAlreadyExistsError(ABTestException):
     """Teste já existe."""
     pass
 
+
+class InvalidEventBatchError(ABTestException):
+    """Lote de eventos malformado ou grande demais."""
+    pass
+
+
+class InvalidTestBatchError(ABTestException):
+    """Lote de operações de testes grande demais."""
+    pass
+
+
+class InvalidTestLifecycleError(ABTestException):
+    """Agenda, alocação ou mudança de status de um teste inválida."""
+    pass
+
+
+class EventPurgeNotSupportedError(ABTestException):
+    """Exclusão ou retenção de eventos indisponível no backend configurado."""
+    pass
+
+
+class InvalidMetricsWindowError(ABTestException):
+    """Janela de tempo ou granularidade de métricas inválida."""
+    pass
+
+
+class InvalidExportRequestError(ABTestException):
+    """Parâmetros de exportação de eventos inválidos ou formato indisponível."""
+    pass
+
+
+class ProfilerNotAllowedError(ABTestException):
+    """Profiler desabilitado na configuração (`PROFILER_ALLOWED`)."""
+    pass
+
+
+class InvalidProfilerSettingsError(ABTestException):
+    """Configuração do profiler inválida."""
+    pass
@@ -0,0 +1,49 @@
+"""
+Executor dedicado às chamadas bloqueantes feitas pelas rotas assíncronas.
+
+As rotas rodam no event loop; o que pode esperar por disco (consultas do
+SQLite) ou ocupar a CPU por mais tempo (cálculo de métricas) vai para este
+pool de threads, separado do threadpool padrão do Starlette e do executor
+padrão do asyncio (usado pelo pipeline de impressões).
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from core.config import settings
+
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Retorna o executor, criando-o na primeira chamada."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.BLOCKING_EXECUTOR_WORKERS,
+                    thread_name_prefix="ab-blocking"
+                )
+    return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args) -> T:
+    """Executa `func(*args)` no executor dedicado e aguarda o resultado."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args))
+
+
+def shutdown_executor() -> None:
+    """Espera as chamadas em andamento e encerra o executor."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
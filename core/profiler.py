@@ -0,0 +1,183 @@
+"""
+Profiler por amostragem de pilhas, ligado sob demanda para uma fração das
+requisições.
+
+Enquanto ao menos uma requisição amostrada está em andamento, uma thread
+em segundo plano lê as pilhas de todas as threads (`sys._current_frames`)
+a cada `interval` segundos e soma cada pilha no formato "collapsed" do
+flamegraph (`raiz;...;folha contagem`). Threads ociosas (esperando em
+locks, filas ou no selector do event loop) são ignoradas.
+
+A leitura é global ao processo: requisições não amostradas que estejam
+rodando ao mesmo tempo também entram no perfil, o que o torna uma
+amostra estatística de onde o tempo de atendimento é gasto. A função da
+rota aparece na própria pilha.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from core.config import settings
+from core.exceptions import InvalidProfilerSettingsError
+
+
+# Folhas (arquivo, função) de threads paradas esperando trabalho
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # concurrent.futures esperando na SimpleQueue
+    ("socket.py", "accept"),
+}
+MAX_DEPTH = 128
+TRUNCATED = "[outras pilhas]"
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Amostrador de pilhas para requisições sorteadas com `sample_rate`.
+    
+    O middleware chama `should_sample` a cada requisição (uma leitura de
+    atributo quando desligado) e envolve as amostradas em `begin`/`end`.
+    A thread de amostragem só acorda enquanto há requisições amostradas
+    em andamento. As pilhas distintas são limitadas a `max_stacks`; as
+    excedentes são somadas em uma única linha.
+    """
+    
+    def __init__(
+        self,
+        enabled: bool = False,
+        sample_rate: float = 0.01,
+        interval: float = 0.005,
+        max_stacks: int = 10_000
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_stacks = max_stacks
+        
+        self.profiled_requests = 0
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._active = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def configure(self, enabled: bool, sample_rate: Optional[float] = None) -> None:
+        """
+        Liga/desliga o profiler e ajusta a fração amostrada, sem reiniciar.
+        
+        Raises:
+            InvalidProfilerSettingsError: Se a fração não estiver entre 0 e 1
+        """
+        if sample_rate is not None:
+            if not 0.0 <= sample_rate <= 1.0:
+                raise InvalidProfilerSettingsError(
+                    f"Sample rate must be between 0 and 1, got {sample_rate}"
+                )
+            self.sample_rate = sample_rate
+        self.enabled = enabled
+        if not enabled:
+            # Acorda a thread de amostragem para que ela termine
+            self._active.set()
+    
+    def should_sample(self) -> bool:
+        """Sorteia se a requisição atual será perfilada."""
+        return self.enabled and random.random() < self.sample_rate
+    
+    def begin(self) -> None:
+        """Marca o início de uma requisição amostrada."""
+        with self._lock:
+            self._inflight += 1
+            self.profiled_requests += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="stack-sampler", daemon=True
+                )
+                self._thread.start()
+            self._active.set()
+    
+    def end(self) -> None:
+        """Marca o fim de uma requisição amostrada."""
+        with self._lock:
+            self._inflight -= 1
+            if self._inflight == 0:
+                self._active.clear()
+    
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            self._active.wait()
+            if not self.enabled:
+                with self._lock:
+                    if not self.enabled:
+                        self._thread = None
+                        self._active.clear()
+                        return
+            self._sample(own_id)
+            time.sleep(self.interval)
+    
+    def _sample(self, own_id: int) -> None:
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            names = []
+            while frame is not None and len(names) < MAX_DEPTH:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            names.reverse()
+            stacks.append(";".join(names))
+        with self._lock:
+            self.samples += 1
+            for stack in stacks:
+                if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                    self._stacks[stack] += 1
+                else:
+                    self._stacks[TRUNCATED] += 1
+    
+    def collapsed(self) -> str:
+        """Pilhas agregadas no formato collapsed (flamegraph.pl, speedscope)."""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+    
+    def reset(self) -> None:
+        """Descarta as pilhas e contagens acumuladas."""
+        with self._lock:
+            self._stacks.clear()
+            self.profiled_requests = 0
+            self.samples = 0
+    
+    def status(self) -> Dict[str, object]:
+        """Configuração atual e volume acumulado."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sampleRate": self.sample_rate,
+                "intervalMs": self.interval * 1000,
+                "profiledRequests": self.profiled_requests,
+                "samples": self.samples,
+                "stacks": len(self._stacks),
+            }
+
+
+profiler = SamplingProfiler(
+    enabled=settings.PROFILER_ENABLED,
+    sample_rate=settings.PROFILER_SAMPLE_RATE,
+    interval=settings.PROFILER_INTERVAL,
+    max_stacks=settings.PROFILER_MAX_STACKS,
+)
@@ -0,0 +1,78 @@
+"""
+Serialização JSON das respostas da API.
+
+Modelos pydantic já validados são serializados pelo serializador compilado
+do próprio pydantic (`model_dump_json`), sem uma nova validação nem a
+conversão genérica do `jsonable_encoder`. Os demais conteúdos (dicts e
+listas, como os corpos de erro) usam orjson quando instalado e, sem ele,
+um `json.JSONEncoder` compacto criado uma única vez.
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+
+from pydantic import BaseModel
+
+from core.config import settings
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+
+JSON_BACKENDS = ("auto", "orjson", "stdlib")
+
+
+def _default(value: Any) -> Any:
+    """Tipos que os codificadores não conhecem."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Mesmas opções do JSONResponse do Starlette; criado uma vez, e não a cada
+# chamada como em `json.dumps` com argumentos
+_ENCODER = json.JSONEncoder(
+    ensure_ascii=False,
+    allow_nan=False,
+    separators=(",", ":"),
+    default=_default,
+)
+
+
+def _dumps_stdlib(content: Any) -> bytes:
+    return _ENCODER.encode(content).encode("utf-8")
+
+
+def _dumps_orjson(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+def resolve_backend(name: str) -> str:
+    """
+    Resolve o codificador configurado ("auto" escolhe orjson se instalado).
+    
+    Raises:
+        ValueError: Se o nome for desconhecido ou o orjson não estiver instalado
+    """
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {name}")
+    if name == "auto":
+        return "orjson" if orjson is not None else "stdlib"
+    if name == "orjson" and orjson is None:
+        raise ValueError("JSON backend 'orjson' requires the orjson package")
+    return name
+
+
+JSON_BACKEND = resolve_backend(settings.JSON_BACKEND)
+_dumps_plain = _dumps_orjson if JSON_BACKEND == "orjson" else _dumps_stdlib
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa um modelo pydantic ou um valor JSON em bytes UTF-8."""
+    if isinstance(content, BaseModel):
+        return content.model_dump_json().encode("utf-8")
+    return _dumps_plain(content)
@@ -0,0 +1,240 @@
+"""
+Instrumentação de baixo custo: contadores e histogramas de latência com
+buckets fixos, exportados no formato texto do Prometheus.
+
+Cada thread escreve apenas nas suas próprias séries (`threading.local`),
+sem lock no caminho quente; a exportação soma as séries de todas as
+threads. Como só a thread dona incrementa, nenhum incremento se perde:
+uma leitura concorrente, no máximo, deixa de ver o mais recente.
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from core.config import settings
+
+
+# Limites superiores dos buckets de latência, em segundos (50 µs a 2.5 s)
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+HTTP_REQUEST_DURATION = "ab_http_request_duration_seconds"
+VARIANT_SELECTION_DURATION = "ab_variant_selection_duration_seconds"
+CONVERSIONS = "ab_conversions_total"
+REPOSITORY_WRITE_DURATION = "ab_repository_write_duration_seconds"
+METRICS_COMPUTATION_DURATION = "ab_metrics_computation_duration_seconds"
+STORAGE_ITEMS = "ab_storage_items"
+STORAGE_MEMORY = "ab_storage_memory_bytes"
+IMPRESSION_QUEUE_LENGTH = "ab_impression_queue_length"
+IMPRESSIONS_DROPPED = "ab_impressions_dropped_total"
+CAPTURE_BUFFER_LENGTH = "ab_capture_buffer_length"
+CAPTURES_DROPPED = "ab_captures_dropped_total"
+BACKGROUND_FAILURES = "ab_background_task_failures_total"
+
+# Gauge: (nome, valores dos rótulos, valor)
+GaugeSample = Tuple[str, Tuple[str, ...], float]
+
+
+class _ThreadSeries(threading.local):
+    """
+    Séries da thread atual: (métrica, rótulos) -> contagens.
+    
+    `threading.local` executa `__init__` na primeira vez que cada thread
+    acessa o objeto, o que registra os dicts daquela thread no registro.
+    """
+    
+    def __init__(self, register):
+        # Histograma: contagem de cada bucket (+Inf no fim) e a soma no último item
+        self.histograms: Dict[Tuple[str, Tuple[str, ...]], List[float]] = {}
+        self.counters: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        register(self.histograms, self.counters)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def variant_label(test: Dict, variant_id: str) -> str:
+    """
+    Rótulo da variante: o ID se ela pertence ao teste, senão "_unknown"
+    (IDs enviados pelo cliente não podem criar séries sem limite).
+    """
+    for variant in test["variants"]:
+        if variant["variantId"] == variant_id:
+            return variant_id
+    return "_unknown"
+
+
+class Telemetry:
+    """
+    Registro de métricas do processo.
+    
+    As métricas são declaradas com `describe` (tipo, ajuda e nomes dos
+    rótulos) e atualizadas com `observe` (histogramas) e `inc`
+    (contadores), passando os valores dos rótulos na ordem declarada.
+    Com `enabled=False`, as chamadas retornam sem registrar nada.
+    """
+    
+    def __init__(self, enabled: bool = True, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._descriptions: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {}
+        self._threads: List[Tuple[dict, dict]] = []
+        self._threads_lock = threading.Lock()  # só para registrar uma thread nova
+        self._local = _ThreadSeries(self._register)
+    
+    def describe(self, name: str, kind: str, help_text: str, label_names: Sequence[str] = ()) -> None:
+        """Declara uma métrica ("counter", "gauge" ou "histogram")."""
+        self._descriptions[name] = (kind, help_text, tuple(label_names))
+    
+    def _register(self, histograms: dict, counters: dict) -> None:
+        with self._threads_lock:
+            self._threads.append((histograms, counters))
+    
+    def observe(self, name: str, labels: Tuple[str, ...], seconds: float) -> None:
+        """Registra uma duração no histograma."""
+        if self.enabled:
+            histograms = self._local.histograms
+            key = (name, labels)
+            counts = histograms.get(key)
+            if counts is None:
+                counts = histograms[key] = [0.0] * (len(self.buckets) + 2)
+            counts[bisect_left(self.buckets, seconds)] += 1
+            counts[-1] += seconds
+    
+    def inc(self, name: str, labels: Tuple[str, ...], amount: float = 1) -> None:
+        """Incrementa um contador."""
+        if self.enabled:
+            counters = self._local.counters
+            key = (name, labels)
+            counters[key] = counters.get(key, 0) + amount
+    
+    def _merged(self):
+        """Soma as séries de todas as threads."""
+        histograms: Dict[Tuple[str, Tuple[str, ...]], List[float]] = {}
+        counters: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        with self._threads_lock:
+            threads = list(self._threads)
+        for thread_histograms, thread_counters in threads:
+            # Cópias: a thread dona pode criar séries novas durante a leitura
+            for key, counts in list(thread_histograms.items()):
+                total = histograms.get(key)
+                if total is None:
+                    histograms[key] = list(counts)
+                else:
+                    for i, value in enumerate(counts):
+                        total[i] += value
+            for key, value in list(thread_counters.items()):
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+    
+    def render(self, gauges: Iterable[GaugeSample] = ()) -> str:
+        """
+        Exporta todas as métricas no formato texto do Prometheus (0.0.4).
+        
+        Args:
+            gauges: Amostras de gauges calculadas no momento da coleta
+        """
+        histograms, counters = self._merged()
+        samples: Dict[str, List[str]] = {}
+        for (name, values), counts in sorted(histograms.items()):
+            label_names = self._descriptions[name][2]
+            lines = samples.setdefault(name, [])
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{name}_bucket{_labels(label_names, values, le)} {_number(cumulative)}")
+            lines.append(f"{name}_sum{_labels(label_names, values)} {_number(counts[-1])}")
+            lines.append(f"{name}_count{_labels(label_names, values)} {_number(cumulative)}")
+        for (name, values), value in sorted(counters.items()):
+            label_names = self._descriptions[name][2]
+            samples.setdefault(name, []).append(
+                f"{name}{_labels(label_names, values)} {_number(value)}"
+            )
+        for name, values, value in gauges:
+            label_names = self._descriptions[name][2]
+            samples.setdefault(name, []).append(
+                f"{name}{_labels(label_names, values)} {_number(value)}"
+            )
+        
+        output: List[str] = []
+        for name, (kind, help_text, _) in self._descriptions.items():
+            if name not in samples:
+                continue
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(samples[name])
+        return "\n".join(output) + "\n"
+    
+    def reset(self) -> None:
+        """Zera as séries de todas as threads."""
+        with self._threads_lock:
+            for histograms, counters in self._threads:
+                histograms.clear()
+                counters.clear()
+
+
+telemetry = Telemetry(enabled=settings.TELEMETRY_ENABLED)
+
+telemetry.describe(
+    HTTP_REQUEST_DURATION, "histogram",
+    "Duração das requisições HTTP por rota", ("method", "route", "status")
+)
+# O _count deste histograma é o número de atribuições por teste e variante
+telemetry.describe(
+    VARIANT_SELECTION_DURATION, "histogram",
+    "Duração da seleção de variante (teste compilado + bucket)", ("test", "variant")
+)
+telemetry.describe(
+    CONVERSIONS, "counter", "Conversões registradas", ("test", "variant")
+)
+telemetry.describe(
+    REPOSITORY_WRITE_DURATION, "histogram",
+    "Duração das escritas no repositório", ("operation",)
+)
+telemetry.describe(
+    METRICS_COMPUTATION_DURATION, "histogram",
+    "Duração do cálculo de métricas", ("scope",)
+)
+telemetry.describe(
+    STORAGE_ITEMS, "gauge", "Itens em cada estrutura do armazenamento", ("structure",)
+)
+telemetry.describe(
+    STORAGE_MEMORY, "gauge",
+    "Memória estimada (ou tamanho em disco) de cada estrutura", ("structure",)
+)
+telemetry.describe(
+    IMPRESSION_QUEUE_LENGTH, "gauge", "Impressões aguardando gravação no pipeline"
+)
+telemetry.describe(
+    IMPRESSIONS_DROPPED, "counter", "Impressões descartadas com a fila cheia"
+)
+telemetry.describe(
+    CAPTURE_BUFFER_LENGTH, "gauge", "Requisições capturadas aguardando gravação"
+)
+telemetry.describe(
+    CAPTURES_DROPPED, "counter", "Capturas descartadas com o buffer cheio"
+)
+telemetry.describe(
+    BACKGROUND_FAILURES, "counter",
+    "Passadas de tarefas em segundo plano que falharam", ("task",)
+)
@@ -0,0 +1,570 @@
+"""
+Log de eventos colunar e compacto para impressões e conversões.
+
+Os eventos são particionados por teste. Cada partição é uma lista de
+segmentos com colunas `array`: os identificadores de variante e evento
+são internados como inteiros pequenos e o timestamp é guardado como
+float (epoch em segundos), ~12 bytes por impressão. O ID do evento é
+implícito (posição na partição) e continua valendo depois que segmentos
+antigos são descartados.
+
+Contrato dos IDs (o mesmo em todos os backends): inteiro crescente na
+ordem de gravação dentro de (log, teste), nunca reutilizado para o teste
+enquanto o armazenamento existir, nem após exclusões e retenção. Não é
+único entre testes: um evento é identificado por (tipo, testId, id). A
+numeração de cada teste pode ser salva (`next_ids`) e restaurada
+(`reserve_ids`) junto com o estado, para continuar após um reinício.
+
+Um segmento é fechado ao atingir `segment_size` eventos ou quando um
+evento chega `segment_span` segundos depois do primeiro do segmento.
+Assim cada segmento cobre um intervalo de tempo limitado, e a retenção
+descarta segmentos inteiros, sem reescrever colunas.
+"""
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Collection, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+
+SEGMENT_SIZE = 65536
+SEGMENT_SPAN = 3600.0  # segundos
+
+
+class Interner:
+    """Mapeia strings para inteiros pequenos e vice-versa."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._lock = threading.Lock()
+
+    def intern(self, value: str) -> int:
+        """Retorna o inteiro associado a `value`, criando se necessário."""
+        index = self._ids.get(value)
+        if index is None:
+            with self._lock:
+                index = self._ids.get(value)
+                if index is None:
+                    index = len(self._values)
+                    self._values.append(value)
+                    self._ids[value] = index
+        return index
+
+    def lookup(self, index: int) -> str:
+        """Retorna a string associada ao inteiro."""
+        return self._values[index]
+
+    def get(self, value: str) -> Optional[int]:
+        """Retorna o inteiro associado a `value` sem criar um novo."""
+        return self._ids.get(value)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+            self._values.clear()
+
+    def nbytes(self) -> int:
+        """Estimativa de memória ocupada pelas strings internadas."""
+        return (
+            sum(sys.getsizeof(v) for v in self._values)
+            + sys.getsizeof(self._values)
+            + sys.getsizeof(self._ids)
+        )
+
+
+class EventSegment:
+    """Segmento de uma partição: colunas de eventos consecutivos de um teste."""
+
+    __slots__ = (
+        "first_id", "variants", "events", "timestamps",
+        "opened", "min_timestamp", "max_timestamp",
+    )
+
+    def __init__(self, first_id: int, with_event: bool, opened: float):
+        self.first_id = first_id
+        self.variants = array("I")
+        self.events = array("I") if with_event else None
+        self.timestamps = array("d")
+        # Timestamp do primeiro evento (base do fechamento por tempo)
+        self.opened = opened
+        self.min_timestamp = opened
+        self.max_timestamp = opened
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def nbytes(self) -> int:
+        total = 0
+        for column in (self.variants, self.events, self.timestamps):
+            if column is not None:
+                total += column.buffer_info()[1] * column.itemsize
+        return total
+
+
+class EventPartition:
+    """
+    Eventos de um teste.
+
+    `segments` é substituída (nunca alterada) quando um segmento é aberto
+    ou descartado, então as leituras usam a lista sem lock. Os appends
+    acontecem sob `lock`.
+    """
+
+    __slots__ = ("segments", "next_id", "variant_ids", "lock")
+
+    def __init__(self):
+        self.segments: List[EventSegment] = []
+        self.next_id = 0
+        # Variantes (internadas) que já tiveram eventos nesta partição
+        self.variant_ids: Set[int] = set()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+
+class EventBatch(NamedTuple):
+    """Eventos selecionados de um log, em colunas (`events` é None em impressões)."""
+    ids: List[int]
+    variants: List[str]
+    events: Optional[List[str]]
+    timestamps: List[float]
+
+
+def _select(
+    segment: EventSegment,
+    offset: int,
+    size: int,
+    start: Optional[float],
+    end: Optional[float],
+    event_indexes: Optional[List[int]]
+) -> Tuple[List[int], List[int], Optional[List[int]], List[float]]:
+    """
+    Filtra as posições [offset, size) de um segmento.
+
+    As colunas são copiadas por fatia antes da filtragem: o último segmento
+    continua recebendo eventos, e um buffer exportado para o NumPy
+    impediria o `array` de crescer.
+
+    Returns:
+        (posições no segmento, variantes, eventos, timestamps) dos eventos
+        selecionados, com os IDs ainda internados
+    """
+    variants = segment.variants[offset:size]
+    events = segment.events[offset:size] if segment.events is not None else None
+    timestamps = segment.timestamps[offset:size]
+    covered = (
+        (start is None or segment.min_timestamp >= start)
+        and (end is None or segment.max_timestamp < end)
+    )
+    if covered and event_indexes is None:
+        # Segmento inteiro dentro da janela: sem filtragem
+        return (
+            list(range(offset, size)),
+            variants.tolist(),
+            events.tolist() if events is not None else None,
+            timestamps.tolist(),
+        )
+
+    if np is not None:
+        times = np.frombuffer(timestamps, dtype=np.float64)
+        mask = np.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times < end
+        if event_indexes is not None:
+            mask &= np.isin(np.frombuffer(events, dtype=f"u{events.itemsize}"), event_indexes)
+        selected = np.flatnonzero(mask)
+        return (
+            (selected + offset).tolist(),
+            np.frombuffer(variants, dtype=f"u{variants.itemsize}")[selected].tolist(),
+            np.frombuffer(events, dtype=f"u{events.itemsize}")[selected].tolist()
+            if events is not None else None,
+            times[selected].tolist(),
+        )
+
+    selected = range(len(timestamps))
+    if start is not None:
+        selected = [i for i in selected if timestamps[i] >= start]
+    if end is not None:
+        selected = [i for i in selected if timestamps[i] < end]
+    if event_indexes is not None:
+        wanted = set(event_indexes)
+        selected = [i for i in selected if events[i] in wanted]
+    return (
+        [i + offset for i in selected],
+        [variants[i] for i in selected],
+        [events[i] for i in selected] if events is not None else None,
+        [timestamps[i] for i in selected],
+    )
+
+
+def to_datetime(timestamp: float) -> datetime:
+    """Converte epoch em segundos para datetime UTC sem timezone."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def to_epoch(value: Optional[datetime]) -> Optional[float]:
+    """Converte para epoch em segundos; datetimes sem timezone são UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class EventLog:
+    """
+    Log append-only de eventos em colunas, particionado por teste.
+
+    Mantém compatibilidade de leitura com a lista de dicts anterior:
+    `len(log)` e a iteração continuam funcionando, gerando cada linha
+    como dict sob demanda (partição por partição).
+    """
+
+    def __init__(
+        self,
+        interner: Interner,
+        with_event: bool = False,
+        segment_size: int = SEGMENT_SIZE,
+        segment_span: float = SEGMENT_SPAN
+    ):
+        self.interner = interner
+        self.with_event = with_event
+        self.segment_size = segment_size
+        self.segment_span = segment_span
+        self.partitions: Dict[str, EventPartition] = {}
+        self._lock = threading.Lock()
+
+    def _partition(self, test_id: str) -> EventPartition:
+        """Retorna a partição do teste, criando se necessário."""
+        partition = self.partitions.get(test_id)
+        if partition is None:
+            with self._lock:
+                partition = self.partitions.get(test_id)
+                if partition is None:
+                    partition = self.partitions[test_id] = EventPartition()
+        return partition
+
+    def _writable(self, partition: EventPartition, timestamp: float) -> EventSegment:
+        """Segmento que recebe um evento com `timestamp` (sob o lock da partição)."""
+        segments = partition.segments
+        if segments:
+            segment = segments[-1]
+            if (
+                len(segment) < self.segment_size
+                and timestamp - segment.opened < self.segment_span
+                # Após `reserve_ids`, os IDs recomeçam em um segmento novo
+                and segment.first_id + len(segment) == partition.next_id
+            ):
+                return segment
+        segment = EventSegment(partition.next_id, self.with_event, timestamp)
+        partition.segments = segments + [segment]
+        return segment
+
+    def append(
+        self,
+        test_id: str,
+        variant_id: str,
+        event: Optional[str] = None,
+        timestamp: Optional[float] = None
+    ) -> Tuple[int, float]:
+        """
+        Adiciona um evento ao log.
+
+        Returns:
+            Tupla (ID do evento no teste, timestamp em epoch)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        intern = self.interner.intern
+        variant_index = intern(variant_id)
+        event_index = intern(event) if self.with_event else 0
+        partition = self._partition(test_id)
+
+        with partition.lock:
+            segment = self._writable(partition, timestamp)
+            segment.variants.append(variant_index)
+            if self.with_event:
+                segment.events.append(event_index)
+            segment.timestamps.append(timestamp)
+            if timestamp < segment.min_timestamp:
+                segment.min_timestamp = timestamp
+            elif timestamp > segment.max_timestamp:
+                segment.max_timestamp = timestamp
+            partition.variant_ids.add(variant_index)
+            event_id = partition.next_id
+            partition.next_id += 1
+        return event_id, timestamp
+
+    def extend(self, rows: Iterable[Tuple]) -> None:
+        """
+        Adiciona vários eventos de uma vez, adquirindo o lock de cada
+        partição uma só vez.
+
+        Cada linha é (test_id, variant_id, timestamp) ou, em logs com
+        evento, (test_id, variant_id, event, timestamp).
+        """
+        intern = self.interner.intern
+        # testId -> (variantes, eventos, timestamps)
+        columns: Dict[str, Tuple[List[int], List[int], List[float]]] = {}
+        if self.with_event:
+            for test_id, variant_id, event, timestamp in rows:
+                target = columns.get(test_id)
+                if target is None:
+                    target = columns[test_id] = ([], [], [])
+                target[0].append(intern(variant_id))
+                target[1].append(intern(event))
+                target[2].append(timestamp)
+        else:
+            for test_id, variant_id, timestamp in rows:
+                target = columns.get(test_id)
+                if target is None:
+                    target = columns[test_id] = ([], [], [])
+                target[0].append(intern(variant_id))
+                target[2].append(timestamp)
+
+        for test_id, (variants, events, timestamps) in columns.items():
+            partition = self._partition(test_id)
+            with partition.lock:
+                self._extend_partition(partition, variants, events, timestamps)
+
+    def _extend_partition(
+        self,
+        partition: EventPartition,
+        variants: List[int],
+        events: List[int],
+        timestamps: List[float]
+    ) -> None:
+        """Grava colunas de um teste, abrindo segmentos conforme necessário."""
+        position = 0
+        total = len(timestamps)
+        while position < total:
+            segment = self._writable(partition, timestamps[position])
+            stop = min(total, position + self.segment_size - len(segment))
+            deadline = segment.opened + self.segment_span
+            if max(timestamps[position:stop]) >= deadline:
+                # Fecha o segmento no primeiro evento além do intervalo
+                stop = next(
+                    i for i in range(position, stop) if timestamps[i] >= deadline
+                )
+            part = timestamps[position:stop]
+            segment.variants.extend(variants[position:stop])
+            if self.with_event:
+                segment.events.extend(events[position:stop])
+            segment.timestamps.extend(part)
+            segment.min_timestamp = min(segment.min_timestamp, min(part))
+            segment.max_timestamp = max(segment.max_timestamp, max(part))
+            # Um segmento aberto na próxima volta começa no ID seguinte
+            partition.next_id += stop - position
+            position = stop
+        partition.variant_ids.update(variants)
+
+    def read(
+        self,
+        test_id: str,
+        position: int,
+        limit: int,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        events: Optional[Collection[str]] = None
+    ) -> Tuple[EventBatch, Optional[int]]:
+        """
+        Lê os eventos de um teste a partir de `position`, um segmento por vez.
+
+        Só a partição do teste é lida; segmentos fora da janela são
+        pulados pelo intervalo de timestamps, sem ler as colunas. Os
+        demais são filtrados inteiros (vetorizado com NumPy, se
+        instalado) até reunir ao menos `limit` eventos, então o lote pode
+        passar de `limit` em até um segmento.
+
+        Args:
+            test_id: ID do teste
+            position: ID do evento onde a leitura começa (0 no início)
+            limit: Quantidade de eventos a partir da qual a leitura para
+            start: Início da janela (epoch, inclusivo), opcional
+            end: Fim da janela (epoch, exclusivo), opcional
+            events: Nomes de eventos aceitos (só em logs com evento)
+
+        Returns:
+            Tupla (lote, posição para a próxima leitura ou None se o log
+            chegou ao fim)
+        """
+        ids: List[int] = []
+        variants: List[int] = []
+        names: Optional[List[int]] = [] if self.with_event else None
+        timestamps: List[float] = []
+        partition = self.partitions.get(test_id)
+        event_indexes = None
+        if events is not None and self.with_event:
+            event_indexes = [
+                index for index in map(self.interner.get, events) if index is not None
+            ]
+        if partition is None or event_indexes == []:
+            return EventBatch([], [], names, []), None
+
+        segments = partition.segments
+        next_position: Optional[int] = None
+        for number, segment in enumerate(segments):
+            size = len(segment)
+            if segment.first_id + size <= position:
+                continue
+            if len(ids) >= limit:
+                next_position = segment.first_id
+                break
+            if (
+                (start is not None and segment.max_timestamp < start)
+                or (end is not None and segment.min_timestamp >= end)
+            ):
+                continue
+            offset = max(position - segment.first_id, 0)
+            positions, segment_variants, segment_events, segment_timestamps = _select(
+                segment, offset, size, start, end, event_indexes
+            )
+            ids.extend(segment.first_id + i for i in positions)
+            variants.extend(segment_variants)
+            if names is not None:
+                names.extend(segment_events)
+            timestamps.extend(segment_timestamps)
+            if number == len(segments) - 1 and len(ids) >= limit:
+                # Último segmento, ainda recebendo eventos: continua depois dele
+                next_position = segment.first_id + size
+
+        lookup = self.interner.lookup
+        return EventBatch(
+            ids,
+            [lookup(index) for index in variants],
+            [lookup(index) for index in names] if names is not None else None,
+            timestamps,
+        ), next_position
+
+    def variants(self, test_id: str) -> List[str]:
+        """Variantes que já tiveram eventos do teste no log."""
+        partition = self.partitions.get(test_id)
+        if partition is None:
+            return []
+        lookup = self.interner.lookup
+        return [lookup(index) for index in list(partition.variant_ids)]
+
+    def drop_test(self, test_id: str) -> int:
+        """
+        Descarta todos os segmentos de um teste.
+
+        A partição continua existindo (vazia), então os IDs de eventos
+        novos do teste seguem a numeração anterior.
+
+        Returns:
+            Quantidade de eventos descartados
+        """
+        partition = self.partitions.get(test_id)
+        if partition is None:
+            return 0
+        with partition.lock:
+            dropped = len(partition)
+            partition.segments = []
+            partition.variant_ids = set()
+        return dropped
+
+    def next_ids(self) -> Dict[str, int]:
+        """Próximo ID de cada teste que já recebeu eventos."""
+        return {
+            test_id: partition.next_id
+            for test_id, partition in list(self.partitions.items())
+            if partition.next_id
+        }
+
+    def reserve_ids(self, next_ids: Dict[str, int]) -> None:
+        """
+        Continua a numeração salva por `next_ids`.
+
+        O próximo ID de cada teste passa a ser ao menos o salvo, então IDs
+        já entregues antes de um reinício não são reutilizados.
+        """
+        for test_id, next_id in next_ids.items():
+            partition = self._partition(test_id)
+            with partition.lock:
+                if next_id > partition.next_id:
+                    partition.next_id = next_id
+
+    def drop_before(self, cutoff: float) -> Tuple[int, int]:
+        """
+        Descarta os segmentos cujos eventos são todos anteriores a `cutoff`.
+
+        Cada segmento sai da lista da partição inteiro, sem cópia de
+        colunas; um evento é mantido até o segmento todo expirar.
+
+        Returns:
+            Tupla (segmentos descartados, eventos descartados)
+        """
+        segments_dropped = 0
+        events_dropped = 0
+        for partition in list(self.partitions.values()):
+            if not partition.segments or partition.segments[0].min_timestamp >= cutoff:
+                continue
+            with partition.lock:
+                kept = []
+                for segment in partition.segments:
+                    if segment.max_timestamp < cutoff:
+                        segments_dropped += 1
+                        events_dropped += len(segment)
+                    else:
+                        kept.append(segment)
+                partition.segments = kept
+        return segments_dropped, events_dropped
+
+    def row(self, event_id: int, test_id: str, variant_index: int,
+            event_index: int, timestamp: float) -> dict:
+        """Monta a representação em dict de um evento."""
+        lookup = self.interner.lookup
+        row = {
+            "id": str(event_id),
+            "testId": test_id,
+            "variantId": lookup(variant_index),
+        }
+        if self.with_event:
+            row["event"] = lookup(event_index)
+        row["timestamp"] = to_datetime(timestamp)
+        return row
+
+    def __len__(self) -> int:
+        return sum(len(partition) for partition in list(self.partitions.values()))
+
+    def __iter__(self) -> Iterator[dict]:
+        for test_id, partition in list(self.partitions.items()):
+            for segment in partition.segments:
+                size = len(segment)
+                events = segment.events
+                for i in range(size):
+                    yield self.row(
+                        segment.first_id + i,
+                        test_id,
+                        segment.variants[i],
+                        events[i] if events is not None else 0,
+                        segment.timestamps[i],
+                    )
+
+    def segment_count(self) -> int:
+        return sum(len(partition.segments) for partition in list(self.partitions.values()))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.partitions = {}
+
+    def nbytes(self) -> int:
+        """Memória ocupada pelas colunas (sem contar o interner)."""
+        return sum(
+            segment.nbytes()
+            for partition in list(self.partitions.values())
+            for segment in partition.segments
+        )
@@ -3,6 +3,23 @@
  * 
  * Este SDK intercepta cliques em botões e envia métricas de conversão
  * para o backend de testes A/B.
+ *
+ * Modos (atributo data-mode):
+ * - "server" (padrão): chama /experiment a cada página e envia cada
+ *   conversão com um fetch.
+ * - "client": usa a configuração do teste (GET /test/{testId}/config,
+ *   guardada no localStorage), atribui a variante no navegador com o mesmo
+ *   hash do backend e envia impressões e conversões em lotes para
+ *   /events/batch via navigator.sendBeacon.
+ *
+ * Visitantes fora da alocação do teste (holdout) veem o controle, sem
+ * impressão nem conversões.
+ *
+ * No modo "client", a configuração em cache é aplicada sem esperar a rede,
+ * mas os eventos só são enviados depois que a revalidação confirma o
+ * teste. Se ela responder 404 (teste pausado, encerrado ou removido), a
+ * configuração e a atribuição guardadas e os eventos da página são
+ * descartados, e a página fica sem variante.
  */
 (function() {
   'use strict';
@@ -17,6 +34,8 @@
   // Ler parâmetros dos atributos data-*
   var testId = currentScript.getAttribute('data-test-id');
   var apiUrl = currentScript.getAttribute('data-api-url') || 'http://localhost:8000';
+  var mode = currentScript.getAttribute('data-mode') === 'client' ? 'client' : 'server';
+  var flushInterval = parseInt(currentScript.getAttribute('data-flush-interval'), 10) || 5000;
 
   // Validar parâmetros obrigatórios
   if (!testId) {
@@ -24,19 +43,299 @@
     return;
   }
 
+  var VISITOR_KEY = 'testeab:visitorId';
+  var CONFIG_KEY = 'testeab:config:' + testId;
+  var ASSIGNMENT_KEY = 'testeab:assignment:' + testId;
+  // Tamanho máximo de um lote (sendBeacon aceita até ~64 KB)
+  var MAX_QUEUE = 100;
+
+  /**
+   * Retorna um ID estável do visitante, persistido no localStorage.
+   * Com ele o backend atribui sempre a mesma variante ao mesmo visitante.
+   */
+  function getVisitorId() {
+    var id = null;
+    try {
+      id = window.localStorage.getItem(VISITOR_KEY);
+    } catch (e) {
+      // localStorage indisponível (modo privado, iframe bloqueado etc.)
+    }
+    if (!id) {
+      id = (window.crypto && window.crypto.randomUUID)
+        ? window.crypto.randomUUID()
+        : Date.now().toString(36) + Math.random().toString(36).slice(2);
+      try {
+        window.localStorage.setItem(VISITOR_KEY, id);
+      } catch (e) {
+        // Sem persistência: a atribuição vale apenas para esta página
+      }
+    }
+    return id;
+  }
+
+  function readStorage(key) {
+    try {
+      var value = window.localStorage.getItem(key);
+      return value ? JSON.parse(value) : null;
+    } catch (e) {
+      return null;
+    }
+  }
+
+  function writeStorage(key, value) {
+    try {
+      window.localStorage.setItem(key, JSON.stringify(value));
+    } catch (e) {
+      // Sem persistência: vale apenas para esta página
+    }
+  }
+
+  function removeStorage(key) {
+    try {
+      window.localStorage.removeItem(key);
+    } catch (e) {
+      // localStorage indisponível: não há o que remover
+    }
+  }
+
+  /**
+   * Bytes UTF-8 de uma string (o backend hasheia UTF-8)
+   */
+  function utf8Bytes(value) {
+    if (window.TextEncoder) {
+      return new TextEncoder().encode(value);
+    }
+    var binary = unescape(encodeURIComponent(value));
+    var bytes = new Array(binary.length);
+    for (var i = 0; i < binary.length; i++) {
+      bytes[i] = binary.charCodeAt(i);
+    }
+    return bytes;
+  }
+
+  /**
+   * Hash estável de 32 bits: FNV-1a + finalizador do MurmurHash3.
+   * Mesma função de services/variant_selector.py (stable_hash).
+   */
+  function stableHash(value) {
+    var bytes = utf8Bytes(value);
+    var h = 0x811c9dc5;
+    for (var i = 0; i < bytes.length; i++) {
+      h ^= bytes[i];
+      h = Math.imul(h, 0x01000193);
+    }
+    h ^= h >>> 16;
+    h = Math.imul(h, 0x85ebca6b);
+    h ^= h >>> 13;
+    h = Math.imul(h, 0xc2b2ae35);
+    h ^= h >>> 16;
+    return h >>> 0;
+  }
+
+  /**
+   * Variante do visitante na configuração do teste (a mesma que o
+   * backend atribuiria em /experiment com este visitorId)
+   */
+  function assignVariant(config) {
+    var bucketing = config.bucketing;
+    var bucket = stableHash(config.testId + ':' + bucketing.salt + ':' + visitorId) %
+      bucketing.bucketCount;
+    for (var i = 0; i < config.variants.length; i++) {
+      var range = config.variants[i].buckets;
+      if (bucket >= range[0] && bucket < range[1]) {
+        return config.variants[i];
+      }
+    }
+    return config.variants[config.variants.length - 1];
+  }
+
+  /**
+   * Se o visitante entra no teste pela alocação da configuração (a mesma
+   * decisão do backend em /experiment)
+   */
+  function inAllocation(config) {
+    var bucketing = config.bucketing;
+    if (bucketing.allocationBuckets === undefined ||
+        bucketing.allocationBuckets >= bucketing.bucketCount) {
+      return true;
+    }
+    var bucket = stableHash(
+      config.testId + ':' + bucketing.salt + ':allocation:' + visitorId
+    ) % bucketing.bucketCount;
+    return bucket < bucketing.allocationBuckets;
+  }
+
   // Estado interno do SDK
+  var visitorId = getVisitorId();
   var variantId = null;
   var sections = [];
+  var holdout = false;
   var isInitialized = false;
   var experimentCallInProgress = false;
 
   // Expor API pública em window.testeab
   window.testeab = {
+    visitorId: visitorId,
+    mode: mode,
     sections: sections,
     variantId: null,
+    holdout: false,
     isInitialized: false
   };
 
+  function applyVariant(newVariantId, newSections, newHoldout) {
+    variantId = newVariantId;
+    sections = newSections || [];
+    holdout = !!newHoldout;
+    isInitialized = true;
+    window.testeab.variantId = variantId;
+    window.testeab.sections = sections;
+    window.testeab.holdout = holdout;
+    window.testeab.isInitialized = true;
+  }
+
+  // Fila de eventos do modo "client", enviada em lotes para /events/batch
+  var queue = { impressions: [], conversions: [] };
+  // Com a configuração do cache, os eventos ficam retidos até a
+  // revalidação confirmar que o teste continua ativo
+  var awaitingConfig = false;
+
+  function enqueue(kind, event) {
+    event.testId = testId;
+    event.timestamp = Date.now() / 1000;
+    queue[kind].push(event);
+    if (queue.impressions.length + queue.conversions.length >= MAX_QUEUE) {
+      flush();
+    }
+  }
+
+  /**
+   * Envia os eventos pendentes em um único lote. Usa sendBeacon, que
+   * sobrevive ao fechamento da página; o corpo vai como text/plain para
+   * não exigir preflight de CORS.
+   */
+  function flush() {
+    if (awaitingConfig) {
+      return;
+    }
+    if (!queue.impressions.length && !queue.conversions.length) {
+      return;
+    }
+    var body = JSON.stringify(queue);
+    queue = { impressions: [], conversions: [] };
+    var url = apiUrl + '/events/batch';
+
+    if (navigator.sendBeacon && navigator.sendBeacon(url, body)) {
+      return;
+    }
+    fetch(url, {
+      method: 'POST',
+      headers: { 'Content-Type': 'text/plain' },
+      body: body,
+      keepalive: true
+    }).catch(function(error) {
+      console.error('[AB Test SDK] Erro ao enviar eventos:', error);
+    });
+  }
+
+  /**
+   * Atribui a variante a partir da configuração do teste, reaproveitando
+   * a atribuição guardada enquanto a variante existir, e enfileira a
+   * impressão. Fora da alocação, aplica o controle sem impressão.
+   */
+  function assignFromConfig(config) {
+    if (!inAllocation(config)) {
+      applyVariant(config.variants[0].variantId, config.variants[0].sections, true);
+      console.log('[AB Test SDK] Visitante fora da alocação (holdout):', variantId);
+      return;
+    }
+    var stored = readStorage(ASSIGNMENT_KEY);
+    var variant = null;
+    if (stored) {
+      for (var i = 0; i < config.variants.length; i++) {
+        if (config.variants[i].variantId === stored.variantId) {
+          variant = config.variants[i];
+        }
+      }
+    }
+    if (!variant) {
+      variant = assignVariant(config);
+      writeStorage(ASSIGNMENT_KEY, { variantId: variant.variantId });
+    }
+    applyVariant(variant.variantId, variant.sections);
+    enqueue('impressions', { variantId: variantId });
+    console.log('[AB Test SDK] Variante atribuída no cliente:', variantId);
+  }
+
+  /**
+   * O teste não está mais ativo (a configuração respondeu 404): descarta a
+   * configuração e a atribuição guardadas e os eventos retidos desta
+   * página, que fica sem variante.
+   */
+  function dropConfig() {
+    removeStorage(CONFIG_KEY);
+    removeStorage(ASSIGNMENT_KEY);
+    queue = { impressions: [], conversions: [] };
+    awaitingConfig = false;
+    applyVariant(null, [], false);
+    console.log('[AB Test SDK] Teste inativo, configuração descartada:', testId);
+  }
+
+  /**
+   * Modo "client": renderiza com a configuração em cache, sem esperar a
+   * rede, e atualiza o cache em segundo plano (o navegador revalida com
+   * ETag); os eventos da página ficam retidos até essa resposta. Sem
+   * cache, espera a configuração; se ela falhar (exceto 404), cai para
+   * /experiment.
+   */
+  function initClientMode() {
+    var cached = readStorage(CONFIG_KEY);
+    if (cached) {
+      awaitingConfig = true;
+      assignFromConfig(cached);
+    }
+
+    fetch(apiUrl + '/test/' + encodeURIComponent(testId) + '/config')
+      .then(function(response) {
+        if (response.status === 404) {
+          return null;
+        }
+        if (!response.ok) {
+          throw new Error('HTTP error! status: ' + response.status);
+        }
+        return response.json();
+      })
+      .then(function(config) {
+        if (!config) {
+          dropConfig();
+          return;
+        }
+        writeStorage(CONFIG_KEY, config);
+        awaitingConfig = false;
+        if (!isInitialized) {
+          assignFromConfig(config);
+        }
+        flush();
+      })
+      .catch(function(error) {
+        console.error('[AB Test SDK] Erro ao obter configuração:', error);
+        // Sem resposta do backend, mantém a atribuição do cache
+        awaitingConfig = false;
+        if (!isInitialized) {
+          getExperiment();
+        }
+      });
+
+    setInterval(flush, flushInterval);
+    document.addEventListener('visibilitychange', function() {
+      if (document.visibilityState === 'hidden') {
+        flush();
+      }
+    });
+    window.addEventListener('pagehide', flush);
+    window.testeab.flush = flush;
+  }
+
   /**
    * Chama o endpoint /experiment para obter a variante do visitante
    */
@@ -54,7 +353,8 @@
           'Content-Type': 'application/json'
         },
         body: JSON.stringify({
-          testId: testId
+          testId: testId,
+          visitorId: visitorId
         })
       });
 
@@ -63,14 +363,7 @@
       }
 
       const data = await response.json();
-      variantId = data.variantId;
-      sections = data.sections || [];
-      isInitialized = true;
-      
-      // Atualizar window.testeab com os dados obtidos
-      window.testeab.variantId = variantId;
-      window.testeab.sections = sections;
-      window.testeab.isInitialized = true;
+      applyVariant(data.variantId, data.sections, data.holdout);
       
       console.log('[AB Test SDK] Variante obtida:', variantId);
       console.log('[AB Test SDK] Seções obtidas:', sections);
@@ -91,8 +384,18 @@
       return;
     }
 
+    if (holdout) {
+      // Fora do teste: a conversão não pertence a nenhuma variante
+      return;
+    }
+
     const event = `click-${buttonText}`;
 
+    if (mode === 'client') {
+      enqueue('conversions', { variantId: variantId, event: event });
+      return;
+    }
+
     try {
       const response = await fetch(`${apiUrl}/conversion`, {
         method: 'POST',
@@ -170,8 +473,13 @@
    * Inicializa o SDK
    */
   function init() {
-    // Chamar /experiment para obter a variante
-    getExperiment();
+    if (mode === 'client') {
+      // Atribuição local a partir da configuração do teste
+      initClientMode();
+    } else {
+      // Chamar /experiment para obter a variante
+      getExperiment();
+    }
 
     // Adicionar event listener usando event delegation no document
     // Isso captura todos os botões, incluindo os adicionados dinamicamente
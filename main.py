@@ -1,6 +1,7 @@
 """Aplicação FastAPI principal."""
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
 
 from core.config import settings
 from core.exceptions import (
@@ -9,13 +10,60 @@ from core.exceptions import (
     TestInactiveError,
     InvalidDistributionError,
     TestAlreadyExistsError,
+    InvalidEventBatchError,
+    InvalidTestBatchError,
+    InvalidTestLifecycleError,
+    InvalidMetricsWindowError,
+    InvalidExportRequestError,
+    EventPurgeNotSupportedError,
+    ProfilerNotAllowedError,
+    InvalidProfilerSettingsError,
+)
+from api.routes import admin, experiment, conversion, events, internal, test_config
+from api.dependencies import (
+    get_impression_pipeline,
+    get_lifecycle_scheduler,
+    get_repository,
+    get_retention_service,
+    get_traffic_recorder,
 )
-from api.routes import admin, experiment, conversion
+from api.responses import FastJSONResponse
+from api.middleware import CaptureMiddleware, ProfilerMiddleware, TelemetryMiddleware
+from core.executor import shutdown_executor
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicia e encerra tarefas em segundo plano da aplicação."""
+    repository = await get_repository()
+    pipeline = get_impression_pipeline()
+    recorder = get_traffic_recorder()
+    retention = await get_retention_service()
+    scheduler = get_lifecycle_scheduler()
+    if pipeline is not None:
+        pipeline.start()
+    if recorder is not None:
+        recorder.start()
+    retention.start()
+    scheduler.start()
+    yield
+    await scheduler.stop()
+    await retention.stop()
+    if pipeline is not None:
+        # Grava as impressões ainda na fila antes de encerrar
+        await pipeline.stop()
+    if recorder is not None:
+        await recorder.stop()
+    # Termina as chamadas ainda no executor antes de fechar o repositório
+    shutdown_executor()
+    repository.close()
+
 
 # Criar aplicação FastAPI
 app = FastAPI(
     title=settings.API_TITLE,
-    version=settings.API_VERSION
+    version=settings.API_VERSION,
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -27,35 +75,66 @@ app.add_middleware(
     allow_credentials=settings.CORS_CREDENTIALS,
     allow_methods=settings.CORS_METHODS,
     allow_headers=settings.CORS_HEADERS,
+    expose_headers=settings.CORS_EXPOSE_HEADERS,
 )
 
+# Profiler por amostragem (ligado em tempo de execução por PUT /admin/profile)
+if settings.PROFILER_ALLOWED:
+    app.add_middleware(ProfilerMiddleware)
+
+# Duração das requisições por rota (GET /internal/metrics)
+if settings.TELEMETRY_ENABLED:
+    app.add_middleware(TelemetryMiddleware)
+
+# Captura de tráfego para replay (opcional, AB_CAPTURE_ENABLED=1)
+if get_traffic_recorder() is not None:
+    app.add_middleware(CaptureMiddleware, recorder=get_traffic_recorder())
+
 
 # Handler global de exceções
 @app.exception_handler(ABTestException)
 async def abtest_exception_handler(request: Request, exc: ABTestException):
     """Converte exceções customizadas em HTTPException."""
     if isinstance(exc, TestNotFoundError):
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=404,
             content={"detail": str(exc)}
         )
     elif isinstance(exc, TestInactiveError):
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=404,
             content={"detail": str(exc)}
         )
-    elif isinstance(exc, InvalidDistributionError):
-        return JSONResponse(
+    elif isinstance(exc, (
+        InvalidDistributionError,
+        InvalidEventBatchError,
+        InvalidTestBatchError,
+        InvalidTestLifecycleError,
+        InvalidMetricsWindowError,
+        InvalidExportRequestError,
+        InvalidProfilerSettingsError,
+    )):
+        return FastJSONResponse(
             status_code=400,
             content={"detail": str(exc)}
         )
     elif isinstance(exc, TestAlreadyExistsError):
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=409,
             content={"detail": str(exc)}
         )
+    elif isinstance(exc, ProfilerNotAllowedError):
+        return FastJSONResponse(
+            status_code=403,
+            content={"detail": str(exc)}
+        )
+    elif isinstance(exc, EventPurgeNotSupportedError):
+        return FastJSONResponse(
+            status_code=501,
+            content={"detail": str(exc)}
+        )
     else:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"detail": "Internal server error"}
         )
@@ -65,6 +144,9 @@ async def abtest_exception_handler(request: Request, exc: ABTestException):
 app.include_router(admin.router)
 app.include_router(experiment.router)
 app.include_router(conversion.router)
+app.include_router(events.router)
+app.include_router(test_config.router)
+app.include_router(internal.router)
 
 
 @app.get("/")
@@ -0,0 +1,233 @@
+"""
+Journal binário append-only para persistência de eventos e testes.
+
+Formato de cada registro:
+
+    <tamanho: uint32> <crc32: uint32> <payload>
+
+O payload começa com o tipo do registro (uint8) e o timestamp (float64),
+seguidos dos campos de texto, cada um com tamanho uint16 + UTF-8. Testes
+são gravados como JSON. Um registro truncado ou com CRC inválido marca o
+fim do journal (escrita interrompida por queda do processo).
+
+O journal é dividido em segmentos `journal.<seq>.log`; a cada snapshot um
+novo segmento é aberto, de modo que a inicialização só precisa reler os
+segmentos posteriores ao snapshot. Depois que o snapshot está gravado de
+forma durável, os segmentos anteriores a ele são apagados.
+"""
+import json
+import os
+import struct
+import threading
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+
+RECORD_IMPRESSION = 1
+RECORD_CONVERSION = 2
+RECORD_TEST = 3
+# Exclusão dos eventos de um teste (campo: testId)
+RECORD_DELETE_TEST_EVENTS = 4
+# Retenção (timestamp do registro: o corte; sem campos)
+RECORD_RETENTION = 5
+
+_HEADER = struct.Struct("<II")
+_PREFIX = struct.Struct("<Bd")
+_TEXT_LEN = struct.Struct("<H")
+
+SEGMENT_PREFIX = "journal."
+SEGMENT_SUFFIX = ".log"
+SNAPSHOT_FILE = "snapshot.json"
+
+
+def _text(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return _TEXT_LEN.pack(len(data)) + data
+
+
+def encode_record(kind: int, timestamp: float, *fields: str) -> bytes:
+    """Codifica um registro completo (cabeçalho + payload)."""
+    payload = _PREFIX.pack(kind, timestamp) + b"".join(_text(f) for f in fields)
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def encode_test(test: dict) -> bytes:
+    """Codifica a definição de um teste."""
+    data = json.dumps(test, separators=(",", ":")).encode("utf-8")
+    payload = _PREFIX.pack(RECORD_TEST, 0.0) + struct.pack("<I", len(data)) + data
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_records(data: bytes) -> Iterator[Tuple[int, float, tuple]]:
+    """
+    Decodifica registros de um segmento.
+
+    Produz (tipo, timestamp, campos); para testes, campos é (dict,).
+    Para na primeira entrada truncada ou corrompida.
+    """
+    view = memoryview(data)
+    position = 0
+    end = len(data)
+    while position + _HEADER.size <= end:
+        length, crc = _HEADER.unpack_from(view, position)
+        start = position + _HEADER.size
+        if start + length > end:
+            return
+        payload = view[start:start + length]
+        if zlib.crc32(payload) != crc:
+            return
+        kind, timestamp = _PREFIX.unpack_from(payload, 0)
+        offset = _PREFIX.size
+        if kind == RECORD_TEST:
+            (size,) = struct.unpack_from("<I", payload, offset)
+            offset += 4
+            fields = (json.loads(bytes(payload[offset:offset + size])),)
+        else:
+            values = []
+            while offset < length:
+                (size,) = _TEXT_LEN.unpack_from(payload, offset)
+                offset += _TEXT_LEN.size
+                values.append(bytes(payload[offset:offset + size]).decode("utf-8"))
+                offset += size
+            fields = tuple(values)
+        yield kind, timestamp, fields
+        position = start + length
+
+
+def segment_name(sequence: int) -> str:
+    return f"{SEGMENT_PREFIX}{sequence:08d}{SEGMENT_SUFFIX}"
+
+
+def list_segments(directory: str) -> List[int]:
+    """Retorna os números de sequência dos segmentos existentes, ordenados."""
+    sequences = []
+    for name in os.listdir(directory):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            middle = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+            if middle.isdigit():
+                sequences.append(int(middle))
+    return sorted(sequences)
+
+
+class EventJournal:
+    """
+    Escritor do journal com group commit.
+
+    `append` só acumula bytes em um buffer; `sync` grava o buffer no
+    segmento atual e faz um único fsync para todos os registros pendentes.
+    Uma thread em segundo plano chama `sync` a cada `fsync_interval`
+    segundos, limitando a janela de perda em caso de queda.
+    """
+
+    def __init__(self, directory: str, sequence: int, fsync_interval: float = 0.05):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self._buffer = bytearray()
+        self._buffer_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._file = None
+        self.sequence = sequence
+        self._open_segment(sequence)
+
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._sync_loop, name="journal-sync", daemon=True
+        )
+        self._thread.start()
+
+    def _open_segment(self, sequence: int) -> None:
+        path = os.path.join(self.directory, segment_name(sequence))
+        self._file = open(path, "ab")
+        self.sequence = sequence
+
+    def append(self, record: bytes) -> None:
+        """Adiciona registros já codificados ao buffer."""
+        with self._buffer_lock:
+            self._buffer += record
+
+    def sync(self) -> None:
+        """Grava o buffer pendente e faz fsync (group commit)."""
+        with self._io_lock:
+            with self._buffer_lock:
+                if not self._buffer:
+                    return
+                pending = self._buffer
+                self._buffer = bytearray()
+            self._file.write(pending)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def roll(self) -> int:
+        """
+        Grava o buffer, fecha o segmento atual e abre o próximo.
+
+        Returns:
+            Número de sequência do novo segmento
+        """
+        self.sync()
+        with self._io_lock:
+            self._file.close()
+            self._open_segment(self.sequence + 1)
+        return self.sequence
+
+    def _sync_loop(self) -> None:
+        while not self._closed.wait(self.fsync_interval):
+            self.sync()
+
+    def close(self) -> None:
+        """Para a thread de sync e grava o que estiver pendente."""
+        self._closed.set()
+        self._thread.join()
+        self.sync()
+        with self._io_lock:
+            self._file.close()
+
+
+def write_snapshot(directory: str, state: dict, segment: int) -> None:
+    """
+    Grava o snapshot de forma atômica (arquivo temporário + rename) e faz
+    fsync do diretório, para que o rename sobreviva a uma queda.
+    """
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"segment": segment, "state": state}, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    directory_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+def remove_segments_before(directory: str, segment: int) -> int:
+    """
+    Apaga os segmentos com sequência menor que `segment`.
+
+    Só deve ser chamada depois de `write_snapshot` com esse `segment`: a
+    inicialização não relê esses segmentos.
+
+    Returns:
+        Quantidade de segmentos apagados
+    """
+    removed = 0
+    for sequence in list_segments(directory):
+        if sequence >= segment:
+            break
+        try:
+            os.remove(os.path.join(directory, segment_name(sequence)))
+        except FileNotFoundError:
+            continue
+        removed += 1
+    return removed
+
+
+def read_snapshot(directory: str) -> Optional[dict]:
+    """Lê o snapshot, se existir."""
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
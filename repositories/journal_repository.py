@@ -0,0 +1,247 @@
+"""Repositório em memória com persistência em journal + snapshot."""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import storage
+from repositories.test_repository import TestRepository
+from repositories.journal import (
+    RECORD_CONVERSION,
+    RECORD_DELETE_TEST_EVENTS,
+    RECORD_IMPRESSION,
+    RECORD_RETENTION,
+    RECORD_TEST,
+    EventJournal,
+    decode_records,
+    encode_record,
+    encode_test,
+    list_segments,
+    read_snapshot,
+    remove_segments_before,
+    segment_name,
+    write_snapshot,
+)
+
+
+REPLAY_BATCH_SIZE = 65536
+
+
+class JournaledTestRepository(TestRepository):
+    """
+    Repositório que mantém o estado em memória e registra cada escrita em
+    um journal append-only.
+    
+    Na inicialização carrega o último snapshot (testes e contadores
+    agregados) e reaplica apenas os segmentos do journal posteriores a ele,
+    então o tempo de reinício depende do tamanho da cauda, não do total de
+    eventos. Os eventos brutos anteriores ao snapshot não são recarregados
+    em memória, e os segmentos que os guardam são apagados assim que o
+    snapshot está gravado, então o uso de disco acompanha a cauda.
+    """
+    
+    def __init__(
+        self,
+        directory: str,
+        fsync_interval: float = 0.05,
+        snapshot_interval: float = 300.0
+    ):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        
+        os.makedirs(directory, exist_ok=True)
+        next_segment = self._recover()
+        self.journal = EventJournal(directory, next_segment, fsync_interval)
+        
+        self._closed = threading.Event()
+        self._snapshot_thread = threading.Thread(
+            target=self._snapshot_loop, name="journal-snapshot", daemon=True
+        )
+        self._snapshot_thread.start()
+    
+    def _recover(self) -> int:
+        """
+        Carrega o snapshot e reaplica a cauda do journal.
+        
+        Returns:
+            Sequência do segmento onde as novas escritas devem começar
+        """
+        first_segment = 0
+        snapshot = read_snapshot(self.directory)
+        if snapshot is not None:
+            storage.import_state(snapshot["state"])
+            first_segment = snapshot["segment"]
+        
+        segments = [s for s in list_segments(self.directory) if s >= first_segment]
+        for sequence in segments:
+            path = os.path.join(self.directory, segment_name(sequence))
+            with open(path, "rb") as f:
+                self._replay(f.read())
+            if os.path.getsize(path) == 0:
+                os.remove(path)
+        
+        # Sempre começa um segmento novo: o último pode ter cauda truncada
+        return max(segments[-1] + 1 if segments else 0, first_segment)
+    
+    @staticmethod
+    def _replay(data: bytes) -> None:
+        impressions: List[Tuple[str, str, float]] = []
+        conversions: List[Tuple[str, str, str, float]] = []
+        for kind, timestamp, fields in decode_records(data):
+            if kind == RECORD_IMPRESSION:
+                impressions.append((fields[0], fields[1], timestamp))
+            elif kind == RECORD_CONVERSION:
+                conversions.append((fields[0], fields[1], fields[2], timestamp))
+            elif kind == RECORD_TEST:
+                test = fields[0]
+                storage.save_tests([test])
+            elif kind in (RECORD_DELETE_TEST_EVENTS, RECORD_RETENTION):
+                # Aplica os eventos anteriores antes da exclusão
+                storage.add_impressions(impressions)
+                storage.add_conversions(conversions)
+                impressions = []
+                conversions = []
+                if kind == RECORD_DELETE_TEST_EVENTS:
+                    storage.delete_test_events(fields[0])
+                else:
+                    storage.drop_events_before(timestamp)
+            if len(impressions) >= REPLAY_BATCH_SIZE:
+                storage.add_impressions(impressions)
+                impressions = []
+            if len(conversions) >= REPLAY_BATCH_SIZE:
+                storage.add_conversions(conversions)
+                conversions = []
+        storage.add_impressions(impressions)
+        storage.add_conversions(conversions)
+    
+    def save_test(
+        self,
+        test_id: str,
+        name: str,
+        variants: List[Dict],
+        status: str = "active",
+        start_at: Optional[float] = None,
+        end_at: Optional[float] = None,
+        allocation: float = 100.0
+    ) -> None:
+        """Salva ou atualiza um teste."""
+        with self._lock:
+            storage.save_test(test_id, name, variants, status, start_at, end_at, allocation)
+            self.journal.append(encode_test(storage.get_test(test_id)))
+            self._dirty = True
+    
+    def save_tests(self, tests: List[Dict]) -> None:
+        """
+        Salva vários testes como uma única versão, com um registro de
+        teste por item no journal.
+        """
+        with self._lock:
+            storage.save_tests(tests)
+            for test in tests:
+                self.journal.append(encode_test(storage.get_test(test["testId"])))
+            self._dirty = True
+    
+    def add_impression(self, test_id: str, variant_id: str) -> Dict:
+        """Adiciona uma impressão."""
+        timestamp = time.time()
+        with self._lock:
+            self.journal.append(
+                encode_record(RECORD_IMPRESSION, timestamp, test_id, variant_id)
+            )
+            self._dirty = True
+            return storage.add_impression(test_id, variant_id, timestamp)
+    
+    def add_impressions(self, events: List[Tuple[str, str, float]]) -> None:
+        """Adiciona um lote de impressões (test_id, variant_id, timestamp)."""
+        record = b"".join(
+            encode_record(RECORD_IMPRESSION, timestamp, test_id, variant_id)
+            for test_id, variant_id, timestamp in events
+        )
+        with self._lock:
+            self.journal.append(record)
+            self._dirty = True
+            storage.add_impressions(events)
+    
+    def add_conversion(self, test_id: str, variant_id: str, event: str) -> Dict:
+        """Adiciona uma conversão."""
+        timestamp = time.time()
+        with self._lock:
+            self.journal.append(
+                encode_record(RECORD_CONVERSION, timestamp, test_id, variant_id, event)
+            )
+            self._dirty = True
+            return storage.add_conversion(test_id, variant_id, event, timestamp)
+    
+    def add_conversions(self, events: List[Tuple[str, str, str, float]]) -> None:
+        """Adiciona um lote de conversões (test_id, variant_id, event, timestamp)."""
+        record = b"".join(
+            encode_record(RECORD_CONVERSION, timestamp, test_id, variant_id, event)
+            for test_id, variant_id, event, timestamp in events
+        )
+        with self._lock:
+            self.journal.append(record)
+            self._dirty = True
+            storage.add_conversions(events)
+    
+    def add_events(
+        self,
+        impressions: List[Tuple[str, str, float]],
+        conversions: List[Tuple[str, str, str, float]]
+    ) -> None:
+        """Adiciona lotes de impressões e conversões em uma única chamada."""
+        if impressions:
+            self.add_impressions(impressions)
+        if conversions:
+            self.add_conversions(conversions)
+    
+    def delete_test_events(self, test_id: str) -> int:
+        """
+        Descarta os dados de eventos de um teste e registra a exclusão.
+        
+        Os segmentos do journal já gravados não são reescritos; o registro
+        impede que os eventos excluídos voltem na reaplicação.
+        """
+        with self._lock:
+            self.journal.append(
+                encode_record(RECORD_DELETE_TEST_EVENTS, time.time(), test_id)
+            )
+            self._dirty = True
+            return storage.delete_test_events(test_id)
+    
+    def drop_events_before(self, cutoff: float) -> Dict[str, int]:
+        """Aplica a retenção e registra o corte, reaplicado no reinício."""
+        with self._lock:
+            self.journal.append(encode_record(RECORD_RETENTION, cutoff))
+            self._dirty = True
+            return storage.drop_events_before(cutoff)
+    
+    def snapshot(self) -> None:
+        """
+        Grava um snapshot de testes e contadores e inicia um novo segmento.
+        
+        A troca de segmento e a cópia do estado acontecem sob o mesmo lock
+        das escritas, então o snapshot corresponde exatamente ao início do
+        novo segmento. Com o snapshot gravado, os segmentos anteriores não
+        são mais lidos e são apagados.
+        """
+        with self._lock:
+            segment = self.journal.roll()
+            state = storage.export_state()
+            self._dirty = False
+        write_snapshot(self.directory, state, segment)
+        remove_segments_before(self.directory, segment)
+    
+    def _snapshot_loop(self) -> None:
+        while not self._closed.wait(self.snapshot_interval):
+            if self._dirty:
+                self.snapshot()
+    
+    def close(self) -> None:
+        """Grava um snapshot final e fecha o journal."""
+        self._closed.set()
+        self._snapshot_thread.join()
+        if self._dirty:
+            self.snapshot()
+        self.journal.close()
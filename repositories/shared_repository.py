@@ -0,0 +1,234 @@
+"""Repositório para execução com vários workers (uvicorn --workers N)."""
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import storage
+from core.exceptions import EventPurgeNotSupportedError
+from repositories.test_repository import TestRepository
+from repositories.shared_state import SharedConfig, SharedCounters
+
+
+IMPRESSION = "i"
+CONVERSION = "c"
+
+
+def _rollup_kind(kind: str, granularity: str) -> str:
+    """Tipo do contador de rollup, ex.: "i:hour"."""
+    return f"{kind}:{granularity}"
+
+
+def _impression_keys(events: List[Tuple[str, str, float]]) -> Counter:
+    """Contadores (total e rollups) de um lote de impressões."""
+    keys: Counter = Counter()
+    for test_id, variant_id, timestamp in events:
+        keys[(IMPRESSION, test_id, variant_id, "")] += 1
+        for granularity, step in storage.ROLLUP_GRANULARITIES.items():
+            bucket = int(timestamp // step) * step
+            keys[(_rollup_kind(IMPRESSION, granularity), test_id, variant_id, str(bucket))] += 1
+    return keys
+
+
+def _conversion_keys(events: List[Tuple[str, str, str, float]]) -> Counter:
+    """Contadores (total por evento e rollups) de um lote de conversões."""
+    keys: Counter = Counter()
+    for test_id, variant_id, event, timestamp in events:
+        keys[(CONVERSION, test_id, variant_id, event)] += 1
+        for granularity, step in storage.ROLLUP_GRANULARITIES.items():
+            bucket = int(timestamp // step) * step
+            keys[(
+                _rollup_kind(CONVERSION, granularity), test_id, variant_id, f"{bucket}:{event}"
+            )] += 1
+    return keys
+
+
+class SharedTestRepository(TestRepository):
+    """
+    Repositório em memória cujo estado relevante é visível a todos os workers.
+    
+    As definições de testes são publicadas em `SharedConfig`; cada worker
+    recarrega sua cópia local apenas quando a versão publicada muda. Os
+    eventos brutos continuam no armazenamento local do worker, mas cada
+    escrita também incrementa o segmento de contadores do processo, e as
+    contagens somam os segmentos de todos os workers.
+    
+    A exclusão de eventos de um teste e a retenção não são suportadas: os
+    eventos brutos dos outros workers ficam fora do alcance deste, e os
+    segmentos de contadores são incrementados por cada processo sem
+    coordenação, então zerá-los de outro processo perderia ou
+    ressuscitaria contagens.
+    """
+    
+    supports_event_purge = False
+    
+    def __init__(self, directory: str, counter_slots: int = 65536):
+        os.makedirs(directory, exist_ok=True)
+        self.config = SharedConfig(directory)
+        self.counters = SharedCounters(directory, counter_slots)
+        self._loaded_version = -1
+        self._reload_lock = threading.Lock()
+        self.get_config_version()
+    
+    def get_config_version(self) -> int:
+        """Versão publicada; recarrega os testes locais se ela mudou."""
+        version = self.config.version()
+        if version != self._loaded_version:
+            with self._reload_lock:
+                if version != self._loaded_version:
+                    storage.replace_tests(self.config.load())
+                    self._loaded_version = version
+        return version
+    
+    def get_test_version(self, test_id: str) -> int:
+        """Versão local de um teste, atualizada quando a recarga o altera."""
+        self.get_config_version()
+        return storage.get_test_version(test_id)
+    
+    def get_test(self, test_id: str) -> Optional[Dict]:
+        """Busca um teste pelo ID."""
+        self.get_config_version()
+        return storage.get_test(test_id)
+    
+    def get_all_tests(self) -> List[Dict]:
+        """Retorna todos os testes."""
+        self.get_config_version()
+        return storage.get_all_tests()
+    
+    def list_tests(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        status: Optional[str] = None,
+        name: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Página de testes, do índice local atualizado na recarga."""
+        self.get_config_version()
+        return storage.list_tests(cursor, limit, status, name)
+    
+    def save_test(
+        self,
+        test_id: str,
+        name: str,
+        variants: List[Dict],
+        status: str = "active",
+        start_at: Optional[float] = None,
+        end_at: Optional[float] = None,
+        allocation: float = 100.0
+    ) -> None:
+        """Salva ou atualiza um teste e publica para todos os workers."""
+        self.config.publish([
+            storage.make_test(test_id, name, variants, status, start_at, end_at, allocation)
+        ])
+        self.get_config_version()
+    
+    def save_tests(self, tests: List[Dict]) -> None:
+        """Publica vários testes como uma única versão para todos os workers."""
+        self.config.publish([storage.copy_test(test) for test in tests])
+        self.get_config_version()
+    
+    def add_impression(self, test_id: str, variant_id: str) -> Dict:
+        """Adiciona uma impressão."""
+        timestamp = time.time()
+        self.counters.add_many(_impression_keys([(test_id, variant_id, timestamp)]))
+        return storage.add_impression(test_id, variant_id, timestamp)
+    
+    def add_impressions(self, events: List[Tuple[str, str, float]]) -> None:
+        """Adiciona um lote de impressões (test_id, variant_id, timestamp)."""
+        self.counters.add_many(_impression_keys(events))
+        storage.add_impressions(events)
+    
+    def add_conversion(self, test_id: str, variant_id: str, event: str) -> Dict:
+        """Adiciona uma conversão."""
+        timestamp = time.time()
+        self.counters.add_many(
+            _conversion_keys([(test_id, variant_id, event, timestamp)])
+        )
+        return storage.add_conversion(test_id, variant_id, event, timestamp)
+    
+    def add_conversions(self, events: List[Tuple[str, str, str, float]]) -> None:
+        """Adiciona um lote de conversões (test_id, variant_id, event, timestamp)."""
+        self.counters.add_many(_conversion_keys(events))
+        storage.add_conversions(events)
+    
+    def add_events(
+        self,
+        impressions: List[Tuple[str, str, float]],
+        conversions: List[Tuple[str, str, str, float]]
+    ) -> None:
+        """Adiciona lotes de impressões e conversões em uma única chamada."""
+        if impressions:
+            self.add_impressions(impressions)
+        if conversions:
+            self.add_conversions(conversions)
+    
+    def count_impressions(self, test_id: str, variant_id: str) -> int:
+        """Conta impressões de todos os workers."""
+        return sum(self.counters.totals(IMPRESSION, test_id, variant_id).values())
+    
+    def count_conversions(self, test_id: str, variant_id: str) -> int:
+        """Conta conversões de todos os workers."""
+        return sum(self.counters.totals(CONVERSION, test_id, variant_id).values())
+    
+    def count_conversions_by_event(
+        self,
+        test_id: str,
+        variant_id: str
+    ) -> Dict[str, int]:
+        """Conta conversões por evento, somando todos os workers."""
+        return self.counters.totals(CONVERSION, test_id, variant_id)
+    
+    def delete_test_events(self, test_id: str) -> int:
+        """
+        Recusa a exclusão, que não zeraria os contadores compartilhados.
+        
+        Raises:
+            EventPurgeNotSupportedError: Sempre, neste backend
+        """
+        raise EventPurgeNotSupportedError(
+            "Deleting test events is not supported by the shared storage backend"
+        )
+    
+    def drop_events_before(self, cutoff: float) -> Dict[str, int]:
+        """
+        Recusa a retenção, que não descartaria os rollups compartilhados.
+        
+        Raises:
+            EventPurgeNotSupportedError: Sempre, neste backend
+        """
+        raise EventPurgeNotSupportedError(
+            "Event retention is not supported by the shared storage backend"
+        )
+    
+    def get_rollups(
+        self,
+        test_id: str,
+        variant_id: str,
+        granularity: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> List[Tuple[int, int, Dict[str, int]]]:
+        """Buckets de tempo não vazios de uma variante, somando todos os workers."""
+        buckets: Dict[int, Tuple[int, Dict[str, int]]] = {}
+        impressions = self.counters.totals(
+            _rollup_kind(IMPRESSION, granularity), test_id, variant_id
+        )
+        for bucket, count in impressions.items():
+            buckets[int(bucket)] = (count, {})
+        conversions = self.counters.totals(
+            _rollup_kind(CONVERSION, granularity), test_id, variant_id
+        )
+        for key, count in conversions.items():
+            bucket, event = key.split(":", 1)
+            buckets.setdefault(int(bucket), (0, {}))[1][event] = count
+        return [
+            (bucket, count, by_event)
+            for bucket, (count, by_event) in sorted(buckets.items())
+            if (start is None or bucket >= start) and (end is None or bucket < end)
+        ]
+    
+    def close(self) -> None:
+        """Fecha os segmentos compartilhados."""
+        self.counters.close()
+        self.config.close()
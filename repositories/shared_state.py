@@ -0,0 +1,420 @@
+"""
+Estado compartilhado entre processos (ex.: `uvicorn --workers N`).
+
+- `SharedConfig`: definições de testes em um arquivo JSON, publicado de
+  forma atômica, com um contador de versão de 8 bytes mapeado em memória.
+  Cada worker detecta mudanças lendo apenas esse contador.
+- `SharedCounters`: cada processo grava seus contadores em um segmento
+  próprio mapeado em memória (`counters-<id>.bin`), com a lista de chaves
+  em um arquivo ao lado (`counters-<id>.keys`, uma chave por linha). A
+  leitura soma os segmentos de todos os processos, sem coordenação na
+  escrita. Um contador de geração mapeado em memória
+  (`counters.generation`) muda a cada segmento ou chave nova, então a
+  leitura só relista o diretório e relê as chaves quando ele muda.
+  Segmentos de execuções anteriores continuam sendo somados; na
+  inicialização, os que nenhum processo vivo mantém travados são
+  fundidos em um único segmento.
+
+Requer um sistema POSIX (usa `fcntl.flock`).
+"""
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+_VERSION = struct.Struct("<Q")
+_SLOT = struct.Struct("<q")
+
+CONFIG_FILE = "tests.json"
+VERSION_FILE = "config.version"
+LOCK_FILE = "config.lock"
+COUNTERS_PREFIX = "counters-"
+COUNTERS_GENERATION_FILE = "counters.generation"
+COUNTERS_LOCK_FILE = "counters.lock"
+# Lista dos segmentos fundidos, apagada quando a fusão termina
+MERGED_SUFFIX = ".merged"
+
+# (tipo, test_id, variant_id, evento); tipo "i" = impressão, "c" = conversão
+CounterKey = Tuple[str, str, str, str]
+
+
+@contextmanager
+def _flocked(path: str) -> Iterator[None]:
+    """Lock exclusivo entre processos sobre o arquivo `path`."""
+    with open(path, "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+class SharedConfig:
+    """Definições de testes compartilhadas, com versão barata de consultar."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.config_path = os.path.join(directory, CONFIG_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        version_path = os.path.join(directory, VERSION_FILE)
+
+        with self._locked():
+            if not os.path.exists(version_path):
+                with open(version_path, "wb") as f:
+                    f.write(_VERSION.pack(0))
+        self._version_file = open(version_path, "r+b")
+        self._version_map = mmap.mmap(self._version_file.fileno(), _VERSION.size)
+
+    def _locked(self):
+        """Lock exclusivo entre processos para publicar configurações."""
+        return _flocked(self.lock_path)
+
+    def version(self) -> int:
+        """Versão atual da configuração (leitura de 8 bytes em memória)."""
+        return _VERSION.unpack_from(self._version_map, 0)[0]
+
+    def load(self) -> Dict[str, dict]:
+        """Carrega todas as definições de testes publicadas."""
+        try:
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def publish(self, tests: List[dict]) -> int:
+        """
+        Publica testes novos ou alterados como uma única nova versão.
+
+        Returns:
+            Nova versão da configuração
+        """
+        with self._locked():
+            current = self.load()
+            for test in tests:
+                current[test["testId"]] = test
+            tmp_path = self.config_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(current, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config_path)
+
+            version = self.version() + 1
+            _VERSION.pack_into(self._version_map, 0, version)
+            self._version_map.flush()
+            return version
+
+    def close(self) -> None:
+        self._version_map.close()
+        self._version_file.close()
+
+
+class _SegmentReader:
+    """Leitura incremental do segmento de contadores de um processo."""
+
+    def __init__(self, bin_path: str, keys_path: str):
+        self.bin_path = bin_path
+        self.keys_path = keys_path
+        self._keys_offset = 0
+        self._next_slot = 0
+        # (tipo, test_id, variant_id) -> [(evento, slot)]
+        self.index: Dict[Tuple[str, str, str], List[Tuple[str, int]]] = {}
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+
+    def refresh_keys(self) -> None:
+        """Lê as chaves adicionadas desde a última leitura."""
+        try:
+            size = os.path.getsize(self.keys_path)
+        except FileNotFoundError:
+            return
+        if size <= self._keys_offset:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read(size - self._keys_offset)
+        # Considera apenas linhas completas
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].splitlines():
+            kind, test_id, variant_id, event = json.loads(line)
+            self.index.setdefault((kind, test_id, variant_id), []).append(
+                (event, self._next_slot)
+            )
+            self._next_slot += 1
+        self._keys_offset += complete
+
+    def value(self, slot: int) -> int:
+        offset = slot * _SLOT.size
+        if self._map is None or offset + _SLOT.size > len(self._map):
+            try:
+                self._remap()
+            except FileNotFoundError:
+                # Segmento apagado depois de fundido em outro
+                return 0
+            if offset + _SLOT.size > len(self._map):
+                return 0
+        return _SLOT.unpack_from(self._map, offset)[0]
+
+    def _remap(self) -> None:
+        self.close()
+        self._file = open(self.bin_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _segment_bases(directory: str) -> List[str]:
+    """Caminhos (sem extensão) dos segmentos de contadores do diretório."""
+    return sorted(
+        os.path.join(directory, name[:-len(".bin")])
+        for name in os.listdir(directory)
+        if name.startswith(COUNTERS_PREFIX) and name.endswith(".bin")
+    )
+
+
+def _is_stale(bin_path: str) -> bool:
+    """Indica se nenhum processo vivo mantém o segmento travado."""
+    try:
+        with open(bin_path, "rb") as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            return True
+    except FileNotFoundError:
+        return False
+
+
+def _remove_segment(base: str) -> None:
+    """Apaga um segmento: primeiro o `.bin`, que o torna invisível à leitura."""
+    for suffix in (".bin", ".keys"):
+        try:
+            os.remove(base + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _finish_merges(directory: str) -> None:
+    """
+    Conclui fusões interrompidas: com o segmento fundido publicado, apaga
+    os segmentos de origem que restaram; sem ele, descarta a fusão.
+    """
+    for name in os.listdir(directory):
+        if not (name.startswith(COUNTERS_PREFIX) and name.endswith(MERGED_SUFFIX)):
+            continue
+        manifest = os.path.join(directory, name)
+        base = manifest[:-len(MERGED_SUFFIX)]
+        with open(manifest, "r", encoding="utf-8") as f:
+            sources = json.load(f)
+        if os.path.exists(base + ".bin"):
+            for source in sources:
+                _remove_segment(os.path.join(directory, source))
+        else:
+            for suffix in (".bin.tmp", ".keys"):
+                try:
+                    os.remove(base + suffix)
+                except FileNotFoundError:
+                    pass
+        os.remove(manifest)
+
+
+def _merge_segments(directory: str, bases: List[str]) -> None:
+    """
+    Funde segmentos sem dono em um novo segmento, somando cada chave.
+
+    O segmento fundido fica visível ao renomear o `.bin` (as chaves são
+    gravadas antes); a lista das origens, gravada antes do rename,
+    permite concluir a fusão se o processo cair antes de apagá-las.
+    """
+    totals: Dict[CounterKey, int] = {}
+    for base in bases:
+        reader = _SegmentReader(base + ".bin", base + ".keys")
+        reader.refresh_keys()
+        for (kind, test_id, variant_id), slots in reader.index.items():
+            for event, slot in slots:
+                key = (kind, test_id, variant_id, event)
+                totals[key] = totals.get(key, 0) + reader.value(slot)
+        reader.close()
+    keys = [key for key, value in totals.items() if value]
+    if not keys:
+        for source in bases:
+            _remove_segment(source)
+        return
+
+    base = os.path.join(
+        directory, f"{COUNTERS_PREFIX}merged-{int(time.time() * 1000)}-{os.urandom(4).hex()}"
+    )
+    with open(base + MERGED_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump([os.path.basename(source) for source in bases], f)
+        f.flush()
+        os.fsync(f.fileno())
+    with open(base + ".keys", "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(key) + "\n" for key in keys)
+        f.flush()
+        os.fsync(f.fileno())
+    with open(base + ".bin.tmp", "wb") as f:
+        f.write(b"".join(_SLOT.pack(totals[key]) for key in keys))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(base + ".bin.tmp", base + ".bin")
+    for source in bases:
+        _remove_segment(source)
+    os.remove(base + MERGED_SUFFIX)
+
+
+class SharedCounters:
+    """
+    Contadores por processo em memória compartilhada, somados na leitura.
+
+    Cada processo mantém um lock exclusivo (`flock`) no próprio segmento
+    enquanto está vivo. Na inicialização, sob o lock de
+    `counters.lock`, os segmentos sem dono (processos encerrados ou
+    execuções anteriores) são fundidos em um só, antes de o processo
+    criar e travar o próprio.
+    """
+
+    def __init__(self, directory: str, initial_slots: int = 65536):
+        self.directory = directory
+        self._lock_path = os.path.join(directory, COUNTERS_LOCK_FILE)
+        generation_path = os.path.join(directory, COUNTERS_GENERATION_FILE)
+        # PID + instante de criação (PIDs se repetem entre reinícios) + sufixo
+        # aleatório (vários contadores no mesmo processo e milissegundo)
+        segment_id = f"{os.getpid()}-{int(time.time() * 1000)}-{os.urandom(4).hex()}"
+        base = os.path.join(directory, f"{COUNTERS_PREFIX}{segment_id}")
+        self.bin_path = base + ".bin"
+        self.keys_path = base + ".keys"
+        self._lock = threading.Lock()
+        self._slots: Dict[CounterKey, int] = {}
+        self._capacity = initial_slots
+
+        with _flocked(self._lock_path):
+            if not os.path.exists(generation_path):
+                with open(generation_path, "wb") as f:
+                    f.write(_VERSION.pack(0))
+            self._generation_file = open(generation_path, "r+b")
+            self._generation_map = mmap.mmap(self._generation_file.fileno(), _VERSION.size)
+
+            _finish_merges(directory)
+            stale = [b for b in _segment_bases(directory) if _is_stale(b + ".bin")]
+            if len(stale) > 1:
+                _merge_segments(directory, stale)
+
+            self._file = open(self.bin_path, "w+b")
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            self._file.truncate(self._capacity * _SLOT.size)
+            self._map = mmap.mmap(self._file.fileno(), self._capacity * _SLOT.size)
+            self._keys_file = open(self.keys_path, "w", encoding="utf-8")
+            self._bump_generation()
+
+        self._readers: Dict[str, _SegmentReader] = {}
+        self._readers_list: List[_SegmentReader] = []
+        self._readers_generation: Optional[int] = None
+        self._readers_lock = threading.Lock()
+
+    def _generation(self) -> int:
+        return _VERSION.unpack_from(self._generation_map, 0)[0]
+
+    def _bump_generation(self) -> None:
+        """Avisa todos os processos de um segmento ou chave nova."""
+        _VERSION.pack_into(self._generation_map, 0, self._generation() + 1)
+
+    def _allocate(self, key: CounterKey) -> int:
+        slot = len(self._slots)
+        if slot >= self._capacity:
+            self._capacity *= 2
+            self._map.close()
+            self._file.truncate(self._capacity * _SLOT.size)
+            self._map = mmap.mmap(self._file.fileno(), self._capacity * _SLOT.size)
+        # A chave é publicada antes do primeiro incremento do slot
+        self._keys_file.write(json.dumps(key) + "\n")
+        self._keys_file.flush()
+        self._slots[key] = slot
+        with _flocked(self._lock_path):
+            self._bump_generation()
+        return slot
+
+    def add(self, key: CounterKey, amount: int = 1) -> None:
+        """Incrementa um contador no segmento deste processo."""
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._allocate(key)
+            offset = slot * _SLOT.size
+            current = _SLOT.unpack_from(self._map, offset)[0]
+            _SLOT.pack_into(self._map, offset, current + amount)
+
+    def add_many(self, amounts: Dict[CounterKey, int]) -> None:
+        """Incrementa vários contadores de uma vez."""
+        with self._lock:
+            for key, amount in amounts.items():
+                slot = self._slots.get(key)
+                if slot is None:
+                    slot = self._allocate(key)
+                offset = slot * _SLOT.size
+                current = _SLOT.unpack_from(self._map, offset)[0]
+                _SLOT.pack_into(self._map, offset, current + amount)
+
+    def _segment_readers(self) -> List[_SegmentReader]:
+        """
+        Leitores de todos os segmentos existentes (de todos os processos).
+
+        Sem mudança no contador de geração, devolve os leitores já
+        conhecidos sem tocar no disco; os valores são lidos dos mapas.
+        """
+        generation = self._generation()
+        if generation == self._readers_generation:
+            return self._readers_list
+        with self._readers_lock:
+            bases = _segment_bases(self.directory)
+            names = {os.path.basename(base) for base in bases}
+            for name in [name for name in self._readers if name not in names]:
+                # Segmento fundido por outro processo
+                self._readers.pop(name).close()
+            for base in bases:
+                name = os.path.basename(base)
+                if name not in self._readers:
+                    self._readers[name] = _SegmentReader(base + ".bin", base + ".keys")
+            for reader in self._readers.values():
+                reader.refresh_keys()
+            self._readers_list = list(self._readers.values())
+            # Geração lida antes da varredura: uma mudança durante ela
+            # provoca nova varredura na próxima leitura
+            self._readers_generation = generation
+            return self._readers_list
+
+    def totals(self, kind: str, test_id: str, variant_id: str) -> Dict[str, int]:
+        """Soma, entre todos os processos, os contadores por evento."""
+        result: Dict[str, int] = {}
+        for reader in self._segment_readers():
+            for event, slot in reader.index.get((kind, test_id, variant_id), ()):
+                result[event] = result.get(event, 0) + reader.value(slot)
+        return result
+
+    def close(self) -> None:
+        with self._readers_lock:
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+            self._readers_list = []
+            self._readers_generation = None
+        with self._lock:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+            self._keys_file.close()
+            self._generation_map.close()
+            self._generation_file.close()
@@ -0,0 +1,601 @@
+"""Repositório persistente em SQLite (biblioteca padrão)."""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Collection, Dict, List, Optional, Tuple
+
+from repositories.test_repository import TestRepository
+from event_log import EventBatch, to_datetime
+from storage import ROLLUP_GRANULARITIES
+
+
+# Eventos com AUTOINCREMENT: um ID excluído (exclusão do teste, retenção)
+# nunca é reutilizado, mesmo que fosse o maior da tabela
+SQL_CREATE_IMPRESSIONS = """CREATE TABLE IF NOT EXISTS impressions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    test_id TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    ts REAL NOT NULL
+);"""
+SQL_CREATE_CONVERSIONS = """CREATE TABLE IF NOT EXISTS conversions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    test_id TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    ts REAL NOT NULL
+);"""
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS tests (
+    test_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    variants TEXT NOT NULL,
+    status TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    start_at REAL,
+    end_at REAL,
+    allocation REAL NOT NULL DEFAULT 100
+);
+CREATE INDEX IF NOT EXISTS tests_by_status ON tests (status, test_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('config_version', 0);
+{SQL_CREATE_IMPRESSIONS}
+{SQL_CREATE_CONVERSIONS}
+CREATE INDEX IF NOT EXISTS impressions_by_test ON impressions (test_id, id);
+CREATE INDEX IF NOT EXISTS conversions_by_test ON conversions (test_id, id);
+CREATE TABLE IF NOT EXISTS impression_counts (
+    test_id TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (test_id, variant_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS conversion_counts (
+    test_id TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (test_id, variant_id, event)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS impression_rollups (
+    test_id TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (test_id, variant_id, granularity, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS conversion_rollups (
+    test_id TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (test_id, variant_id, granularity, bucket, event)
+) WITHOUT ROWID;
+"""
+
+# SQL constante: o sqlite3 mantém as instruções preparadas em cache por conexão
+TEST_COLUMNS = "test_id, name, variants, status, start_at, end_at, allocation"
+SQL_GET_TEST = f"SELECT {TEST_COLUMNS} FROM tests WHERE test_id = ?"
+SQL_ALL_TESTS = f"SELECT {TEST_COLUMNS} FROM tests"
+# Página da listagem, uma instrução por combinação de filtros
+# (com status, filtro nome) -> SQL; percorre a chave primária ou tests_by_status
+SQL_LIST_TESTS = {
+    (with_status, with_name): (
+        f"SELECT {TEST_COLUMNS} FROM tests WHERE test_id > ?"
+        + (" AND status = ?" if with_status else "")
+        + (" AND instr(lower(name), ?) > 0" if with_name else "")
+        + " ORDER BY test_id LIMIT ?"
+    )
+    for with_status in (False, True)
+    for with_name in (False, True)
+}
+# A versão do teste é a versão global logo após o incremento desta alteração
+SQL_SAVE_TEST = (
+    f"INSERT INTO tests ({TEST_COLUMNS}, version) VALUES "
+    "(?, ?, ?, ?, ?, ?, ?, (SELECT value FROM meta WHERE key = 'config_version')) "
+    "ON CONFLICT (test_id) DO UPDATE SET "
+    "name = excluded.name, variants = excluded.variants, status = excluded.status, "
+    "start_at = excluded.start_at, end_at = excluded.end_at, "
+    "allocation = excluded.allocation, version = excluded.version"
+)
+SQL_TEST_VERSION = "SELECT version FROM tests WHERE test_id = ?"
+SQL_CONFIG_VERSION = "SELECT value FROM meta WHERE key = 'config_version'"
+SQL_BUMP_CONFIG_VERSION = "UPDATE meta SET value = value + 1 WHERE key = 'config_version'"
+SQL_COUNT_TESTS = "SELECT COUNT(*) FROM tests"
+# Maior rowid: eventos já gravados, sem varrer a tabela
+SQL_MAX_IMPRESSION_ID = "SELECT COALESCE(MAX(rowid), 0) FROM impressions"
+SQL_MAX_CONVERSION_ID = "SELECT COALESCE(MAX(rowid), 0) FROM conversions"
+SQL_INSERT_IMPRESSION = "INSERT INTO impressions (test_id, variant_id, ts) VALUES (?, ?, ?)"
+SQL_INSERT_CONVERSION = (
+    "INSERT INTO conversions (test_id, variant_id, event, ts) VALUES (?, ?, ?, ?)"
+)
+SQL_BUMP_IMPRESSIONS = (
+    "INSERT INTO impression_counts (test_id, variant_id, count) VALUES (?, ?, ?) "
+    "ON CONFLICT (test_id, variant_id) DO UPDATE SET count = count + excluded.count"
+)
+SQL_BUMP_CONVERSIONS = (
+    "INSERT INTO conversion_counts (test_id, variant_id, event, count) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (test_id, variant_id, event) DO UPDATE SET count = count + excluded.count"
+)
+SQL_BUMP_IMPRESSION_ROLLUPS = (
+    "INSERT INTO impression_rollups (test_id, variant_id, granularity, bucket, count) "
+    "VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (test_id, variant_id, granularity, bucket) "
+    "DO UPDATE SET count = count + excluded.count"
+)
+SQL_BUMP_CONVERSION_ROLLUPS = (
+    "INSERT INTO conversion_rollups "
+    "(test_id, variant_id, granularity, bucket, event, count) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (test_id, variant_id, granularity, bucket, event) "
+    "DO UPDATE SET count = count + excluded.count"
+)
+SQL_IMPRESSION_ROLLUPS = (
+    "SELECT bucket, count FROM impression_rollups "
+    "WHERE test_id = ? AND variant_id = ? AND granularity = ? "
+    "AND bucket >= ? AND bucket < ? ORDER BY bucket"
+)
+SQL_CONVERSION_ROLLUPS = (
+    "SELECT bucket, event, count FROM conversion_rollups "
+    "WHERE test_id = ? AND variant_id = ? AND granularity = ? "
+    "AND bucket >= ? AND bucket < ?"
+)
+SQL_COUNT_IMPRESSIONS = (
+    "SELECT count FROM impression_counts WHERE test_id = ? AND variant_id = ?"
+)
+SQL_COUNT_CONVERSIONS = (
+    "SELECT COALESCE(SUM(count), 0) FROM conversion_counts "
+    "WHERE test_id = ? AND variant_id = ?"
+)
+SQL_CONVERSIONS_BY_EVENT = (
+    "SELECT event, count FROM conversion_counts WHERE test_id = ? AND variant_id = ?"
+)
+
+# Leitura em ordem de rowid a partir do cursor (pelos índices por teste)
+SQL_READ_IMPRESSIONS = (
+    "SELECT id, variant_id, ts FROM impressions "
+    "WHERE id > ? AND test_id = ? AND ts >= ? AND ts < ? ORDER BY id LIMIT ?"
+)
+SQL_READ_CONVERSIONS = (
+    "SELECT id, variant_id, event, ts FROM conversions "
+    "WHERE id > ? AND test_id = ? AND ts >= ? AND ts < ?{events} ORDER BY id LIMIT ?"
+)
+
+# Exclusão dos dados de um teste (prefixo das chaves primárias e índices)
+SQL_DELETE_TEST_DATA = [
+    "DELETE FROM impressions WHERE test_id = ?",
+    "DELETE FROM conversions WHERE test_id = ?",
+    "DELETE FROM impression_counts WHERE test_id = ?",
+    "DELETE FROM conversion_counts WHERE test_id = ?",
+    "DELETE FROM impression_rollups WHERE test_id = ?",
+    "DELETE FROM conversion_rollups WHERE test_id = ?",
+]
+# Retenção: sem índice por timestamp, as exclusões varrem as tabelas
+SQL_DELETE_IMPRESSIONS_BEFORE = "DELETE FROM impressions WHERE ts < ?"
+SQL_DELETE_CONVERSIONS_BEFORE = "DELETE FROM conversions WHERE ts < ?"
+SQL_DELETE_IMPRESSION_ROLLUPS_BEFORE = (
+    "DELETE FROM impression_rollups WHERE granularity = ? AND bucket <= ?"
+)
+SQL_DELETE_CONVERSION_ROLLUPS_BEFORE = (
+    "DELETE FROM conversion_rollups WHERE granularity = ? AND bucket <= ?"
+)
+
+
+def _row_to_test(row: tuple) -> Dict:
+    return {
+        "testId": row[0],
+        "name": row[1],
+        "variants": json.loads(row[2]),
+        "status": row[3],
+        "startAt": row[4],
+        "endAt": row[5],
+        "allocation": row[6],
+    }
+
+
+class SQLiteTestRepository(TestRepository):
+    """
+    Repositório em SQLite no modo WAL, compartilhável entre processos.
+
+    Cada thread usa sua própria conexão. Os eventos brutos ficam nas
+    tabelas `impressions`/`conversions` e os contadores agregados são
+    atualizados na mesma transação, então as contagens são buscas por
+    chave primária.
+
+    As consultas esperam pelo disco (e pelo lock de escrita do WAL), então
+    as variantes assíncronas rodam no executor dedicado.
+    """
+
+    blocking_io = True
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        # Bancos criados antes das colunas `version` e de agenda/alocação
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(tests)")}
+        for column, definition in (
+            ("version", "INTEGER NOT NULL DEFAULT 0"),
+            ("start_at", "REAL"),
+            ("end_at", "REAL"),
+            ("allocation", "REAL NOT NULL DEFAULT 100"),
+        ):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE tests ADD COLUMN {column} {definition}")
+        # Tabelas de eventos criadas sem AUTOINCREMENT
+        for table, create in (
+            ("impressions", SQL_CREATE_IMPRESSIONS),
+            ("conversions", SQL_CREATE_CONVERSIONS),
+        ):
+            sql = connection.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone()[0]
+            if "AUTOINCREMENT" not in sql.upper():
+                self._rebuild_events_table(connection, table, create)
+
+    @staticmethod
+    def _rebuild_events_table(connection: sqlite3.Connection, table: str, create: str) -> None:
+        """Recria uma tabela de eventos com AUTOINCREMENT, mantendo os IDs."""
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+            connection.execute(f"DROP INDEX IF EXISTS {table}_by_test")
+            connection.execute(create)
+            connection.execute(f"INSERT INTO {table} SELECT * FROM {table}_legacy")
+            connection.execute(f"DROP TABLE {table}_legacy")
+            connection.execute(f"CREATE INDEX {table}_by_test ON {table} (test_id, id)")
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _connection(self) -> sqlite3.Connection:
+        """Retorna a conexão da thread atual, abrindo se necessário."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # check_same_thread=False só para permitir o close() no desligamento
+            connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def get_test(self, test_id: str) -> Optional[Dict]:
+        """Busca um teste pelo ID."""
+        row = self._connection().execute(SQL_GET_TEST, (test_id,)).fetchone()
+        return _row_to_test(row) if row else None
+
+    def save_test(
+        self,
+        test_id: str,
+        name: str,
+        variants: List[Dict],
+        status: str = "active",
+        start_at: Optional[float] = None,
+        end_at: Optional[float] = None,
+        allocation: float = 100.0
+    ) -> None:
+        """Salva ou atualiza um teste."""
+        with self._connection() as connection:
+            connection.execute(SQL_BUMP_CONFIG_VERSION)
+            connection.execute(SQL_SAVE_TEST, (
+                test_id, name, json.dumps(variants), status, start_at, end_at, allocation
+            ))
+
+    def save_tests(self, tests: List[Dict]) -> None:
+        """Salva vários testes em uma transação, com um único incremento de versão."""
+        with self._connection() as connection:
+            connection.execute(SQL_BUMP_CONFIG_VERSION)
+            connection.executemany(SQL_SAVE_TEST, [
+                (
+                    test["testId"], test["name"], json.dumps(test["variants"]), test["status"],
+                    test.get("startAt"), test.get("endAt"), test.get("allocation", 100.0)
+                )
+                for test in tests
+            ])
+
+    def get_all_tests(self) -> List[Dict]:
+        """Retorna todos os testes."""
+        rows = self._connection().execute(SQL_ALL_TESTS).fetchall()
+        return [_row_to_test(row) for row in rows]
+
+    def list_tests(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        status: Optional[str] = None,
+        name: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Página de testes em ordem de testId, pela chave primária (ou pelo
+        índice por status). O filtro de nome ignora maiúsculas só em ASCII.
+        """
+        params: list = ["" if cursor is None else cursor]
+        if status is not None:
+            params.append(status)
+        if name:
+            params.append(name.lower())
+        params.append(limit + 1)
+        rows = self._connection().execute(
+            SQL_LIST_TESTS[(status is not None, bool(name))], params
+        ).fetchall()
+        page = [_row_to_test(row) for row in rows[:limit]]
+        return page, page[-1]["testId"] if len(rows) > limit else None
+
+    def get_config_version(self) -> int:
+        """Versão das definições de testes, compartilhada entre processos."""
+        return self._connection().execute(SQL_CONFIG_VERSION).fetchone()[0]
+
+    def get_test_version(self, test_id: str) -> int:
+        """Versão de um teste (0 se não existir)."""
+        row = self._connection().execute(SQL_TEST_VERSION, (test_id,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _bump_aggregates(
+        connection: sqlite3.Connection,
+        impressions: List[Tuple[str, str, float]],
+        conversions: List[Tuple[str, str, str, float]]
+    ) -> None:
+        """Atualiza contadores e rollups na transação corrente."""
+        if impressions:
+            counts = Counter((t, v) for t, v, _ in impressions)
+            rollups = Counter(
+                (t, v, granularity, int(ts // step) * step)
+                for t, v, ts in impressions
+                for granularity, step in ROLLUP_GRANULARITIES.items()
+            )
+            connection.executemany(
+                SQL_BUMP_IMPRESSIONS, [(t, v, n) for (t, v), n in counts.items()]
+            )
+            connection.executemany(
+                SQL_BUMP_IMPRESSION_ROLLUPS,
+                [key + (n,) for key, n in rollups.items()]
+            )
+        if conversions:
+            counts = Counter((t, v, e) for t, v, e, _ in conversions)
+            rollups = Counter(
+                (t, v, granularity, int(ts // step) * step, e)
+                for t, v, e, ts in conversions
+                for granularity, step in ROLLUP_GRANULARITIES.items()
+            )
+            connection.executemany(
+                SQL_BUMP_CONVERSIONS, [(t, v, e, n) for (t, v, e), n in counts.items()]
+            )
+            connection.executemany(
+                SQL_BUMP_CONVERSION_ROLLUPS,
+                [key + (n,) for key, n in rollups.items()]
+            )
+
+    def add_impression(self, test_id: str, variant_id: str) -> Dict:
+        """Adiciona uma impressão."""
+        timestamp = time.time()
+        with self._connection() as connection:
+            cursor = connection.execute(
+                SQL_INSERT_IMPRESSION, (test_id, variant_id, timestamp)
+            )
+            self._bump_aggregates(connection, [(test_id, variant_id, timestamp)], [])
+        return {
+            "id": str(cursor.lastrowid),
+            "testId": test_id,
+            "variantId": variant_id,
+            "timestamp": to_datetime(timestamp)
+        }
+
+    def add_impressions(self, events: List[Tuple[str, str, float]]) -> None:
+        """Adiciona um lote de impressões (test_id, variant_id, timestamp)."""
+        self.add_events(events, [])
+
+    def add_conversion(self, test_id: str, variant_id: str, event: str) -> Dict:
+        """Adiciona uma conversão."""
+        timestamp = time.time()
+        with self._connection() as connection:
+            cursor = connection.execute(
+                SQL_INSERT_CONVERSION, (test_id, variant_id, event, timestamp)
+            )
+            self._bump_aggregates(
+                connection, [], [(test_id, variant_id, event, timestamp)]
+            )
+        return {
+            "id": str(cursor.lastrowid),
+            "testId": test_id,
+            "variantId": variant_id,
+            "event": event,
+            "timestamp": to_datetime(timestamp)
+        }
+
+    def add_conversions(self, events: List[Tuple[str, str, str, float]]) -> None:
+        """Adiciona um lote de conversões (test_id, variant_id, event, timestamp)."""
+        self.add_events([], events)
+
+    def add_events(
+        self,
+        impressions: List[Tuple[str, str, float]],
+        conversions: List[Tuple[str, str, str, float]]
+    ) -> None:
+        """
+        Adiciona lotes de impressões e conversões em uma única transação,
+        atualizando contadores e rollups junto com os eventos.
+        """
+        if not impressions and not conversions:
+            return
+        with self._connection() as connection:
+            if impressions:
+                connection.executemany(SQL_INSERT_IMPRESSION, impressions)
+            if conversions:
+                connection.executemany(SQL_INSERT_CONVERSION, conversions)
+            self._bump_aggregates(connection, impressions, conversions)
+
+    def count_impressions(self, test_id: str, variant_id: str) -> int:
+        """Conta impressões para um teste e variante específicos."""
+        row = self._connection().execute(
+            SQL_COUNT_IMPRESSIONS, (test_id, variant_id)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def count_conversions(self, test_id: str, variant_id: str) -> int:
+        """Conta conversões para um teste e variante específicos."""
+        return self._connection().execute(
+            SQL_COUNT_CONVERSIONS, (test_id, variant_id)
+        ).fetchone()[0]
+
+    def count_conversions_by_event(
+        self,
+        test_id: str,
+        variant_id: str
+    ) -> Dict[str, int]:
+        """Conta conversões por evento para um teste e variante específicos."""
+        rows = self._connection().execute(
+            SQL_CONVERSIONS_BY_EVENT, (test_id, variant_id)
+        ).fetchall()
+        return dict(rows)
+
+    def get_rollups(
+        self,
+        test_id: str,
+        variant_id: str,
+        granularity: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> List[Tuple[int, int, Dict[str, int]]]:
+        """Retorna os buckets de tempo não vazios de uma variante."""
+        params = (
+            test_id,
+            variant_id,
+            granularity,
+            -math.inf if start is None else start,
+            math.inf if end is None else end,
+        )
+        connection = self._connection()
+        buckets: Dict[int, Tuple[int, Dict[str, int]]] = {
+            bucket: (count, {})
+            for bucket, count in connection.execute(SQL_IMPRESSION_ROLLUPS, params)
+        }
+        for bucket, event, count in connection.execute(SQL_CONVERSION_ROLLUPS, params):
+            buckets.setdefault(bucket, (0, {}))[1][event] = count
+        return [
+            (bucket, impressions, by_event)
+            for bucket, (impressions, by_event) in sorted(buckets.items())
+        ]
+
+    def read_events(
+        self,
+        kind: str,
+        test_id: str,
+        position: int,
+        limit: int,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        events: Optional[Collection[str]] = None
+    ) -> Tuple[EventBatch, Optional[int]]:
+        """
+        Lê os eventos brutos de um teste em lotes de até `limit` linhas.
+
+        O cursor é o último rowid lido, então cada lote é uma consulta
+        independente e pode rodar em qualquer thread do executor.
+        """
+        window = (
+            -math.inf if start is None else start,
+            math.inf if end is None else end,
+        )
+        connection = self._connection()
+        if kind == "conversion":
+            names: List[str] = []
+            event_filter = ""
+            if events is not None:
+                names = list(events)
+                event_filter = f" AND event IN ({', '.join('?' * len(names))})"
+            rows = connection.execute(
+                SQL_READ_CONVERSIONS.format(events=event_filter),
+                (position, test_id, *window, *names, limit)
+            ).fetchall()
+            batch = EventBatch(
+                [row[0] for row in rows],
+                [row[1] for row in rows],
+                [row[2] for row in rows],
+                [row[3] for row in rows],
+            )
+        else:
+            rows = connection.execute(
+                SQL_READ_IMPRESSIONS, (position, test_id, *window, limit)
+            ).fetchall()
+            batch = EventBatch(
+                [row[0] for row in rows],
+                [row[1] for row in rows],
+                None,
+                [row[2] for row in rows],
+            )
+        return batch, (rows[-1][0] if len(rows) == limit else None)
+
+    def delete_test_events(self, test_id: str) -> int:
+        """Exclui eventos, contadores e rollups de um teste em uma transação."""
+        with self._connection() as connection:
+            dropped = [
+                connection.execute(sql, (test_id,)).rowcount
+                for sql in SQL_DELETE_TEST_DATA
+            ]
+        return dropped[0] + dropped[1]
+
+    def drop_events_before(self, cutoff: float) -> Dict[str, int]:
+        """
+        Retenção: exclui eventos anteriores a `cutoff` e os buckets de
+        rollup que terminam até ele. Não há segmentos: as linhas são
+        excluídas uma a uma.
+        """
+        with self._connection() as connection:
+            events = (
+                connection.execute(SQL_DELETE_IMPRESSIONS_BEFORE, (cutoff,)).rowcount
+                + connection.execute(SQL_DELETE_CONVERSIONS_BEFORE, (cutoff,)).rowcount
+            )
+            buckets = 0
+            for granularity, step in ROLLUP_GRANULARITIES.items():
+                latest = math.floor(cutoff - step)
+                for sql in (
+                    SQL_DELETE_IMPRESSION_ROLLUPS_BEFORE, SQL_DELETE_CONVERSION_ROLLUPS_BEFORE
+                ):
+                    buckets += connection.execute(sql, (granularity, latest)).rowcount
+        return {"segments": 0, "events": events, "rollupBuckets": buckets}
+
+    def get_storage_stats(self) -> Dict[str, Dict[str, int]]:
+        """Quantidade de testes e eventos e tamanho do banco em disco."""
+        connection = self._connection()
+        page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        wal_path = self.path + "-wal"
+        return {
+            "items": {
+                "tests": connection.execute(SQL_COUNT_TESTS).fetchone()[0],
+                "impressions": connection.execute(SQL_MAX_IMPRESSION_ID).fetchone()[0],
+                "conversions": connection.execute(SQL_MAX_CONVERSION_ID).fetchone()[0],
+            },
+            "bytes": {
+                "database": page_count * page_size,
+                "wal": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            },
+        }
+
+    def close(self) -> None:
+        """Fecha as conexões abertas por todas as threads."""
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -1,14 +1,45 @@
 """Repositório para acesso aos dados de testes, impressões e conversões."""
-from typing import Dict, List, Optional
+from typing import Callable, Collection, Dict, List, Optional, Tuple, TypeVar
 from datetime import datetime
 from uuid import uuid4
 
 import storage
+from event_log import EventBatch
 from core.exceptions import TestNotFoundError, TestInactiveError
+from core.executor import run_blocking
+
+
+T = TypeVar("T")
 
 
 class TestRepository:
-    """Repositório para gerenciar testes, impressões e conversões."""
+    """
+    Repositório para gerenciar testes, impressões e conversões.
+    
+    Os métodos `*_async` são as variantes usadas pelas rotas assíncronas.
+    Em memória eles executam a operação diretamente (não há espera); os
+    backends que fazem E/S síncrona marcam `blocking_io` e suas operações
+    passam a rodar no executor dedicado (`core.executor`).
+    """
+    
+    # True nos backends cujas operações podem bloquear o event loop
+    blocking_io = False
+    # False nos backends que não conseguem descartar eventos e contadores
+    supports_event_purge = True
+    
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        Executa `func(*args)` sem bloquear o event loop.
+        
+        `func` é um método do repositório ou uma função que só o acessa
+        por métodos síncronos (ex.: um método de serviço inteiro, que
+        assim faz um único salto de thread). Operações em lote, cujo
+        custo cresce com o tamanho do lote, devem chamar `run_blocking`
+        diretamente, para saírem do event loop em qualquer backend.
+        """
+        if not self.blocking_io:
+            return func(*args)
+        return await run_blocking(func, *args)
     
     def get_test(self, test_id: str) -> Optional[Dict]:
         """Busca um teste pelo ID."""
@@ -33,15 +64,70 @@ class TestRepository:
         test_id: str, 
         name: str, 
         variants: List[Dict], 
-        status: str = "active"
+        status: str = "active",
+        start_at: Optional[float] = None,
+        end_at: Optional[float] = None,
+        allocation: float = 100.0
     ) -> None:
-        """Salva ou atualiza um teste."""
-        storage.save_test(test_id, name, variants, status)
+        """
+        Salva ou atualiza um teste.
+        
+        `start_at`/`end_at` (epoch UTC) agendam o início e o fim do teste
+        e `allocation` é o percentual de visitantes que entram nele.
+        """
+        storage.save_test(test_id, name, variants, status, start_at, end_at, allocation)
+    
+    def save_tests(self, tests: List[Dict]) -> None:
+        """
+        Salva ou atualiza vários testes de uma vez, publicados como uma
+        única versão da configuração.
+        """
+        storage.save_tests(tests)
     
     def get_all_tests(self) -> List[Dict]:
         """Retorna todos os testes."""
         return storage.get_all_tests()
     
+    def list_tests(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        status: Optional[str] = None,
+        name: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Página de testes em ordem de testId.
+        
+        Args:
+            cursor: Último testId da página anterior (None na primeira)
+            limit: Tamanho máximo da página
+            status: Só testes com este status, opcional
+            name: Só testes cujo nome contém este trecho (sem diferenciar
+                maiúsculas), opcional
+        
+        Returns:
+            Tupla (testes da página, cursor da próxima página ou None)
+        """
+        return storage.list_tests(cursor, limit, status, name)
+    
+    def get_config_version(self) -> int:
+        """
+        Retorna a versão das definições de testes.
+        
+        Muda sempre que algum teste é salvo; serve para invalidar caches
+        derivados dos testes (como os testes compilados) sem reler tudo.
+        """
+        return storage.get_config_version()
+    
+    def get_test_version(self, test_id: str) -> int:
+        """
+        Retorna a versão de um teste (0 se não existir).
+        
+        Muda apenas quando aquele teste é salvo, permitindo invalidar só
+        o que depende dele quando `get_config_version` indica mudança.
+        """
+        return storage.get_test_version(test_id)
+    
     def add_impression(
         self, 
         test_id: str, 
@@ -50,6 +136,10 @@ class TestRepository:
         """Adiciona uma impressão."""
         return storage.add_impression(test_id, variant_id)
     
+    def add_impressions(self, events: List[Tuple[str, str, float]]) -> None:
+        """Adiciona um lote de impressões (test_id, variant_id, timestamp)."""
+        storage.add_impressions(events)
+    
     def add_conversion(
         self,
         test_id: str,
@@ -59,6 +149,21 @@ class TestRepository:
         """Adiciona uma conversão."""
         return storage.add_conversion(test_id, variant_id, event)
     
+    def add_conversions(self, events: List[Tuple[str, str, str, float]]) -> None:
+        """Adiciona um lote de conversões (test_id, variant_id, event, timestamp)."""
+        storage.add_conversions(events)
+    
+    def add_events(
+        self,
+        impressions: List[Tuple[str, str, float]],
+        conversions: List[Tuple[str, str, str, float]]
+    ) -> None:
+        """Adiciona lotes de impressões e conversões em uma única chamada."""
+        if impressions:
+            storage.add_impressions(impressions)
+        if conversions:
+            storage.add_conversions(conversions)
+    
     def count_impressions(self, test_id: str, variant_id: str) -> int:
         """Conta impressões para um teste e variante específicos."""
         return storage.count_impressions(test_id, variant_id)
@@ -66,4 +171,105 @@ class TestRepository:
     def count_conversions(self, test_id: str, variant_id: str) -> int:
         """Conta conversões para um teste e variante específicos."""
         return storage.count_conversions(test_id, variant_id)
-
+    
+    def count_conversions_by_event(
+        self,
+        test_id: str,
+        variant_id: str
+    ) -> Dict[str, int]:
+        """Conta conversões por evento para um teste e variante específicos."""
+        return storage.count_conversions_by_event(test_id, variant_id)
+    
+    def get_rollups(
+        self,
+        test_id: str,
+        variant_id: str,
+        granularity: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> List[Tuple[int, int, Dict[str, int]]]:
+        """
+        Retorna os buckets de tempo não vazios de uma variante.
+        
+        Returns:
+            Lista ordenada de (início do bucket em epoch, impressões,
+            conversões por evento) com início em [start, end)
+        """
+        return storage.get_rollups(test_id, variant_id, granularity, start, end)
+    
+    def read_events(
+        self,
+        kind: str,
+        test_id: str,
+        position: int,
+        limit: int,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        events: Optional[Collection[str]] = None
+    ) -> Tuple[EventBatch, Optional[int]]:
+        """
+        Lê os eventos brutos de um teste em lotes de colunas.
+        
+        Args:
+            kind: "impression" ou "conversion"
+            test_id: ID do teste
+            position: Cursor da leitura (0 na primeira chamada)
+            limit: Tamanho aproximado do lote
+            start: Início da janela (epoch, inclusivo), opcional
+            end: Fim da janela (epoch, exclusivo), opcional
+            events: Nomes de eventos aceitos (só conversões), opcional
+        
+        Returns:
+            Tupla (lote, cursor da próxima leitura ou None no fim)
+        """
+        return storage.read_events(kind, test_id, position, limit, start, end, events)
+    
+    def delete_test_events(self, test_id: str) -> int:
+        """
+        Descarta os eventos brutos, contadores e rollups de um teste.
+        
+        Returns:
+            Quantidade de eventos brutos descartados
+        """
+        return storage.delete_test_events(test_id)
+    
+    def drop_events_before(self, cutoff: float) -> Dict[str, int]:
+        """
+        Retenção: descarta eventos brutos e buckets de rollup anteriores a
+        `cutoff` (epoch). Os contadores de todo o período são mantidos.
+        
+        Returns:
+            Quantidades descartadas ({"segments", "events", "rollupBuckets"})
+        """
+        return storage.drop_events_before(cutoff)
+    
+    def get_storage_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Tamanho das estruturas do armazenamento, para os gauges de telemetria.
+        
+        Returns:
+            {"items": {estrutura: itens}, "bytes": {estrutura: bytes}}
+        """
+        return storage.stats()
+    
+    async def get_all_tests_async(self) -> List[Dict]:
+        """Variante assíncrona de `get_all_tests`."""
+        return await self.run(self.get_all_tests)
+    
+    async def list_tests_async(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        status: Optional[str] = None,
+        name: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Variante assíncrona de `list_tests`."""
+        return await self.run(self.list_tests, cursor, limit, status, name)
+    
+    async def get_storage_stats_async(self) -> Dict[str, Dict[str, int]]:
+        """Variante assíncrona de `get_storage_stats`."""
+        return await self.run(self.get_storage_stats)
+    
+    def close(self) -> None:
+        """Libera recursos do repositório (nada a fazer em memória)."""
+        pass
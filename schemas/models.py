@@ -1,6 +1,7 @@
 """Modelos Pydantic para validação de dados."""
+from datetime import datetime
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Literal, Optional
 
 
 class Section(BaseModel):
@@ -23,11 +24,34 @@ class Test(BaseModel):
 
 class ExperimentRequest(BaseModel):
     testId: str
+    visitorId: Optional[str] = None
 
 
 class ExperimentResponse(BaseModel):
     variantId: str
     sections: List[Section]
+    holdout: Optional[bool] = None  # True fora da alocação (controle, sem impressão)
+
+
+class BucketingConfig(BaseModel):
+    algorithm: str
+    key: str
+    salt: str
+    bucketCount: int
+    allocationKey: str
+    allocationBuckets: int  # buckets de alocação que entram no teste
+
+
+class TestConfigVariant(BaseModel):
+    variantId: str
+    buckets: List[int]
+    sections: List[Section]
+
+
+class TestConfigResponse(BaseModel):
+    testId: str
+    bucketing: BucketingConfig
+    variants: List[TestConfigVariant]
 
 
 class ConversionRequest(BaseModel):
@@ -40,15 +64,34 @@ class ConversionResponse(BaseModel):
     ok: bool = True
 
 
+class EventBatchError(BaseModel):
+    type: str
+    index: int
+    detail: str
+
+
+class EventBatchResponse(BaseModel):
+    ok: bool = True
+    accepted: int
+    rejected: int
+    errors: List[EventBatchError] = []
+
+
 class AdminTestRequest(BaseModel):
     testId: str
     name: str
     variants: List[Variant]
+    startAt: Optional[datetime] = None  # início agendado (sem timezone = UTC)
+    endAt: Optional[datetime] = None  # fim agendado (sem timezone = UTC)
+    allocation: float = 100  # % dos visitantes que entram no teste
 
 
 class AdminTestUpdateRequest(BaseModel):
     name: str
     variants: List[Variant]
+    startAt: Optional[datetime] = None
+    endAt: Optional[datetime] = None
+    allocation: float = 100
 
 
 class AdminTestResponse(BaseModel):
@@ -56,16 +99,96 @@ class AdminTestResponse(BaseModel):
     message: str = "Test created"
 
 
+class AdminTestStatusResponse(BaseModel):
+    ok: bool = True
+    testId: str
+    status: str  # active, paused, scheduled ou ended
+
+
+class AdminTestBatchOperation(BaseModel):
+    op: Literal["create", "update", "status"]
+    testId: str
+    name: Optional[str] = None  # obrigatório em create e update
+    variants: Optional[List[Variant]] = None  # obrigatório em create e update
+    startAt: Optional[datetime] = None
+    endAt: Optional[datetime] = None
+    allocation: Optional[float] = None  # padrão 100 em create e update
+    status: Optional[Literal["active", "paused"]] = None  # obrigatório em status
+
+
+class AdminTestBatchRequest(BaseModel):
+    operations: List[AdminTestBatchOperation]
+
+
+class AdminTestBatchError(BaseModel):
+    index: int
+    testId: str
+    detail: str
+
+
+class AdminTestBatchResponse(BaseModel):
+    ok: bool = True
+    applied: int
+    rejected: int
+    configVersion: int
+    errors: List[AdminTestBatchError] = []
+
+
+class EventsDeletedResponse(BaseModel):
+    ok: bool = True
+    deleted: int  # eventos brutos descartados
+
+
+class MetricsBucket(BaseModel):
+    start: datetime
+    impressions: int
+    conversions: int
+    conversionRate: float
+    conversionsByEvent: Dict[str, int] = {}
+
+
+class ConfidenceInterval(BaseModel):
+    lower: float
+    upper: float
+
+
 class VariantMetrics(BaseModel):
     variantId: str
     impressions: int
     conversions: int
     conversionRate: float
+    conversionsByEvent: Dict[str, int] = {}
+    series: Optional[List[MetricsBucket]] = None
+    isControl: bool = False
+    confidenceInterval: Optional[ConfidenceInterval] = None
+    pValue: Optional[float] = None
+    probabilityToBeatControl: Optional[float] = None
 
 
 class TestMetricsResponse(BaseModel):
     testId: str
     variants: List[VariantMetrics]
+    granularity: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+
+class AllTestsMetricsResponse(BaseModel):
+    tests: List[TestMetricsResponse]
+
+
+class ProfilerSettingsRequest(BaseModel):
+    enabled: bool
+    sampleRate: Optional[float] = None  # fração das requisições (0 a 1)
+
+
+class ProfilerStatusResponse(BaseModel):
+    enabled: bool
+    sampleRate: float
+    intervalMs: float
+    profiledRequests: int
+    samples: int
+    stacks: int
 
 
 class TestListItem(BaseModel):
@@ -73,8 +196,12 @@ class TestListItem(BaseModel):
     name: str
     status: str
     variantCount: int
+    startAt: Optional[datetime] = None
+    endAt: Optional[datetime] = None
+    allocation: float = 100
 
 
 class TestsListResponse(BaseModel):
     tests: List[TestListItem]
+    nextCursor: Optional[str] = None  # None na última página
 
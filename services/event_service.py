@@ -0,0 +1,177 @@
+"""Serviço de ingestão de eventos em lote."""
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from repositories.test_repository import TestRepository
+from core.exceptions import InvalidEventBatchError
+from core.executor import run_blocking
+from core.telemetry import CONVERSIONS, REPOSITORY_WRITE_DURATION, telemetry, variant_label
+from schemas.models import EventBatchError, EventBatchResponse
+from services.routing import serving_window
+
+
+IMPRESSION = "impression"
+CONVERSION = "conversion"
+
+# (tipo, índice no lote, payload bruto)
+BatchItem = Tuple[str, int, Any]
+
+
+def parse_json_batch(payload: Any) -> List[BatchItem]:
+    """
+    Converte um corpo JSON `{"impressions": [...], "conversions": [...]}`
+    em itens; o índice de cada item é a posição na sua lista.
+    """
+    if not isinstance(payload, dict):
+        raise InvalidEventBatchError("Batch body must be a JSON object")
+    items: List[BatchItem] = []
+    for key, event_type in (("impressions", IMPRESSION), ("conversions", CONVERSION)):
+        events = payload.get(key) or []
+        if not isinstance(events, list):
+            raise InvalidEventBatchError(f"Field '{key}' must be a list")
+        items.extend((event_type, index, event) for index, event in enumerate(events))
+    return items
+
+
+def parse_ndjson_batch(body: bytes) -> List[BatchItem]:
+    """
+    Converte um corpo NDJSON (um evento por linha, com campo `type`
+    igual a "impression" ou "conversion") em itens; o índice é a linha.
+    Linhas inválidas viram itens com payload None e são rejeitadas depois.
+    """
+    items: List[BatchItem] = []
+    for index, line in enumerate(body.splitlines()):
+        if not line.strip():
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            items.append(("unknown", index, None))
+            continue
+        event_type = event.get("type") if isinstance(event, dict) else None
+        items.append((str(event_type or "unknown"), index, event))
+    return items
+
+
+def _text_field(event: Dict, name: str) -> str:
+    value = event.get(name)
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"Field '{name}' must be a non-empty string")
+    return value
+
+
+def _timestamp_field(event: Dict, default: float) -> float:
+    value = event.get("timestamp")
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("Field 'timestamp' must be epoch seconds")
+    return float(value)
+
+
+class EventService:
+    """Serviço para validar e gravar lotes de impressões e conversões."""
+    
+    def __init__(self, repository: TestRepository, max_batch_size: int = 10_000):
+        self.repository = repository
+        self.max_batch_size = max_batch_size
+    
+    def ingest(self, items: Iterable[BatchItem]) -> EventBatchResponse:
+        """
+        Valida e grava um lote de eventos.
+        
+        Cada teste distinto é consultado uma única vez; os eventos válidos
+        são gravados em uma única chamada ao repositório e os inválidos
+        são reportados pelo seu índice, sem invalidar o restante do lote.
+        
+        São inválidos os eventos de testes que não estão atendendo no
+        recebimento do lote (pausados, encerrados ou fora da agenda, como
+        em /experiment) e os de variantes que não pertencem ao teste.
+        
+        Raises:
+            InvalidEventBatchError: Se o lote exceder o tamanho máximo
+        """
+        items = list(items)
+        if len(items) > self.max_batch_size:
+            raise InvalidEventBatchError(
+                f"Batch has {len(items)} events, max is {self.max_batch_size}"
+            )
+        
+        now = time.time()
+        known_tests: Dict[str, Optional[Dict]] = {}
+        # testId -> IDs das variantes, só para testes atendendo agora
+        live_variants: Dict[str, FrozenSet[str]] = {}
+        impressions: List[Tuple[str, str, float]] = []
+        conversions: List[Tuple[str, str, str, float]] = []
+        errors: List[EventBatchError] = []
+        
+        for event_type, index, event in items:
+            try:
+                if not isinstance(event, dict):
+                    raise ValueError("Event must be a JSON object")
+                if event_type not in (IMPRESSION, CONVERSION):
+                    raise ValueError("Event type must be 'impression' or 'conversion'")
+                
+                test_id = _text_field(event, "testId")
+                variant_id = _text_field(event, "variantId")
+                timestamp = _timestamp_field(event, now)
+                
+                if test_id not in known_tests:
+                    test = self.repository.get_test(test_id)
+                    known_tests[test_id] = test
+                    if test is not None:
+                        live_from, live_until = serving_window(test)
+                        if live_from <= now < live_until:
+                            live_variants[test_id] = frozenset(
+                                variant["variantId"] for variant in test["variants"]
+                            )
+                if known_tests[test_id] is None:
+                    raise ValueError(f"Test {test_id} not found")
+                variants = live_variants.get(test_id)
+                if variants is None:
+                    raise ValueError(f"Test {test_id} is not active")
+                if variant_id not in variants:
+                    raise ValueError(f"Variant {variant_id} not found in test {test_id}")
+                
+                if event_type == IMPRESSION:
+                    impressions.append((test_id, variant_id, timestamp))
+                else:
+                    name = _text_field(event, "event")
+                    conversions.append((test_id, variant_id, name, timestamp))
+            except ValueError as exc:
+                errors.append(
+                    EventBatchError(type=event_type, index=index, detail=str(exc))
+                )
+        
+        start = time.perf_counter()
+        self.repository.add_events(impressions, conversions)
+        telemetry.observe(
+            REPOSITORY_WRITE_DURATION, ("events_batch",), time.perf_counter() - start
+        )
+        if telemetry.enabled:
+            for (test_id, variant_id), count in Counter(
+                (test_id, variant_id) for test_id, variant_id, _, _ in conversions
+            ).items():
+                telemetry.inc(
+                    CONVERSIONS,
+                    (test_id, variant_label(known_tests[test_id], variant_id)),
+                    count
+                )
+        
+        return EventBatchResponse(
+            ok=not errors,
+            accepted=len(impressions) + len(conversions),
+            rejected=len(errors),
+            errors=errors
+        )
+    
+    async def ingest_async(self, items: Iterable[BatchItem]) -> EventBatchResponse:
+        """
+        Variante assíncrona de `ingest`.
+        
+        Roda sempre no executor dedicado, mesmo em memória: validar e
+        gravar até `max_batch_size` eventos bloquearia o event loop.
+        """
+        return await run_blocking(self.ingest, items)
@@ -0,0 +1,318 @@
+"""
+Exportação em streaming dos eventos brutos de um teste.
+
+Os eventos são lidos do repositório em lotes de colunas (um bloco do log
+colunar por vez) e cada lote é serializado de uma só vez: NDJSON e CSV
+montam o texto do lote inteiro, e o Arrow IPC converte cada coluna em um
+array. Só um lote fica em memória por vez, qualquer que seja o volume.
+"""
+import csv
+import io
+import json
+import math
+import zlib
+from datetime import datetime
+from itertools import repeat
+from typing import AsyncIterator, Collection, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # PyArrow é opcional (só para format=arrow)
+    pa = None
+    pc = None
+
+from event_log import EventBatch, to_datetime, to_epoch
+from repositories.test_repository import TestRepository
+from services.event_service import CONVERSION, IMPRESSION
+from core.exceptions import InvalidExportRequestError
+from core.executor import run_blocking
+
+
+KINDS = (IMPRESSION, CONVERSION)
+COLUMNS = ("type", "id", "testId", "variantId", "event", "timestamp")
+
+
+def _isoformat(timestamps: Sequence[float]) -> List[str]:
+    """
+    Timestamps em ISO 8601 (UTC sem timezone, como nas demais respostas),
+    iguais a `to_datetime(timestamp).isoformat()`.
+
+    Eventos vizinhos costumam cair no mesmo segundo: a data e a hora são
+    formatadas uma vez por segundo distinto e só os microssegundos por
+    evento, arredondados como em `datetime.fromtimestamp`.
+    """
+    prefixes: Dict[int, str] = {}
+    result = []
+    for timestamp in timestamps:
+        fraction, whole = math.modf(timestamp)
+        seconds = int(whole)
+        micros = round(fraction * 1e6)
+        if micros >= 1_000_000:
+            seconds += 1
+            micros -= 1_000_000
+        elif micros < 0:
+            seconds -= 1
+            micros += 1_000_000
+        prefix = prefixes.get(seconds)
+        if prefix is None:
+            prefix = prefixes[seconds] = to_datetime(seconds).isoformat()
+        result.append(f"{prefix}.{micros:06d}" if micros else prefix)
+    return result
+
+
+class NDJSONEncoder:
+    """Um objeto JSON por linha, com os mesmos campos das colunas do CSV."""
+    
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+    
+    def __init__(self, test_id: str):
+        self.test_id = json.dumps(test_id, ensure_ascii=False)
+    
+    def header(self) -> bytes:
+        return b""
+    
+    def encode(self, kind: str, batch: EventBatch) -> bytes:
+        # Cada nome distinto do lote é escapado uma única vez
+        quoted = {
+            name: json.dumps(name, ensure_ascii=False)
+            for name in set(batch.variants).union(batch.events or ())
+        }
+        prefix = f'{{"type":"{kind}","id":"'
+        test = f'","testId":{self.test_id},"variantId":'
+        timestamps = _isoformat(batch.timestamps)
+        if batch.events is None:
+            lines = [
+                f'{prefix}{event_id}{test}{quoted[variant]},"timestamp":"{timestamp}"}}\n'
+                for event_id, variant, timestamp in zip(batch.ids, batch.variants, timestamps)
+            ]
+        else:
+            lines = [
+                f'{prefix}{event_id}{test}{quoted[variant]},"event":{quoted[event]},'
+                f'"timestamp":"{timestamp}"}}\n'
+                for event_id, variant, event, timestamp in zip(
+                    batch.ids, batch.variants, batch.events, timestamps
+                )
+            ]
+        return "".join(lines).encode("utf-8")
+    
+    def finish(self) -> bytes:
+        return b""
+
+
+class CSVEncoder:
+    """CSV com cabeçalho; `event` fica vazio nas impressões."""
+    
+    media_type = "text/csv"
+    extension = "csv"
+    
+    def __init__(self, test_id: str):
+        self.test_id = test_id
+    
+    def header(self) -> bytes:
+        return (",".join(COLUMNS) + "\n").encode("utf-8")
+    
+    def encode(self, kind: str, batch: EventBatch) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(zip(
+            repeat(kind),
+            batch.ids,
+            repeat(self.test_id),
+            batch.variants,
+            batch.events if batch.events is not None else repeat(""),
+            _isoformat(batch.timestamps),
+        ))
+        return buffer.getvalue().encode("utf-8")
+    
+    def finish(self) -> bytes:
+        return b""
+
+
+class ArrowEncoder:
+    """
+    Stream Arrow IPC com um record batch por lote.
+    
+    O schema sai junto com o primeiro lote (ou no fim, sem eventos) e
+    `timestamp` é `timestamp[us, UTC]`.
+    
+    Raises:
+        InvalidExportRequestError: Se o PyArrow não estiver instalado
+    """
+    
+    media_type = "application/vnd.apache.arrow.stream"
+    extension = "arrows"
+    
+    def __init__(self, test_id: str):
+        if pa is None:
+            raise InvalidExportRequestError("Arrow export requires pyarrow to be installed")
+        self.test_id = test_id
+        self.schema = pa.schema([
+            ("type", pa.string()),
+            ("id", pa.int64()),
+            ("testId", pa.string()),
+            ("variantId", pa.string()),
+            ("event", pa.string()),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+        ])
+        self._sink = io.BytesIO()
+        self._writer = pa.ipc.new_stream(pa.PythonFile(self._sink, mode="w"), self.schema)
+    
+    def _drain(self) -> bytes:
+        """Bytes escritos pelo writer desde a última chamada."""
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+    
+    def header(self) -> bytes:
+        return b""
+    
+    def encode(self, kind: str, batch: EventBatch) -> bytes:
+        size = len(batch.ids)
+        micros = pc.round(pc.multiply(pa.array(batch.timestamps, pa.float64()), 1e6))
+        self._writer.write_batch(pa.record_batch([
+            pa.repeat(kind, size),
+            pa.array(batch.ids, pa.int64()),
+            pa.repeat(self.test_id, size),
+            pa.array(batch.variants, pa.string()),
+            pa.array(batch.events, pa.string())
+            if batch.events is not None else pa.nulls(size, pa.string()),
+            micros.cast(pa.int64()).cast(self.schema.field("timestamp").type),
+        ], schema=self.schema))
+        return self._drain()
+    
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._drain()
+
+
+EXPORT_FORMATS = {
+    "ndjson": NDJSONEncoder,
+    "csv": CSVEncoder,
+    "arrow": ArrowEncoder,
+}
+
+
+class ExportService:
+    """Serviço para exportar os eventos brutos de um teste em streaming."""
+    
+    def __init__(
+        self,
+        repository: TestRepository,
+        batch_size: int = 16384,
+        gzip_level: int = 6
+    ):
+        self.repository = repository
+        self.batch_size = batch_size
+        self.gzip_level = gzip_level
+    
+    async def export_async(
+        self,
+        test_id: str,
+        export_format: str = "ndjson",
+        kind: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        events: Optional[Collection[str]] = None,
+        compress: bool = False
+    ) -> AsyncIterator[bytes]:
+        """
+        Valida o pedido e retorna o gerador com os bytes da exportação.
+        
+        A validação acontece aqui, antes do primeiro byte, para que os
+        erros ainda virem respostas 4xx. Cada lote é lido, serializado e
+        comprimido no executor dedicado, um salto de thread por lote.
+        
+        Args:
+            test_id: ID do teste
+            export_format: "ndjson", "csv" ou "arrow"
+            kind: "impression" ou "conversion" (padrão: ambos; só
+                conversões quando `events` é informado)
+            start: Início da janela (UTC, inclusivo), opcional
+            end: Fim da janela (UTC, exclusivo), opcional
+            events: Nomes de eventos de conversão aceitos, opcional
+            compress: Comprime a saída em gzip
+        
+        Raises:
+            TestNotFoundError: Se o teste não existir
+            InvalidExportRequestError: Se a janela for inválida ou o
+                formato não estiver disponível
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise InvalidExportRequestError(f"Unknown export format: {export_format}")
+        if kind is not None and kind not in KINDS:
+            raise InvalidExportRequestError(f"Unknown event type: {kind}")
+        if kind == IMPRESSION and events is not None:
+            raise InvalidExportRequestError("Event names only apply to conversions")
+        start_ts = to_epoch(start)
+        end_ts = to_epoch(end)
+        if start_ts is not None and end_ts is not None and start_ts > end_ts:
+            raise InvalidExportRequestError("The window start must be before its end")
+        await self.repository.run(self.repository.get_test_or_raise, test_id)
+        
+        if kind is not None:
+            kinds: Tuple[str, ...] = (kind,)
+        elif events is not None:
+            kinds = (CONVERSION,)
+        else:
+            kinds = KINDS
+        encoder = EXPORT_FORMATS[export_format](test_id)
+        compressor = (
+            zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31) if compress else None
+        )
+        return self._stream(encoder, compressor, test_id, kinds, start_ts, end_ts, events)
+    
+    async def _stream(
+        self,
+        encoder,
+        compressor,
+        test_id: str,
+        kinds: Tuple[str, ...],
+        start: Optional[float],
+        end: Optional[float],
+        events: Optional[Collection[str]]
+    ) -> AsyncIterator[bytes]:
+        data = self._compress(compressor, encoder.header())
+        if data:
+            yield data
+        for kind in kinds:
+            position: Optional[int] = 0
+            while position is not None:
+                data, position = await run_blocking(
+                    self._next_batch,
+                    encoder, compressor, kind, test_id, position, start, end, events
+                )
+                if data:
+                    yield data
+        data = self._compress(compressor, encoder.finish(), final=True)
+        if data:
+            yield data
+    
+    def _next_batch(
+        self,
+        encoder,
+        compressor,
+        kind: str,
+        test_id: str,
+        position: int,
+        start: Optional[float],
+        end: Optional[float],
+        events: Optional[Collection[str]]
+    ) -> Tuple[bytes, Optional[int]]:
+        """Lê, serializa e comprime um lote (roda no executor)."""
+        batch, position = self.repository.read_events(
+            kind, test_id, position, self.batch_size, start, end, events
+        )
+        if not batch.ids:
+            return b"", position
+        return self._compress(compressor, encoder.encode(kind, batch)), position
+    
+    @staticmethod
+    def _compress(compressor, data: bytes, final: bool = False) -> bytes:
+        if compressor is None:
+            return data
+        data = compressor.compress(data)
+        if final:
+            data += compressor.flush()
+        return data
@@ -0,0 +1,176 @@
+"""Pipeline assíncrono de ingestão de impressões em lotes."""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from core.telemetry import BACKGROUND_FAILURES, REPOSITORY_WRITE_DURATION, telemetry
+from repositories.test_repository import TestRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+# Políticas quando a fila está cheia
+BACKPRESSURE_SYNC = "sync"                # grava direto no repositório (sem perda)
+BACKPRESSURE_DROP = "drop"                # descarta a impressão nova
+BACKPRESSURE_DROP_OLDEST = "drop_oldest"  # descarta a impressão mais antiga
+
+BACKPRESSURE_POLICIES = (BACKPRESSURE_SYNC, BACKPRESSURE_DROP, BACKPRESSURE_DROP_OLDEST)
+
+# Espera máxima entre novas tentativas depois de gravações que falharam
+MAX_RETRY_DELAY = 5.0
+
+
+class ImpressionPipeline:
+    """
+    Fila limitada em memória entre `/experiment` e o repositório.
+
+    As rotas chamam `add_impression` (mesma assinatura do repositório), que
+    apenas enfileira o evento com seu timestamp. Um consumidor asyncio,
+    iniciado no lifespan da aplicação, drena a fila em lotes a cada
+    `flush_interval` segundos ou quando `flush_size` eventos se acumulam.
+    Enquanto o consumidor não está rodando, as impressões são gravadas
+    diretamente no repositório.
+    
+    Se a gravação de um lote falhar, o lote volta para o início da fila, a
+    falha é registrada no log e na telemetria e o consumidor tenta de novo,
+    com espera crescente até `MAX_RETRY_DELAY` segundos.
+    """
+    
+    def __init__(
+        self,
+        repository: TestRepository,
+        max_size: int = 100_000,
+        flush_size: int = 1000,
+        flush_interval: float = 0.05,
+        backpressure: str = BACKPRESSURE_SYNC
+    ):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {backpressure}")
+        self.repository = repository
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        
+        self.dropped = 0
+        self.flushed = 0
+        self._queue: Deque[Tuple[str, str, float]] = deque()
+        self._flush_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+    
+    @property
+    def running(self) -> bool:
+        """Indica se o consumidor em segundo plano está ativo."""
+        return self._task is not None and not self._task.done()
+    
+    def __len__(self) -> int:
+        return len(self._queue)
+    
+    def add_impression(self, test_id: str, variant_id: str) -> None:
+        """Enfileira uma impressão (seguro para chamadas de várias threads)."""
+        if not self.running:
+            self.repository.add_impression(test_id, variant_id)
+            return
+        
+        queue = self._queue
+        if len(queue) >= self.max_size:
+            if self.backpressure == BACKPRESSURE_SYNC:
+                self.repository.add_impression(test_id, variant_id)
+                return
+            if self.backpressure == BACKPRESSURE_DROP:
+                self.dropped += 1
+                return
+            try:
+                queue.popleft()
+                self.dropped += 1
+            except IndexError:
+                pass
+        
+        queue.append((test_id, variant_id, time.time()))
+        if len(queue) == self.flush_size:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+    
+    def flush(self) -> int:
+        """
+        Drena a fila para o repositório em lotes de `flush_size`.
+        
+        Se o repositório falhar, o lote volta para o início da fila (na
+        ordem original) e a exceção é propagada.
+        
+        Returns:
+            Número de impressões gravadas
+        """
+        written = 0
+        with self._flush_lock:
+            queue = self._queue
+            while queue:
+                batch: List[Tuple[str, str, float]] = []
+                try:
+                    for _ in range(self.flush_size):
+                        batch.append(queue.popleft())
+                except IndexError:
+                    pass
+                start = time.perf_counter()
+                try:
+                    self.repository.add_impressions(batch)
+                except Exception:
+                    queue.extendleft(reversed(batch))
+                    self.flushed += written
+                    raise
+                telemetry.observe(
+                    REPOSITORY_WRITE_DURATION,
+                    ("impressions_batch",),
+                    time.perf_counter() - start
+                )
+                written += len(batch)
+            self.flushed += written
+        return written
+    
+    async def _run(self) -> None:
+        """Laço do consumidor: espera o intervalo ou o sinal de lote cheio."""
+        loop = asyncio.get_running_loop()
+        delay = self.flush_interval
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._queue:
+                continue
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception:
+                telemetry.inc(BACKGROUND_FAILURES, ("impression_pipeline",))
+                logger.exception(
+                    "Impression flush failed; %d impressions kept for retry",
+                    len(self._queue)
+                )
+                delay = min(max(delay * 2, self.flush_interval), MAX_RETRY_DELAY)
+            else:
+                delay = self.flush_interval
+    
+    def start(self) -> None:
+        """Inicia o consumidor no event loop atual."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = self._loop.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Para o consumidor e grava o que restou na fila."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        self.flush()
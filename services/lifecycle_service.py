@@ -0,0 +1,141 @@
+"""Ciclo de vida dos testes: status pela agenda e virada em segundo plano."""
+import asyncio
+import logging
+import math
+import time
+from typing import Dict, List, Optional
+
+from repositories.test_repository import TestRepository
+from core.telemetry import BACKGROUND_FAILURES, telemetry
+
+
+logger = logging.getLogger(__name__)
+
+
+ACTIVE = "active"
+PAUSED = "paused"
+SCHEDULED = "scheduled"
+ENDED = "ended"
+
+
+def resolve_status(test: Dict, now: float) -> str:
+    """
+    Status que o teste deve ter em `now` (epoch UTC), pela agenda.
+
+    Um teste pausado continua pausado até ser retomado pelo admin; os
+    demais ficam agendados antes de `startAt`, encerrados a partir de
+    `endAt` e ativos entre os dois.
+    """
+    if test["status"] == PAUSED:
+        return PAUSED
+    start_at = test.get("startAt")
+    end_at = test.get("endAt")
+    if end_at is not None and now >= end_at:
+        return ENDED
+    if start_at is not None and now < start_at:
+        return SCHEDULED
+    return ACTIVE
+
+
+def next_transition(test: Dict, now: float) -> float:
+    """Próximo instante em que `resolve_status` muda (infinito se nunca)."""
+    if test["status"] == PAUSED:
+        return math.inf
+    for moment in (test.get("startAt"), test.get("endAt")):
+        if moment is not None and moment > now:
+            return moment
+    return math.inf
+
+
+class LifecycleScheduler:
+    """
+    Vira o status armazenado dos testes agendados na hora marcada.
+    
+    O caminho quente não depende deste laço: a janela de cada teste é
+    compilada no `CompiledTest` e conferida com um único `time.time()`.
+    O laço mantém o status armazenado (listagem, métricas e `status` do
+    lote) em dia: acorda na próxima virada prevista, ou a cada `interval`
+    segundos para enxergar agendas alteradas, e grava todas as viradas
+    devidas como uma única versão da configuração.
+    
+    Sem mudança de versão e antes da próxima virada, cada passada só lê a
+    versão da configuração. Com vários workers, todos podem gravar a
+    mesma virada; a gravação repetida só publica o mesmo status de novo.
+    Uma passada que falha é registrada no log e na telemetria e repetida
+    depois de `interval` segundos.
+    """
+    
+    def __init__(self, repository: TestRepository, interval: float = 1.0):
+        self.repository = repository
+        self.interval = interval
+        
+        self.next_due = math.inf
+        self._seen_version: Optional[int] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+    
+    @property
+    def running(self) -> bool:
+        """Indica se o laço do agendador está ativo."""
+        return self._task is not None and not self._task.done()
+    
+    def apply_schedule(self, now: Optional[float] = None) -> List[str]:
+        """
+        Grava o status dos testes cuja agenda virou até `now`.
+        
+        Returns:
+            IDs dos testes alterados
+        """
+        now = time.time() if now is None else now
+        version = self.repository.get_config_version()
+        if version == self._seen_version and now < self.next_due:
+            return []
+        
+        changed = []
+        next_due = math.inf
+        for test in self.repository.get_all_tests():
+            status = resolve_status(test, now)
+            if status != test["status"]:
+                changed.append(dict(test, status=status))
+            next_due = min(next_due, next_transition(test, now))
+        if changed:
+            self.repository.save_tests(changed)
+        # Versão lida antes da varredura: uma alteração concorrente (ou a
+        # própria gravação acima) provoca nova varredura na próxima passada
+        self._seen_version = version
+        self.next_due = next_due
+        return [test["testId"] for test in changed]
+    
+    async def _run(self) -> None:
+        """Laço do agendador: aplica a agenda até ser parado."""
+        while not self._stopping:
+            try:
+                await self.repository.run(self.apply_schedule)
+                delay = min(self.interval, max(self.next_due - time.time(), 0.0))
+            except Exception:
+                telemetry.inc(BACKGROUND_FAILURES, ("lifecycle_scheduler",))
+                logger.exception("Test lifecycle scheduler pass failed")
+                # A próxima virada prevista pode já ter passado: sem esperar
+                # o intervalo, o laço repetiria a falha sem pausa
+                delay = self.interval
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+    
+    def start(self) -> None:
+        """Inicia o laço no event loop atual (nada faz sem `interval`)."""
+        if self.interval <= 0 or self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Para o laço, esperando a passada em andamento terminar."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
@@ -1,9 +1,24 @@
 """Serviço para cálculo de métricas."""
-from typing import Dict, List
+from datetime import datetime
+from time import perf_counter
+from typing import Dict, List, Optional
 
+from event_log import to_datetime, to_epoch
 from repositories.test_repository import TestRepository
-from schemas.models import TestMetricsResponse, VariantMetrics
-from core.exceptions import TestNotFoundError
+from schemas.models import AllTestsMetricsResponse, TestMetricsResponse
+from services.statistics import compare_to_control
+from core.config import settings
+from core.exceptions import InvalidMetricsWindowError, TestNotFoundError
+from core.executor import run_blocking
+from core.telemetry import METRICS_COMPUTATION_DURATION, telemetry
+
+
+DEFAULT_GRANULARITY = "hour"
+GRANULARITIES = ("minute", "hour")
+
+
+def _rate(conversions: int, impressions: int) -> float:
+    return round(conversions / impressions, 3) if impressions > 0 else 0.0
 
 
 class MetricsService:
@@ -12,43 +27,210 @@ class MetricsService:
     def __init__(self, repository: TestRepository):
         self.repository = repository
     
-    def get_test_metrics(self, test_id: str) -> TestMetricsResponse:
+    def get_test_metrics(
+        self,
+        test_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        granularity: Optional[str] = None
+    ) -> TestMetricsResponse:
         """
         Retorna as métricas de cada variante do teste.
         
+        Sem janela nem granularidade, retorna os totais de todo o período.
+        Caso contrário, lê apenas os rollups: os totais somam os buckets
+        cujo início está em [start, end) e cada variante inclui a série
+        de buckets não vazios. Cada variante é comparada com o controle
+        (a primeira variante) sobre os totais retornados.
+        
         Args:
             test_id: ID do teste
-            
+            start: Início da janela (UTC), opcional
+            end: Fim da janela (UTC, exclusivo), opcional
+            granularity: "minute" ou "hour" (padrão "hour" com janela)
+        
         Returns:
             Métricas do teste com todas as variantes
-            
+        
         Raises:
             TestNotFoundError: Se o teste não existir
+            InvalidMetricsWindowError: Se a janela ou granularidade for inválida
         """
+        began = perf_counter()
         test = self.repository.get_test_or_raise(test_id)
+        metrics = self._build([self._test_metrics(test, start, end, granularity)])[0]
+        telemetry.observe(METRICS_COMPUTATION_DURATION, ("test",), perf_counter() - began)
+        return metrics
+    
+    def get_all_metrics(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        granularity: Optional[str] = None
+    ) -> AllTestsMetricsResponse:
+        """
+        Retorna as métricas de todos os testes ativos.
         
-        variants_metrics = []
-        for variant in test["variants"]:
-            variant_id = variant["variantId"]
-            impressions_count = self.repository.count_impressions(test_id, variant_id)
-            conversions_count = self.repository.count_conversions(test_id, variant_id)
-            conversion_rate = (
-                conversions_count / impressions_count 
-                if impressions_count > 0 
-                else 0.0
+        As estatísticas de todas as variantes de todos os testes são
+        calculadas em uma única passada vetorizada.
+        """
+        began = perf_counter()
+        metrics = AllTestsMetricsResponse(tests=self._build([
+            self._test_metrics(test, start, end, granularity)
+            for test in self.repository.get_all_tests()
+            if test["status"] == "active"
+        ]))
+        telemetry.observe(METRICS_COMPUTATION_DURATION, ("all",), perf_counter() - began)
+        return metrics
+    
+    async def get_test_metrics_async(
+        self,
+        test_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        granularity: Optional[str] = None
+    ) -> TestMetricsResponse:
+        """
+        Variante assíncrona de `get_test_metrics`.
+        
+        O cálculo sempre roda no executor dedicado, mesmo em memória: ele
+        percorre contadores ou rollups e o teste estatístico de todas as
+        variantes, e não deve atrasar as demais requisições do event loop.
+        """
+        return await run_blocking(self.get_test_metrics, test_id, start, end, granularity)
+    
+    async def get_all_metrics_async(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        granularity: Optional[str] = None
+    ) -> AllTestsMetricsResponse:
+        """Variante assíncrona de `get_all_metrics` (no executor dedicado)."""
+        return await run_blocking(self.get_all_metrics, start, end, granularity)
+    
+    def _test_metrics(
+        self,
+        test: Dict,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        granularity: Optional[str]
+    ) -> Dict:
+        """Contagens de um teste, de todo o período ou de uma janela."""
+        test_id = test["testId"]
+        if start is None and end is None and granularity is None:
+            return {
+                "testId": test_id,
+                "variants": [
+                    self._lifetime_metrics(test_id, variant["variantId"])
+                    for variant in test["variants"]
+                ]
+            }
+        
+        granularity = granularity or DEFAULT_GRANULARITY
+        if granularity not in GRANULARITIES:
+            raise InvalidMetricsWindowError(
+                f"Invalid granularity: {granularity}"
             )
-            
-            variants_metrics.append(
-                VariantMetrics(
-                    variantId=variant_id,
-                    impressions=impressions_count,
-                    conversions=conversions_count,
-                    conversionRate=round(conversion_rate, 3)
-                )
+        if start is not None and end is not None and to_epoch(start) > to_epoch(end):
+            raise InvalidMetricsWindowError(
+                "The window start must be before its end"
             )
+        start_ts = to_epoch(start)
+        end_ts = to_epoch(end)
+        
+        return {
+            "testId": test_id,
+            "variants": [
+                self._window_metrics(
+                    test_id, variant["variantId"], granularity, start_ts, end_ts
+                )
+                for variant in test["variants"]
+            ],
+            "granularity": granularity,
+            "start": start,
+            "end": end
+        }
+    
+    def _build(self, tests: List[Dict]) -> List[TestMetricsResponse]:
+        """
+        Acrescenta intervalo de confiança, p-valor e probabilidade de superar
+        o controle (a primeira variante de cada teste) e monta as respostas.
         
-        return TestMetricsResponse(
-            testId=test_id,
-            variants=variants_metrics
+        As contagens ficam em dicts até aqui para que cada modelo seja
+        validado uma única vez, já com todos os campos.
+        """
+        variants: List[Dict] = []
+        controls: List[int] = []
+        for test in tests:
+            control = len(variants)
+            for variant in test["variants"]:
+                controls.append(control)
+                variants.append(variant)
+        
+        stats = compare_to_control(
+            [v["impressions"] for v in variants],
+            [v["conversions"] for v in variants],
+            controls,
+            normal_approx_min=settings.METRICS_NORMAL_APPROX_MIN
         )
-
+        for index, (variant, variant_stats) in enumerate(zip(variants, stats)):
+            variant["isControl"] = controls[index] == index
+            if variant_stats.ci_lower is not None:
+                variant["confidenceInterval"] = {
+                    "lower": variant_stats.ci_lower, "upper": variant_stats.ci_upper
+                }
+            variant["pValue"] = variant_stats.p_value
+            variant["probabilityToBeatControl"] = variant_stats.probability_to_beat_control
+        return [TestMetricsResponse(**test) for test in tests]
+    
+    def _lifetime_metrics(self, test_id: str, variant_id: str) -> Dict:
+        """Totais de todo o período a partir dos contadores."""
+        impressions_count = self.repository.count_impressions(test_id, variant_id)
+        conversions_count = self.repository.count_conversions(test_id, variant_id)
+        conversions_by_event = self.repository.count_conversions_by_event(
+            test_id, variant_id
+        )
+        return {
+            "variantId": variant_id,
+            "impressions": impressions_count,
+            "conversions": conversions_count,
+            "conversionRate": _rate(conversions_count, impressions_count),
+            "conversionsByEvent": conversions_by_event
+        }
+    
+    def _window_metrics(
+        self,
+        test_id: str,
+        variant_id: str,
+        granularity: str,
+        start: Optional[float],
+        end: Optional[float]
+    ) -> Dict:
+        """Totais e série temporal de uma variante a partir dos rollups."""
+        rollups = self.repository.get_rollups(
+            test_id, variant_id, granularity, start, end
+        )
+        impressions_total = 0
+        by_event_total: Dict[str, int] = {}
+        series: List[Dict] = []
+        for bucket, impressions, by_event in rollups:
+            conversions = sum(by_event.values())
+            impressions_total += impressions
+            for event, count in by_event.items():
+                by_event_total[event] = by_event_total.get(event, 0) + count
+            series.append({
+                "start": to_datetime(bucket),
+                "impressions": impressions,
+                "conversions": conversions,
+                "conversionRate": _rate(conversions, impressions),
+                "conversionsByEvent": by_event
+            })
+        conversions_total = sum(by_event_total.values())
+        return {
+            "variantId": variant_id,
+            "impressions": impressions_total,
+            "conversions": conversions_total,
+            "conversionRate": _rate(conversions_total, impressions_total),
+            "conversionsByEvent": by_event_total,
+            "series": series
+        }
@@ -0,0 +1,118 @@
+"""Exclusão dos eventos de um teste e retenção por idade em segundo plano."""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from repositories.test_repository import TestRepository
+from services.impression_pipeline import ImpressionPipeline
+from core.executor import run_blocking
+from core.exceptions import EventPurgeNotSupportedError
+from core.telemetry import BACKGROUND_FAILURES, telemetry
+
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionService:
+    """
+    Descarta dados de eventos sob demanda (por teste) e por idade.
+    
+    Com `ttl` positivo, um laço asyncio iniciado no lifespan da aplicação
+    aplica a retenção a cada `interval` segundos: os segmentos de eventos
+    brutos e os buckets de rollup mais antigos que `ttl` são descartados
+    inteiros. Os contadores de todo o período não expiram. Uma passada que
+    falha é registrada no log e na telemetria, e a próxima acontece no
+    intervalo seguinte.
+    """
+    
+    def __init__(
+        self,
+        repository: TestRepository,
+        pipeline: Optional[ImpressionPipeline] = None,
+        ttl: float = 0.0,
+        interval: float = 60.0
+    ):
+        self.repository = repository
+        self.pipeline = pipeline
+        self.ttl = ttl
+        self.interval = interval
+        
+        self.last_run: Optional[Dict[str, int]] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+    
+    @property
+    def running(self) -> bool:
+        """Indica se o laço de retenção está ativo."""
+        return self._task is not None and not self._task.done()
+    
+    async def delete_test_events_async(self, test_id: str) -> int:
+        """
+        Descarta os eventos brutos, contadores e rollups de um teste.
+        
+        As impressões ainda na fila do pipeline são gravadas antes, para
+        que não reapareçam depois da exclusão. A definição do teste é
+        mantida.
+        
+        Returns:
+            Quantidade de eventos brutos descartados
+        
+        Raises:
+            TestNotFoundError: Se o teste não existir
+            EventPurgeNotSupportedError: Se o backend não suportar a exclusão
+        """
+        await self.repository.run(self.repository.get_test_or_raise, test_id)
+        if self.pipeline is not None and len(self.pipeline):
+            await run_blocking(self.pipeline.flush)
+        return await run_blocking(self.repository.delete_test_events, test_id)
+    
+    def apply_retention(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Descarta o que for mais antigo que `ttl` segundos antes de `now`.
+        
+        Returns:
+            Quantidades descartadas ({"segments", "events", "rollupBuckets"})
+        """
+        cutoff = (time.time() if now is None else now) - self.ttl
+        self.last_run = self.repository.drop_events_before(cutoff)
+        return self.last_run
+    
+    async def _run(self) -> None:
+        """Laço da retenção: aplica uma vez por intervalo até ser parado."""
+        while not self._stopping:
+            try:
+                await run_blocking(self.apply_retention)
+            except Exception:
+                telemetry.inc(BACKGROUND_FAILURES, ("retention",))
+                logger.exception("Event retention pass failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+    
+    def start(self) -> None:
+        """
+        Inicia o laço no event loop atual (nada faz sem `ttl`).
+        
+        Raises:
+            EventPurgeNotSupportedError: Com `ttl` em um backend sem retenção
+        """
+        if self.ttl <= 0 or self.running:
+            return
+        if not self.repository.supports_event_purge:
+            raise EventPurgeNotSupportedError(
+                "AB_EVENT_RETENTION_SECONDS is not supported by the configured storage backend"
+            )
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Para o laço, esperando a passada em andamento terminar."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
@@ -0,0 +1,161 @@
+"""Compilação de testes em objetos de roteamento imutáveis."""
+import hashlib
+import json
+import math
+from array import array
+from typing import Dict, List, NamedTuple, Tuple
+
+from schemas.models import ExperimentResponse, Section
+from services.variant_selector import build_bucket_table
+
+
+class CompiledTest(NamedTuple):
+    """
+    Teste pronto para o caminho quente de `/experiment`.
+
+    Guarda a tabela bucket -> variante e a resposta já serializada de cada
+    variante, para que cada requisição faça apenas uma busca na tabela.
+    `version` é a versão do teste usada na compilação. `config_payload` é
+    a configuração pública do teste (`GET /test/{testId}/config`), com o
+    ETag forte correspondente.
+
+    O ciclo de vida também vem pronto: o teste atende enquanto
+    `live_from <= time.time() < live_until` (epoch UTC; a janela é vazia
+    quando pausado ou encerrado) e só os visitantes nos primeiros
+    `allocation_buckets` buckets de alocação entram nele; os demais
+    recebem `holdout_payload` (o controle marcado com `holdout`).
+    """
+    test_id: str
+    version: int
+    status: str
+    variant_ids: Tuple[str, ...]
+    bucket_table: array
+    payloads: Tuple[bytes, ...]
+    responses: Tuple[ExperimentResponse, ...]
+    config_payload: bytes
+    etag: str
+    live_from: float
+    live_until: float
+    allocation_buckets: int
+    holdout_payload: bytes
+    holdout_response: ExperimentResponse
+
+
+def render_variant(variant: Dict, holdout: bool = False) -> ExperimentResponse:
+    """Monta a resposta de experimento de uma variante."""
+    return ExperimentResponse(
+        variantId=variant["variantId"],
+        sections=[Section(**section) for section in variant["sections"]],
+        holdout=True if holdout else None
+    )
+
+
+def serialize_response(response: ExperimentResponse) -> bytes:
+    """Resposta de experimento em JSON compacto (sem `holdout` fora do holdout)."""
+    return json.dumps(response.model_dump(exclude_none=True), separators=(",", ":")).encode("utf-8")
+
+
+def serving_window(test: Dict) -> Tuple[float, float]:
+    """
+    Janela [início, fim) em epoch UTC em que o teste atende.
+
+    Sem agenda a janela é ilimitada; pausado ou encerrado, é vazia.
+    """
+    if test["status"] not in ("active", "scheduled"):
+        return math.inf, math.inf
+    start_at = test.get("startAt")
+    end_at = test.get("endAt")
+    return (
+        -math.inf if start_at is None else start_at,
+        math.inf if end_at is None else end_at,
+    )
+
+
+def allocation_buckets(test: Dict, bucket_count: int) -> int:
+    """Buckets de alocação que entram no teste, pelo percentual `allocation`."""
+    return round(test.get("allocation", 100.0) * bucket_count / 100)
+
+
+def bucket_ranges(bucket_table: array, variant_count: int) -> List[List[int]]:
+    """Faixa [início, fim) de buckets de cada variante (faixas contíguas, em ordem)."""
+    counts = [0] * variant_count
+    for index in bucket_table:
+        counts[index] += 1
+    ranges = []
+    start = 0
+    for count in counts:
+        ranges.append([start, start + count])
+        start += count
+    return ranges
+
+
+def render_config(
+    test: Dict,
+    responses: Tuple[ExperimentResponse, ...],
+    bucket_table: array,
+    salt: str,
+    allocated: int
+) -> bytes:
+    """
+    Serializa a configuração pública do teste: parâmetros de bucketing e,
+    por variante, a faixa de buckets e as seções. O visitante só entra no
+    teste se o bucket da chave de alocação for menor que `allocationBuckets`.
+
+    Não inclui a versão do teste, que é local a cada processo; o ETag é
+    derivado do conteúdo e, portanto, igual em todos os workers.
+    """
+    ranges = bucket_ranges(bucket_table, len(responses))
+    config = {
+        "testId": test["testId"],
+        "bucketing": {
+            "algorithm": "fnv1a32-fmix32",
+            "key": "testId:salt:visitorId",
+            "salt": salt,
+            "bucketCount": len(bucket_table),
+            "allocationKey": "testId:salt:allocation:visitorId",
+            "allocationBuckets": allocated,
+        },
+        "variants": [
+            {
+                "variantId": r.variantId,
+                "buckets": ranges[i],
+                "sections": r.model_dump(include={"sections"})["sections"],
+            }
+            for i, r in enumerate(responses)
+        ],
+    }
+    return json.dumps(config, separators=(",", ":")).encode("utf-8")
+
+
+def compile_test(
+    test: Dict,
+    bucket_count: int,
+    version: int = 0,
+    salt: str = ""
+) -> CompiledTest:
+    """Compila um teste armazenado em um `CompiledTest`."""
+    variants = test["variants"]
+    responses = tuple(render_variant(v) for v in variants)
+    payloads = tuple(serialize_response(r) for r in responses)
+    # Quem fica fora da alocação vê o controle (a primeira variante)
+    holdout_response = render_variant(variants[0], holdout=True)
+    bucket_table = build_bucket_table(variants, bucket_count)
+    allocated = allocation_buckets(test, bucket_count)
+    config_payload = render_config(test, responses, bucket_table, salt, allocated)
+    live_from, live_until = serving_window(test)
+    return CompiledTest(
+        test_id=test["testId"],
+        version=version,
+        status=test["status"],
+        variant_ids=tuple(v["variantId"] for v in variants),
+        bucket_table=bucket_table,
+        payloads=payloads,
+        responses=responses,
+        config_payload=config_payload,
+        etag='"%s"' % hashlib.sha1(config_payload).hexdigest(),
+        live_from=live_from,
+        live_until=live_until,
+        allocation_buckets=allocated,
+        holdout_payload=serialize_response(holdout_response),
+        holdout_response=holdout_response,
+    )
@@ -0,0 +1,260 @@
+"""
+Estatísticas de significância das variantes em relação ao controle.
+
+Para cada variante, calculadas de uma vez para todas as variantes de
+todos os testes (arrays planos, com o índice do controle de cada linha):
+
+- p-valor bilateral do teste z de duas proporções (variância agrupada)
+- intervalo de confiança de Wilson da taxa de conversão
+- probabilidade bayesiana de superar o controle, com posteriores
+  Beta(1 + conversões, 1 + impressões - conversões)
+
+Usa NumPy quando disponível; sem NumPy, cai para uma implementação em
+Python puro com os mesmos resultados.
+
+A probabilidade P(X > Y) entre duas Betas não é amostrada: quando as
+posteriores têm parâmetros grandes usa a aproximação normal da Beta; com
+poucos dados, onde a aproximação não vale, usa a soma exata de Evan Miller,
+que tem tantos termos quanto o menor parâmetro. Amostrar as posteriores
+de 500 testes x 10 variantes com pouco tráfego levava mais de um segundo.
+"""
+import math
+from typing import List, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+
+Z_95 = 1.959963984540054
+
+
+class VariantStats(NamedTuple):
+    """Estatísticas de uma variante (None quando não se aplicam)."""
+    p_value: Optional[float]
+    ci_lower: Optional[float]
+    ci_upper: Optional[float]
+    probability_to_beat_control: Optional[float]
+
+
+def compare_to_control(
+    impressions: Sequence[int],
+    conversions: Sequence[int],
+    controls: Sequence[int],
+    normal_approx_min: int = 50
+) -> List[VariantStats]:
+    """
+    Compara cada variante com o seu controle.
+
+    Args:
+        impressions: Impressões de cada variante (todas as variantes de
+            todos os testes, em um único array plano)
+        conversions: Conversões de cada variante
+        controls: Índice, nos mesmos arrays, do controle de cada variante;
+            o controle aponta para si mesmo
+        normal_approx_min: Menor parâmetro das posteriores a partir do qual
+            a probabilidade usa a aproximação normal em vez da soma exata
+
+    Returns:
+        Estatísticas de cada variante, na mesma ordem. O controle tem
+        apenas o intervalo de confiança.
+    """
+    if np is not None:
+        return _compare_numpy(impressions, conversions, controls, normal_approx_min)
+    return _compare_python(impressions, conversions, controls, normal_approx_min)
+
+
+def _erfc(x):
+    """
+    erfc vetorizado (NumPy não tem): aproximação de Chebyshev com erro
+    relativo < 1.2e-7 (Numerical Recipes, `erfcc`).
+    """
+    z = np.abs(x)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = -z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (
+        0.09678418 + t * (-0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (
+            1.48851587 + t * (-0.82215223 + t * 0.17087277))))))))
+    result = t * np.exp(poly)
+    return np.where(x >= 0, result, 2.0 - result)
+
+
+def _exact_terms(a, b, c, d):
+    """
+    Parâmetros da soma exata de P(Beta(a, b) > Beta(c, d)) percorrendo o
+    menor dos quatro parâmetros, pelas simetrias
+    P(X > Y) = 1 - P(Y > X) e P(X > Y) = P(1 - Y > 1 - X).
+
+    Returns:
+        (termos, beta_winner, alpha_other, beta_other, complemento)
+    """
+    smallest = min(a, b, c, d)
+    if smallest == a:
+        return a, b, c, d, False
+    if smallest == c:
+        return c, d, a, b, True
+    if smallest == d:
+        return d, c, b, a, False
+    return b, a, d, c, True
+
+
+def _exact_probability(a: float, b: float, c: float, d: float) -> float:
+    """P(Beta(a, b) > Beta(c, d)) para parâmetros inteiros (soma exata)."""
+    terms, beta_w, alpha_o, beta_o, complement = _exact_terms(a, b, c, d)
+    # Primeiro termo em log; os demais pela razão entre termos consecutivos
+    term = math.exp(
+        math.lgamma(beta_o + beta_w) + math.lgamma(alpha_o + beta_o)
+        - math.lgamma(alpha_o + beta_o + beta_w) - math.lgamma(beta_o)
+    )
+    total = 0.0
+    for i in range(int(terms)):
+        total += term
+        term *= (alpha_o + i) * (beta_w + i) / ((alpha_o + beta_o + beta_w + i) * (i + 1))
+    total = min(max(total, 0.0), 1.0)
+    return 1.0 - total if complement else total
+
+
+def _normal_probability(a: float, b: float, c: float, d: float) -> float:
+    """P(Beta(a, b) > Beta(c, d)) pela aproximação normal."""
+    mean = a / (a + b)
+    mean0 = c / (c + d)
+    var = a * b / ((a + b) ** 2 * (a + b + 1))
+    var0 = c * d / ((c + d) ** 2 * (c + d + 1))
+    return 0.5 * math.erfc(-(mean - mean0) / math.sqrt(2 * (var + var0)))
+
+
+_lgamma = np.frompyfunc(math.lgamma, 1, 1) if np is not None else None
+
+
+def _exact_probability_numpy(a, b, c, d):
+    """`_exact_probability` vetorizado: um passo por termo, todas as linhas juntas."""
+    smallest = np.minimum(np.minimum(a, b), np.minimum(c, d))
+    case_a = smallest == a
+    case_c = ~case_a & (smallest == c)
+    case_d = ~case_a & ~case_c & (smallest == d)
+    terms = smallest
+    beta_w = np.select([case_a, case_c, case_d], [b, d, c], a)
+    alpha_o = np.select([case_a, case_c, case_d], [c, a, b], d)
+    beta_o = np.select([case_a, case_c, case_d], [d, b, a], c)
+    complement = ~(case_a | case_d)
+
+    def lgamma(x):
+        return _lgamma(x).astype(np.float64)
+
+    term = np.exp(
+        lgamma(beta_o + beta_w) + lgamma(alpha_o + beta_o)
+        - lgamma(alpha_o + beta_o + beta_w) - lgamma(beta_o)
+    )
+    total = np.zeros_like(term)
+    for i in range(int(terms.max())):
+        total += np.where(i < terms, term, 0.0)
+        term = term * (alpha_o + i) * (beta_w + i) / ((alpha_o + beta_o + beta_w + i) * (i + 1))
+    total = np.clip(total, 0.0, 1.0)
+    return np.where(complement, 1.0 - total, total)
+
+
+def _compare_numpy(impressions, conversions, controls, normal_approx_min):
+    n = np.asarray(impressions, dtype=np.float64)
+    # Vários eventos de conversão por impressão não podem levar a taxa acima de 1
+    c = np.minimum(np.asarray(conversions, dtype=np.float64), n)
+    control = np.asarray(controls, dtype=np.intp)
+    if n.size == 0:
+        return []
+    has_data = n > 0
+    safe_n = np.where(has_data, n, 1.0)
+    rate = c / safe_n
+
+    # Intervalo de Wilson
+    z2 = Z_95 * Z_95
+    denominator = 1.0 + z2 / safe_n
+    center = (rate + z2 / (2 * safe_n)) / denominator
+    half = Z_95 * np.sqrt(rate * (1 - rate) / safe_n + z2 / (4 * safe_n * safe_n)) / denominator
+    ci_lower = np.clip(center - half, 0.0, 1.0)
+    ci_upper = np.clip(center + half, 0.0, 1.0)
+
+    # Teste z de duas proporções contra o controle
+    n0 = n[control]
+    c0 = c[control]
+    rate0 = rate[control]
+    is_treatment = control != np.arange(n.size)
+    comparable = is_treatment & has_data & (n0 > 0)
+    pooled = np.where(comparable, (c + c0) / np.where(comparable, n + n0, 1.0), 0.0)
+    se = np.sqrt(pooled * (1 - pooled) * (1 / safe_n + 1 / np.where(n0 > 0, n0, 1.0)))
+    z = np.where(se > 0, (rate - rate0) / np.where(se > 0, se, 1.0), 0.0)
+    p_value = np.minimum(_erfc(np.abs(z) / math.sqrt(2)), 1.0)
+
+    # Probabilidade de superar o controle (posteriores Beta)
+    alpha = 1.0 + c
+    beta = 1.0 + n - c
+    alpha0 = alpha[control]
+    beta0 = beta[control]
+    mean = alpha / (alpha + beta)
+    mean0 = alpha0 / (alpha0 + beta0)
+    var = alpha * beta / ((alpha + beta) ** 2 * (alpha + beta + 1))
+    var0 = alpha0 * beta0 / ((alpha0 + beta0) ** 2 * (alpha0 + beta0 + 1))
+    probability = 0.5 * _erfc(-(mean - mean0) / np.sqrt(2 * (var + var0)))
+
+    smallest = np.minimum(np.minimum(alpha, beta), np.minimum(alpha0, beta0))
+    exact = np.flatnonzero(is_treatment & (smallest < normal_approx_min))
+    if exact.size:
+        probability[exact] = _exact_probability_numpy(
+            alpha[exact], beta[exact], alpha0[exact], beta0[exact]
+        )
+
+    p_value = np.round(p_value, 4).tolist()
+    ci_lower = np.round(ci_lower, 4).tolist()
+    ci_upper = np.round(ci_upper, 4).tolist()
+    probability = np.round(probability, 4).tolist()
+    has_data = has_data.tolist()
+    comparable = comparable.tolist()
+    is_treatment = is_treatment.tolist()
+    return [
+        VariantStats(
+            p_value[i] if comparable[i] else None,
+            ci_lower[i] if has_data[i] else None,
+            ci_upper[i] if has_data[i] else None,
+            probability[i] if is_treatment[i] else None,
+        )
+        for i in range(len(has_data))
+    ]
+
+
+def _wilson(n: float, c: float):
+    if n <= 0:
+        return None, None
+    rate = c / n
+    z2 = Z_95 * Z_95
+    denominator = 1.0 + z2 / n
+    center = (rate + z2 / (2 * n)) / denominator
+    half = Z_95 * math.sqrt(rate * (1 - rate) / n + z2 / (4 * n * n)) / denominator
+    return round(max(center - half, 0.0), 4), round(min(center + half, 1.0), 4)
+
+
+def _compare_python(impressions, conversions, controls, normal_approx_min):
+    conversions = [min(c, n) for c, n in zip(conversions, impressions)]
+    results = []
+    for i, (n, c, control) in enumerate(zip(impressions, conversions, controls)):
+        ci_lower, ci_upper = _wilson(n, c)
+        if control == i:
+            results.append(VariantStats(None, ci_lower, ci_upper, None))
+            continue
+        n0 = impressions[control]
+        c0 = conversions[control]
+
+        p_value = None
+        if n > 0 and n0 > 0:
+            pooled = (c + c0) / (n + n0)
+            se = math.sqrt(pooled * (1 - pooled) * (1 / n + 1 / n0))
+            z = (c / n - c0 / n0) / se if se > 0 else 0.0
+            p_value = round(min(math.erfc(abs(z) / math.sqrt(2)), 1.0), 4)
+
+        alpha, beta = 1 + c, 1 + n - c
+        alpha0, beta0 = 1 + c0, 1 + n0 - c0
+        if min(alpha, beta, alpha0, beta0) >= normal_approx_min:
+            probability = _normal_probability(alpha, beta, alpha0, beta0)
+        else:
+            probability = _exact_probability(alpha, beta, alpha0, beta0)
+        results.append(
+            VariantStats(p_value, ci_lower, ci_upper, round(probability, 4))
+        )
+    return results
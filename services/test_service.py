@@ -1,23 +1,91 @@
 """Serviço de lógica de negócio para testes."""
-from typing import Dict, List
+from datetime import datetime
+from time import perf_counter, time
+from typing import Any, Dict, List, Optional, Tuple
 
+from event_log import to_datetime, to_epoch
 from repositories.test_repository import TestRepository
 from services.variant_selector import VariantSelector
+from services.routing import CompiledTest, compile_test
+from services.impression_pipeline import ImpressionPipeline
+from services.lifecycle_service import ACTIVE, ENDED, PAUSED, resolve_status
 from core.exceptions import (
     InvalidDistributionError, 
+    InvalidTestBatchError,
+    InvalidTestLifecycleError,
     TestNotFoundError, 
     TestInactiveError,
     TestAlreadyExistsError
 )
-from schemas.models import ExperimentResponse, Section
+from core.executor import run_blocking
+from core.telemetry import (
+    CONVERSIONS,
+    REPOSITORY_WRITE_DURATION,
+    VARIANT_SELECTION_DURATION,
+    telemetry,
+    variant_label,
+)
+from schemas.models import AdminTestBatchError, AdminTestBatchResponse, ExperimentResponse
+
+
+# Status aceitos nas alterações pelo admin ("active" retoma pela agenda)
+TEST_STATUSES = (ACTIVE, PAUSED)
+
+# Índice de `assign` para visitantes fora da alocação do teste
+HOLDOUT = -1
+
+# Agenda ou alocação ausente em uma atualização: mantém o valor armazenado
+UNCHANGED: Any = object()
+
+# Agenda e alocação de um teste criado sem informá-las
+NEW_TEST_LIFECYCLE = {"startAt": None, "endAt": None, "allocation": 100.0}
+
+
+def _lifecycle_status(test: Dict, paused: bool, now: float) -> str:
+    """Pausado, ou o status que a agenda do teste indica em `now`."""
+    return PAUSED if paused else resolve_status(dict(test, status=ACTIVE), now)
+
+
+def _keep_stored(test: Dict, start_at: Any, end_at: Any, allocation: Any) -> Tuple:
+    """Troca a agenda e a alocação `UNCHANGED` pelos valores do teste armazenado."""
+    if start_at is UNCHANGED:
+        start_at = None if test["startAt"] is None else to_datetime(test["startAt"])
+    if end_at is UNCHANGED:
+        end_at = None if test["endAt"] is None else to_datetime(test["endAt"])
+    if allocation is UNCHANGED:
+        allocation = test.get("allocation", 100.0)
+    return start_at, end_at, allocation
 
 
 class TestService:
-    """Serviço para gerenciar testes e experimentos."""
+    """
+    Serviço para gerenciar testes e experimentos.
+    
+    Os métodos `*_async` executam o método síncrono correspondente por
+    `repository.run`: direto no event loop com o repositório em memória,
+    ou inteiro no executor dedicado (um único salto de thread por
+    requisição) quando o backend faz E/S bloqueante.
+    """
     
-    def __init__(self, repository: TestRepository, variant_selector: VariantSelector):
+    def __init__(
+        self,
+        repository: TestRepository,
+        variant_selector: VariantSelector,
+        impression_pipeline: Optional[ImpressionPipeline] = None,
+        max_batch_size: int = 1000
+    ):
         self.repository = repository
         self.variant_selector = variant_selector
+        self.max_batch_size = max_batch_size
+        # Destino das impressões: o pipeline em lotes ou o próprio repositório
+        self.impression_sink = (
+            impression_pipeline if impression_pipeline is not None else repository
+        )
+        # test_id -> (teste compilado para o caminho quente de /experiment,
+        # versão global em que ele foi conferido pela última vez). Quando a
+        # versão global muda, cada entrada é reconferida pela versão do seu
+        # teste e só é recompilada se aquele teste mudou.
+        self._routing: Dict[str, Tuple[CompiledTest, int]] = {}
     
     def validate_distribution(self, variants: List[Dict]) -> None:
         """
@@ -32,11 +100,40 @@ class TestService:
                 f"Total distribution must equal 100, got {total_distribution}"
             )
     
+    def validate_lifecycle(
+        self,
+        start_at: Optional[datetime],
+        end_at: Optional[datetime],
+        allocation: float
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Valida a agenda e a alocação do teste.
+        
+        Returns:
+            Início e fim em epoch UTC (datas sem timezone são UTC)
+        
+        Raises:
+            InvalidTestLifecycleError: Se o fim não for posterior ao início
+                ou a alocação estiver fora de 0 a 100
+        """
+        if not 0 <= allocation <= 100:
+            raise InvalidTestLifecycleError(
+                f"Allocation must be between 0 and 100, got {allocation}"
+            )
+        start_ts = to_epoch(start_at)
+        end_ts = to_epoch(end_at)
+        if start_ts is not None and end_ts is not None and end_ts <= start_ts:
+            raise InvalidTestLifecycleError("The test end must be after its start")
+        return start_ts, end_ts
+    
     def create_test(
         self,
         test_id: str,
         name: str,
-        variants: List[Dict]
+        variants: List[Dict],
+        start_at: Optional[datetime] = None,
+        end_at: Optional[datetime] = None,
+        allocation: float = 100.0
     ) -> str:
         """
         Cria ou atualiza um teste.
@@ -45,6 +142,9 @@ class TestService:
             test_id: ID do teste
             name: Nome do teste
             variants: Lista de variantes
+            start_at: Início agendado (opcional)
+            end_at: Fim agendado (opcional)
+            allocation: Percentual de visitantes que entram no teste
             
         Returns:
             Mensagem indicando que foi criado
@@ -52,9 +152,11 @@ class TestService:
         Raises:
             TestAlreadyExistsError: Se o teste já existir
             InvalidDistributionError: Se a distribuição for inválida
+            InvalidTestLifecycleError: Se a agenda ou a alocação for inválida
         """
         # Validar distribuição
         self.validate_distribution(variants)
+        start_ts, end_ts = self.validate_lifecycle(start_at, end_at, allocation)
         
         # Verificar se o teste já existe
         existing_test = self.repository.get_test(test_id)
@@ -62,23 +164,37 @@ class TestService:
         if existing_test:
             raise TestAlreadyExistsError(f"Test {test_id} already exists")
 
-        # Criar novo
-        self.repository.save_test(test_id, name, variants, "active")
+        # Criar novo (ativo, ou agendado/encerrado conforme a agenda)
+        status = _lifecycle_status({"startAt": start_ts, "endAt": end_ts}, False, time())
+        self.repository.save_test(
+            test_id, name, variants, status, start_ts, end_ts, allocation
+        )
+        self.compile(test_id)
         return "Test created"
     
     def update_test(
         self,
         test_id: str,
         name: str,
-        variants: List[Dict]
+        variants: List[Dict],
+        start_at: Optional[datetime] = UNCHANGED,
+        end_at: Optional[datetime] = UNCHANGED,
+        allocation: float = UNCHANGED
     ) -> str:
         """
         Atualiza um teste existente.
         
+        O nome e as variantes são substituídos; a agenda e a alocação só
+        quando informadas (`UNCHANGED` mantém o valor armazenado, e None
+        em `start_at`/`end_at` remove a data).
+        
         Args:
             test_id: ID do teste
             name: Nome do teste
             variants: Lista de variantes
+            start_at: Início agendado (opcional)
+            end_at: Fim agendado (opcional)
+            allocation: Percentual de visitantes que entram no teste
             
         Returns:
             Mensagem indicando que foi atualizado
@@ -86,6 +202,7 @@ class TestService:
         Raises:
             TestNotFoundError: Se o teste não existir
             InvalidDistributionError: Se a distribuição for inválida
+            InvalidTestLifecycleError: Se a agenda ou a alocação for inválida
         """
         # Validar distribuição
         self.validate_distribution(variants)
@@ -96,21 +213,275 @@ class TestService:
         if not existing_test:
             raise TestNotFoundError(f"Test {test_id} not found")
         
-        # Atualizar mantendo o status atual
+        start_at, end_at, allocation = _keep_stored(existing_test, start_at, end_at, allocation)
+        start_ts, end_ts = self.validate_lifecycle(start_at, end_at, allocation)
+        
+        # Um teste pausado continua pausado; os demais seguem a nova agenda
+        status = _lifecycle_status(
+            {"startAt": start_ts, "endAt": end_ts},
+            existing_test["status"] == PAUSED,
+            time()
+        )
         self.repository.save_test(
             test_id, 
             name, 
             variants, 
-            existing_test["status"]
+            status,
+            start_ts,
+            end_ts,
+            allocation
         )
+        self.compile(test_id)
         return "Test updated"
     
-    def get_experiment(self, test_id: str) -> ExperimentResponse:
+    def pause_test(self, test_id: str) -> str:
+        """
+        Pausa um teste: `/experiment` e a configuração passam a responder
+        404 até ele ser retomado. Pausar de novo não muda nada.
+        
+        Returns:
+            Status resultante ("paused")
+        
+        Raises:
+            TestNotFoundError: Se o teste não existir
+            InvalidTestLifecycleError: Se o teste já tiver encerrado
+        """
+        return self._set_paused(test_id, True)
+    
+    def resume_test(self, test_id: str) -> str:
+        """
+        Retoma um teste pausado, que volta ao status da agenda (ativo,
+        agendado ou encerrado). Retomar um teste não pausado não muda nada.
+        
+        Returns:
+            Status resultante
+        
+        Raises:
+            TestNotFoundError: Se o teste não existir
+        """
+        return self._set_paused(test_id, False)
+    
+    def _set_paused(self, test_id: str, paused: bool) -> str:
+        test = self.repository.get_test_or_raise(test_id)
+        if paused and test["status"] == ENDED:
+            raise InvalidTestLifecycleError(f"Test {test_id} has ended")
+        if not paused and test["status"] != PAUSED:
+            return test["status"]
+        status = _lifecycle_status(test, paused, time())
+        if status != test["status"]:
+            self.repository.save_tests([dict(test, status=status)])
+            self.compile(test_id)
+        return status
+    
+    def apply_batch(self, operations: List[Dict]) -> AdminTestBatchResponse:
+        """
+        Aplica um lote de criações, atualizações e mudanças de status.
+        
+        As operações são validadas em ordem sobre o estado que o lote vai
+        deixando (uma criação pode ser seguida de uma mudança de status do
+        mesmo teste). As inválidas são reportadas pelo índice, sem
+        invalidar o restante, e as válidas são gravadas de uma vez, como
+        uma única versão da configuração. O status "active" retoma o teste
+        pela agenda, como `resume_test`.
+        
+        Na atualização, `startAt`, `endAt` e `allocation` ausentes do dict
+        (ou `allocation` None) mantêm os valores do teste, como em
+        `update_test`; na criação, o padrão é sem agenda e 100%.
+        
+        Args:
+            operations: Dicts com `op` ("create", "update" ou "status"),
+                `testId` e, conforme a operação, `name`, `variants`,
+                `startAt`, `endAt`, `allocation` e `status`
+        
+        Raises:
+            InvalidTestBatchError: Se o lote exceder o tamanho máximo
+        """
+        if len(operations) > self.max_batch_size:
+            raise InvalidTestBatchError(
+                f"Batch has {len(operations)} operations, max is {self.max_batch_size}"
+            )
+        
+        # testId -> teste como fica após as operações já aceitas
+        pending: Dict[str, Dict] = {}
+        errors: List[AdminTestBatchError] = []
+        now = time()
+        
+        for index, operation in enumerate(operations):
+            test_id = operation["testId"]
+            op = operation["op"]
+            try:
+                current = pending.get(test_id) or self.repository.get_test(test_id)
+                status = operation.get("status")
+                if status is not None and status not in TEST_STATUSES:
+                    raise ValueError(f"Unknown status: {status}")
+                if op == "status":
+                    if current is None:
+                        raise ValueError(f"Test {test_id} not found")
+                    if status is None:
+                        raise ValueError("Field 'status' is required")
+                    if status == PAUSED and current["status"] == ENDED:
+                        raise ValueError(f"Test {test_id} has ended")
+                    if status == PAUSED or current["status"] == PAUSED:
+                        status = _lifecycle_status(current, status == PAUSED, now)
+                        pending[test_id] = dict(current, status=status)
+                    continue
+                
+                if op == "create" and current is not None:
+                    raise ValueError(f"Test {test_id} already exists")
+                if op == "update" and current is None:
+                    raise ValueError(f"Test {test_id} not found")
+                if not operation.get("name") or operation.get("variants") is None:
+                    raise ValueError("Fields 'name' and 'variants' are required")
+                self.validate_distribution(operation["variants"])
+                start_at = operation.get("startAt", UNCHANGED)
+                end_at = operation.get("endAt", UNCHANGED)
+                allocation = operation.get("allocation")
+                if allocation is None:
+                    allocation = UNCHANGED
+                # Na criação, o que não veio fica sem agenda e com 100%
+                stored = current if op == "update" else NEW_TEST_LIFECYCLE
+                start_at, end_at, allocation = _keep_stored(
+                    stored, start_at, end_at, allocation
+                )
+                start_ts, end_ts = self.validate_lifecycle(start_at, end_at, allocation)
+                test = {
+                    "testId": test_id,
+                    "name": operation["name"],
+                    "variants": operation["variants"],
+                    "startAt": start_ts,
+                    "endAt": end_ts,
+                    "allocation": allocation
+                }
+                # A criação segue a agenda; a atualização mantém a pausa
+                paused = (
+                    status == PAUSED if status is not None
+                    else current is not None and current["status"] == PAUSED
+                )
+                test["status"] = _lifecycle_status(test, paused, now)
+                pending[test_id] = test
+            except (ValueError, InvalidDistributionError, InvalidTestLifecycleError) as exc:
+                errors.append(AdminTestBatchError(index=index, testId=test_id, detail=str(exc)))
+        
+        if pending:
+            start = perf_counter()
+            self.repository.save_tests(list(pending.values()))
+            telemetry.observe(
+                REPOSITORY_WRITE_DURATION, ("tests_batch",), perf_counter() - start
+            )
+            # Compilados sob demanda no primeiro /experiment de cada teste:
+            # compilar um lote inteiro aqui seguraria o event loop
+            for test_id in pending:
+                self._routing.pop(test_id, None)
+        
+        return AdminTestBatchResponse(
+            ok=not errors,
+            applied=len(operations) - len(errors),
+            rejected=len(errors),
+            configVersion=self.repository.get_config_version(),
+            errors=errors
+        )
+    
+    def compile(self, test_id: str) -> Optional[CompiledTest]:
+        """
+        Compila o teste armazenado e atualiza o cache de roteamento.
+        
+        Returns:
+            Teste compilado, ou None se o teste não existir
+        """
+        # Versões lidas antes do teste: uma alteração concorrente deixa a
+        # entrada com versão antiga e ela é recompilada na próxima conferência
+        config_version = self.repository.get_config_version()
+        test_version = self.repository.get_test_version(test_id)
+        test = self.repository.get_test(test_id)
+        if not test:
+            self._routing.pop(test_id, None)
+            return None
+        compiled = compile_test(
+            test,
+            self.variant_selector.bucket_count,
+            test_version,
+            self.variant_selector.salt
+        )
+        self._routing[test_id] = (compiled, config_version)
+        return compiled
+    
+    def get_active_routing(self, test_id: str) -> CompiledTest:
+        """
+        Retorna o teste compilado, compilando na primeira vez.
+        
+        O ciclo de vida é conferido pela janela já compilada (pausado,
+        fora da agenda ou encerrado, mesmo antes do agendador gravar a
+        virada do status).
+        
+        Raises:
+            TestNotFoundError: Se o teste não existir
+            TestInactiveError: Se o teste estiver inativo
+        """
+        version = self.repository.get_config_version()
+        entry = self._routing.get(test_id)
+        if entry is not None and entry[1] == version:
+            compiled = entry[0]
+        elif entry is not None and entry[0].version == self.repository.get_test_version(test_id):
+            # Outro teste mudou (inclusive em outro worker): este continua válido
+            compiled = entry[0]
+            self._routing[test_id] = (compiled, version)
+        else:
+            compiled = self.compile(test_id)
+        if compiled is None:
+            raise TestNotFoundError(f"Test {test_id} not found")
+        if not compiled.live_from <= time() < compiled.live_until:
+            raise TestInactiveError(f"Test {test_id} is not active")
+        return compiled
+    
+    def assign(
+        self,
+        test_id: str,
+        visitor_id: Optional[str] = None
+    ) -> Tuple[CompiledTest, int]:
+        """
+        Seleciona a variante do visitante e registra a impressão.
+        
+        Visitantes fora da alocação do teste recebem `HOLDOUT` no lugar do
+        índice e nenhuma impressão é registrada.
+        
+        Returns:
+            Tupla (teste compilado, índice da variante selecionada ou HOLDOUT)
+        """
+        start = perf_counter()
+        compiled = self.get_active_routing(test_id)
+        if not self.variant_selector.in_allocation(
+            compiled.allocation_buckets, test_id, visitor_id
+        ):
+            telemetry.observe(
+                VARIANT_SELECTION_DURATION, (test_id, "holdout"), perf_counter() - start
+            )
+            return compiled, HOLDOUT
+        index = self.variant_selector.select_index(
+            compiled.bucket_table,
+            test_id,
+            visitor_id
+        )
+        variant_id = compiled.variant_ids[index]
+        telemetry.observe(
+            VARIANT_SELECTION_DURATION, (test_id, variant_id), perf_counter() - start
+        )
+        self.impression_sink.add_impression(test_id, variant_id)
+        return compiled, index
+    
+    def get_experiment(
+        self,
+        test_id: str,
+        visitor_id: Optional[str] = None
+    ) -> ExperimentResponse:
         """
         Obtém a variante e registra impressão.
         
+        Fora da alocação, retorna o controle marcado com `holdout`, sem
+        impressão.
+        
         Args:
             test_id: ID do teste
+            visitor_id: ID estável do visitante (torna a atribuição fixa)
             
         Returns:
             Resposta com variante e seções
@@ -119,28 +490,27 @@ class TestService:
             TestNotFoundError: Se o teste não existir
             TestInactiveError: Se o teste estiver inativo
         """
-        # Buscar o teste ativo
-        test = self.repository.get_active_test_or_raise(test_id)
-        
-        # Selecionar variante baseada na distribuição
-        selected_variant = self.variant_selector.select_variant(
-            test["variants"], 
-            test_id
-        )
-        
-        # Registrar impressão
-        self.repository.add_impression(
-            test_id, 
-            selected_variant["variantId"]
-        )
-        
-        # Retornar seções
-        sections = [Section(**section) for section in selected_variant["sections"]]
+        compiled, index = self.assign(test_id, visitor_id)
+        if index == HOLDOUT:
+            return compiled.holdout_response
+        return compiled.responses[index]
+    
+    def get_experiment_payload(
+        self,
+        test_id: str,
+        visitor_id: Optional[str] = None
+    ) -> bytes:
+        """
+        Igual a `get_experiment`, mas retorna a resposta já serializada.
         
-        return ExperimentResponse(
-            variantId=selected_variant["variantId"],
-            sections=sections
-        )
+        Raises:
+            TestNotFoundError: Se o teste não existir
+            TestInactiveError: Se o teste estiver inativo
+        """
+        compiled, index = self.assign(test_id, visitor_id)
+        if index == HOLDOUT:
+            return compiled.holdout_payload
+        return compiled.payloads[index]
     
     def register_conversion(
         self,
@@ -160,8 +530,77 @@ class TestService:
             TestNotFoundError: Se o teste não existir
         """
         # Verificar se o teste existe
-        self.repository.get_test_or_raise(test_id)
+        test = self.repository.get_test_or_raise(test_id)
         
         # Registrar conversão
+        start = perf_counter()
         self.repository.add_conversion(test_id, variant_id, event)
+        telemetry.observe(REPOSITORY_WRITE_DURATION, ("conversion",), perf_counter() - start)
+        telemetry.inc(CONVERSIONS, (test_id, variant_label(test, variant_id)))
+    
+    async def create_test_async(
+        self,
+        test_id: str,
+        name: str,
+        variants: List[Dict],
+        start_at: Optional[datetime] = None,
+        end_at: Optional[datetime] = None,
+        allocation: float = 100.0
+    ) -> str:
+        """Variante assíncrona de `create_test`."""
+        return await self.repository.run(
+            self.create_test, test_id, name, variants, start_at, end_at, allocation
+        )
+    
+    async def update_test_async(
+        self,
+        test_id: str,
+        name: str,
+        variants: List[Dict],
+        start_at: Optional[datetime] = UNCHANGED,
+        end_at: Optional[datetime] = UNCHANGED,
+        allocation: float = UNCHANGED
+    ) -> str:
+        """Variante assíncrona de `update_test`."""
+        return await self.repository.run(
+            self.update_test, test_id, name, variants, start_at, end_at, allocation
+        )
+    
+    async def pause_test_async(self, test_id: str) -> str:
+        """Variante assíncrona de `pause_test`."""
+        return await self.repository.run(self.pause_test, test_id)
+    
+    async def resume_test_async(self, test_id: str) -> str:
+        """Variante assíncrona de `resume_test`."""
+        return await self.repository.run(self.resume_test, test_id)
+    
+    async def apply_batch_async(self, operations: List[Dict]) -> AdminTestBatchResponse:
+        """
+        Variante assíncrona de `apply_batch`.
+        
+        Roda sempre no executor dedicado, mesmo em memória: validar e
+        compilar até `max_batch_size` operações bloquearia o event loop.
+        """
+        return await run_blocking(self.apply_batch, operations)
+    
+    async def get_active_routing_async(self, test_id: str) -> CompiledTest:
+        """Variante assíncrona de `get_active_routing`."""
+        return await self.repository.run(self.get_active_routing, test_id)
+    
+    async def get_experiment_payload_async(
+        self,
+        test_id: str,
+        visitor_id: Optional[str] = None
+    ) -> bytes:
+        """Variante assíncrona de `get_experiment_payload`."""
+        return await self.repository.run(self.get_experiment_payload, test_id, visitor_id)
+    
+    async def register_conversion_async(
+        self,
+        test_id: str,
+        variant_id: str,
+        event: str
+    ) -> None:
+        """Variante assíncrona de `register_conversion`."""
+        await self.repository.run(self.register_conversion, test_id, variant_id, event)
 
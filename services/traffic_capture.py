@@ -0,0 +1,150 @@
+"""Captura de tráfego HTTP em JSONL para replay."""
+import asyncio
+import base64
+import json
+import os
+import random
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+
+# (início epoch, método, caminho, rota, query, content-type, corpo, status, duração ms)
+CapturedRequest = Tuple[
+    float, str, str, Optional[str], str, Optional[str], Optional[bytes], int, float
+]
+
+
+def format_entry(request: CapturedRequest) -> str:
+    """
+    Linha JSONL de uma requisição capturada.
+
+    Corpos UTF-8 vão em `body`; os demais em `bodyBase64`. Corpos acima do
+    limite não são guardados e a linha recebe `"bodyOmitted": true`.
+    """
+    started, method, path, route, query, content_type, body, status, duration = request
+    entry = {
+        "ts": round(started, 6),
+        "method": method,
+        "path": path,
+        "route": route,
+        "query": query,
+        "contentType": content_type,
+        "status": status,
+        "durationMs": round(duration, 3),
+    }
+    if body is None:
+        entry["bodyOmitted"] = True
+    elif body:
+        try:
+            entry["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["bodyBase64"] = base64.b64encode(body).decode("ascii")
+    return json.dumps(entry, separators=(",", ":"), ensure_ascii=False)
+
+
+class TrafficRecorder:
+    """
+    Buffer limitado de requisições amostradas, gravado em um arquivo JSONL.
+    
+    O middleware chama `should_sample` no início de cada requisição e
+    `record` ao final; `record` só acrescenta uma tupla ao buffer. A
+    serialização e a escrita ficam com um laço asyncio iniciado no
+    lifespan, que grava o buffer a cada `flush_interval` segundos em uma
+    thread do executor. Com o buffer cheio, as novas capturas são
+    descartadas (contadas em `dropped`) sem atrasar a requisição.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 1.0,
+        max_size: int = 10_000,
+        flush_interval: float = 1.0,
+        max_body_bytes: int = 65536
+    ):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"Invalid capture sample rate: {sample_rate}")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_body_bytes = max_body_bytes
+        
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self._buffer: Deque[CapturedRequest] = deque()
+        self._flush_lock = threading.Lock()
+        self._stopping: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def running(self) -> bool:
+        """Indica se o laço de gravação está ativo."""
+        return self._task is not None and not self._task.done()
+    
+    def __len__(self) -> int:
+        return len(self._buffer)
+    
+    def should_sample(self) -> bool:
+        """Sorteia se a requisição atual será capturada."""
+        rate = self.sample_rate
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+    
+    def record(self, request: CapturedRequest) -> None:
+        """Acrescenta uma requisição ao buffer (descarta se estiver cheio)."""
+        if len(self._buffer) >= self.max_size:
+            self.dropped += 1
+            return
+        self._buffer.append(request)
+        self.recorded += 1
+    
+    def flush(self) -> int:
+        """
+        Grava o buffer no final do arquivo.
+        
+        Returns:
+            Número de requisições gravadas
+        """
+        with self._flush_lock:
+            lines: List[str] = []
+            try:
+                while True:
+                    lines.append(format_entry(self._buffer.popleft()))
+            except IndexError:
+                pass
+            if not lines:
+                return 0
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            self.written += len(lines)
+            return len(lines)
+    
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._buffer:
+                await loop.run_in_executor(None, self.flush)
+    
+    def start(self) -> None:
+        """Inicia o laço de gravação no event loop atual."""
+        if self.running:
+            return
+        self._stopping = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Para o laço de gravação e grava o que restou no buffer."""
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        self.flush()
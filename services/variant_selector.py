@@ -1,32 +1,164 @@
 """Serviço para seleção de variantes."""
 import random
-from typing import Dict, List
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+
+
+_FNV_OFFSET = 0x811C9DC5
+_FNV_PRIME = 0x01000193
+_MASK_32 = 0xFFFFFFFF
+
+
+def _fnv1a(data: bytes, h: int = _FNV_OFFSET) -> int:
+    """FNV-1a de 32 bits, continuando a partir do estado `h`."""
+    for byte in data:
+        h = ((h ^ byte) * _FNV_PRIME) & _MASK_32
+    return h
+
+
+def _fmix32(h: int) -> int:
+    """Finalizador do MurmurHash3: espalha melhor os bits baixos."""
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & _MASK_32
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & _MASK_32
+    h ^= h >> 16
+    return h
+
+
+def stable_hash(value: str) -> int:
+    """
+    Hash estável de 32 bits (FNV-1a com finalizador do MurmurHash3).
+
+    Não depende de PYTHONHASHSEED nem do processo, e é simples de
+    reproduzir em JavaScript no SDK.
+    """
+    return _fmix32(_fnv1a(value.encode("utf-8")))
+
+
+def build_bucket_table(variants: List[Dict], bucket_count: int) -> array:
+    """
+    Pré-calcula a tabela bucket -> índice da variante.
+
+    Cada variante ocupa uma faixa contígua de buckets proporcional à sua
+    distribuição; a última variante absorve sobras de arredondamento.
+    """
+    table = array("H")
+    cumulative = 0.0
+    for index, variant in enumerate(variants):
+        cumulative += variant["distribution"]
+        end = bucket_count if index == len(variants) - 1 else round(
+            cumulative * bucket_count / 100
+        )
+        end = min(max(end, len(table)), bucket_count)
+        table.extend([index] * (end - len(table)))
+    return table
 
 
 class VariantSelector:
     """Seleciona variantes baseado na distribuição."""
     
-    @staticmethod
-    def select_variant(variants: List[Dict], test_id: str) -> Dict:
+    def __init__(
+        self,
+        salt: str = settings.BUCKETING_SALT,
+        bucket_count: int = settings.BUCKET_COUNT
+    ):
+        self.salt = salt
+        self.bucket_count = bucket_count
+        # test_id -> (lista de variantes usada na construção, tabela)
+        self._tables: Dict[str, Tuple[List[Dict], array]] = {}
+        # test_id -> estado do FNV após o prefixo "testId:salt:"
+        self._prefix_states: Dict[str, int] = {}
+        # test_id -> estado do FNV após o prefixo "testId:salt:allocation:"
+        self._allocation_states: Dict[str, int] = {}
+    
+    def bucket_for(self, test_id: str, visitor_id: str) -> int:
         """
-        Seleciona uma variante baseada na distribuição usando seleção aleatória.
+        Retorna o bucket determinístico de um visitante em um teste.
+        
+        Equivale a `stable_hash(f"{test_id}:{salt}:{visitor_id}")`, mas o
+        prefixo de cada teste é hasheado uma única vez.
+        """
+        state = self._prefix_states.get(test_id)
+        if state is None:
+            state = _fnv1a(f"{test_id}:{self.salt}:".encode("utf-8"))
+            self._prefix_states[test_id] = state
+        h = _fmix32(_fnv1a(visitor_id.encode("utf-8"), state))
+        return h % self.bucket_count
+    
+    def in_allocation(
+        self,
+        allocation_buckets: int,
+        test_id: str,
+        visitor_id: Optional[str] = None
+    ) -> bool:
+        """
+        Indica se o visitante entra no teste, que ocupa `allocation_buckets`
+        dos `bucket_count` buckets de alocação.
+        
+        O bucket de alocação usa a chave `testId:salt:allocation:visitorId`,
+        independente do bucket da variante: ampliar a alocação só inclui
+        visitantes novos, sem trocar a variante de quem já estava no teste.
+        Sem `visitor_id`, o bucket é sorteado.
+        """
+        if allocation_buckets >= self.bucket_count:
+            return True
+        if visitor_id is None:
+            return random.randrange(self.bucket_count) < allocation_buckets
+        state = self._allocation_states.get(test_id)
+        if state is None:
+            state = _fnv1a(f"{test_id}:{self.salt}:allocation:".encode("utf-8"))
+            self._allocation_states[test_id] = state
+        h = _fmix32(_fnv1a(visitor_id.encode("utf-8"), state))
+        return h % self.bucket_count < allocation_buckets
+    
+    def get_bucket_table(self, variants: List[Dict], test_id: str) -> array:
+        """Retorna a tabela de buckets do teste, reconstruindo se mudou."""
+        cached = self._tables.get(test_id)
+        if cached is not None and cached[0] is variants:
+            return cached[1]
+        table = build_bucket_table(variants, self.bucket_count)
+        self._tables[test_id] = (variants, table)
+        return table
+    
+    def select_index(
+        self,
+        bucket_table: array,
+        test_id: str,
+        visitor_id: Optional[str] = None
+    ) -> int:
+        """
+        Retorna o índice da variante para o visitante em uma tabela pronta.
+        
+        Com `visitor_id`, a escolha é determinística: o mesmo visitante
+        sempre cai no mesmo bucket e, portanto, na mesma variante. Sem ele,
+        o bucket é sorteado aleatoriamente.
+        """
+        if visitor_id is None:
+            return bucket_table[random.randrange(self.bucket_count)]
+        return bucket_table[self.bucket_for(test_id, visitor_id)]
+    
+    def select_variant(
+        self,
+        variants: List[Dict],
+        test_id: str,
+        visitor_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Seleciona uma variante baseada na distribuição.
+        
+        Veja `select_index`; aqui a tabela é obtida (e reaproveitada) a
+        partir da lista de variantes.
         
         Args:
             variants: Lista de variantes com distribuição
-            test_id: ID do teste (não usado, mantido para compatibilidade)
+            test_id: ID do teste
+            visitor_id: ID estável do visitante (opcional)
             
         Returns:
             Variante selecionada
         """
-        # Gerar valor aleatório entre 0 e 100
-        random_percentage = random.random() * 100
-        
-        cumulative = 0
-        for variant in variants:
-            cumulative += variant["distribution"]
-            if random_percentage <= cumulative:
-                return variant
-        
-        # Fallback para última variante
-        return variants[-1]
-
+        table = self.get_bucket_table(variants, test_id)
+        return variants[self.select_index(table, test_id, visitor_id)]
@@ -1,15 +1,200 @@
 """
 Armazenamento em memória para testes, impressões e conversões.
+
+Seguro para escritas concorrentes de várias threads (threadpool, executor
+das rotas, pipeline de impressões):
+
+- Definições de testes são copy-on-write: cada alteração publica um dict
+  novo (e o índice ordenado por testId) sob `_tests_lock`, e as leituras
+  usam o dict publicado, sem lock
+- Contadores e rollups ficam em um shard por thread, escrito apenas pela
+  thread dona sob o lock do próprio shard (sem disputa no caminho comum);
+  as leituras somam os shards sem lock. Os shards de threads encerradas
+  são incorporados a um shard de threads encerradas
+- Os logs de eventos (`EventLog`) são particionados por teste, com um
+  lock por partição mantido só durante o append das colunas
+
+Os eventos brutos de um teste podem ser descartados de uma vez
+(`delete_test_events`) e a retenção (`drop_events_before`) descarta
+segmentos inteiros e os buckets de rollup expirados. Essas operações e o
+`reset` apagam contagens dos shards de outras threads e, por isso, travam
+todos os shards (`_locked_shards`).
 """
-from datetime import datetime
-from typing import Dict, List, Optional
-from uuid import uuid4
+import bisect
+import math
+import threading
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from typing import Collection, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from event_log import EventBatch, EventLog, Interner, to_datetime
 
 
-# Estruturas de dados em memória
+# Estruturas de dados em memória (substituído a cada alteração, nunca alterado)
 tests: Dict[str, dict] = {}
-impressions: List[dict] = []
-conversions: List[dict] = []
+
+# Incrementada a cada alteração em `tests` (detecção barata de mudanças)
+config_version = 0
+# testId -> valor de `config_version` na última alteração daquele teste
+test_versions: Dict[str, int] = {}
+# Serializa as alterações de `tests`, `test_versions` e `config_version`
+_tests_lock = threading.Lock()
+
+
+class TestIndex(NamedTuple):
+    """testIds em ordem, no total e por status (listas nunca alteradas)"""
+
+    ids: List[str]
+    by_status: Dict[str, List[str]]
+
+
+# Índice da listagem paginada, publicado junto com `tests`
+test_index = TestIndex([], {})
+
+# Acima disso, uma publicação reordena o índice em vez de inserir um a um
+INDEX_REBUILD_THRESHOLD = 64
+
+# Eventos em formato colunar, particionados por teste (IDs de variante e
+# evento internados compartilhados entre os logs)
+interner = Interner()
+impressions = EventLog(interner)
+conversions = EventLog(interner, with_event=True)
+
+# Rollups por janela de tempo: (testId, variantId, granularidade) -> início do
+# bucket (epoch) -> contagem (impressões) ou contagem por evento (conversões)
+ROLLUP_GRANULARITIES: Dict[str, int] = {"minute": 60, "hour": 3600}
+
+
+class CounterShard:
+    """
+    Contadores por (testId, variantId) e rollups escritos por uma thread
+
+    A thread dona escreve sob `lock`, que só é disputado pelas exclusões
+    (`delete_test_events`, `drop_events_before`).
+    """
+
+    __slots__ = (
+        "lock",
+        "impression_counts",
+        "conversion_counts",
+        "conversion_event_counts",
+        "impression_rollups",
+        "conversion_rollups",
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.impression_counts: Dict[Tuple[str, str], int] = {}
+        self.conversion_counts: Dict[Tuple[str, str], int] = {}
+        self.conversion_event_counts: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self.impression_rollups: Dict[Tuple[str, str, str], Dict[int, int]] = {}
+        self.conversion_rollups: Dict[Tuple[str, str, str], Dict[int, Dict[str, int]]] = {}
+
+    def merge(self, other: "CounterShard") -> None:
+        """Soma as contagens de `other` neste shard"""
+        for key, count in list(other.impression_counts.items()):
+            self.impression_counts[key] = self.impression_counts.get(key, 0) + count
+        for key, count in list(other.conversion_counts.items()):
+            self.conversion_counts[key] = self.conversion_counts.get(key, 0) + count
+        for key, by_event in list(other.conversion_event_counts.items()):
+            _add_counts(self.conversion_event_counts.setdefault(key, {}), by_event)
+        for key, buckets in list(other.impression_rollups.items()):
+            _add_counts(self.impression_rollups.setdefault(key, {}), buckets)
+        for key, buckets in list(other.conversion_rollups.items()):
+            merged = self.conversion_rollups.setdefault(key, {})
+            for bucket, by_event in list(buckets.items()):
+                _add_counts(merged.setdefault(bucket, {}), by_event)
+
+    def clear(self) -> None:
+        self.impression_counts.clear()
+        self.conversion_counts.clear()
+        self.conversion_event_counts.clear()
+        self.impression_rollups.clear()
+        self.conversion_rollups.clear()
+
+
+def _add_counts(target: Dict, source: Dict) -> None:
+    for key, count in list(source.items()):
+        target[key] = target.get(key, 0) + count
+
+
+class _ThreadShard(threading.local):
+    """Shard da thread atual, registrado no primeiro acesso de cada thread"""
+
+    def __init__(self):
+        self.shard = CounterShard()
+        with _shards_lock:
+            _threads.append((threading.current_thread(), self.shard))
+            _publish_shards()
+
+
+# Contagens das threads já encerradas
+_retired = CounterShard()
+# (thread, shard) das threads que já escreveram
+_threads: List[Tuple[threading.Thread, CounterShard]] = []
+_shards_lock = threading.Lock()
+# Lista publicada para as leituras (substituída, nunca alterada)
+_shards: Tuple[CounterShard, ...] = (_retired,)
+
+
+def _publish_shards() -> None:
+    global _shards
+    _shards = (_retired,) + tuple(shard for _, shard in _threads)
+
+
+_local = _ThreadShard()
+
+
+def _read_shards() -> Tuple[CounterShard, ...]:
+    """
+    Shards a somar nas leituras.
+
+    Os shards de threads encerradas (ex.: threads ociosas do threadpool)
+    são somados a uma cópia do shard de threads encerradas, publicada
+    junto com a nova lista: uma leitura concorrente vê a lista antiga ou
+    a nova, nunca uma contagem pela metade.
+    """
+    global _retired
+    shards = _shards
+    if all(thread.is_alive() for thread, _ in _threads):
+        return shards
+    with _shards_lock:
+        finished = [shard for thread, shard in _threads if not thread.is_alive()]
+        if finished:
+            retired = CounterShard()
+            retired.merge(_retired)
+            for shard in finished:
+                retired.merge(shard)
+            _retired = retired
+            _threads[:] = [(thread, shard) for thread, shard in _threads if thread.is_alive()]
+            _publish_shards()
+        return _shards
+
+
+@contextmanager
+def _locked_shards() -> Iterator[Tuple[CounterShard, ...]]:
+    """
+    Trava todos os shards para apagar contagens de outras threads
+
+    Cada escritor faz o append no log e o incremento sob o lock do próprio
+    shard: com todos travados, nenhum incremento lido antes da exclusão
+    regrava o valor antigo depois dela, e nenhum evento descartado do log
+    é contado depois. `_shards_lock` impede que uma thread nova registre
+    um shard no meio da operação.
+    """
+    with _shards_lock, ExitStack() as stack:
+        shards = _shards
+        for shard in shards:
+            stack.enter_context(shard.lock)
+        yield shards
+
+
+def _merged() -> CounterShard:
+    """Soma de todos os shards"""
+    merged = CounterShard()
+    for shard in _read_shards():
+        merged.merge(shard)
+    return merged
 
 
 def get_test(test_id: str) -> Optional[dict]:
@@ -17,58 +202,580 @@ def get_test(test_id: str) -> Optional[dict]:
     return tests.get(test_id)
 
 
-def save_test(test_id: str, name: str, variants: list, status: str = "active"):
-    """Salva ou atualiza um teste"""
-    tests[test_id] = {
+def _build_index(new_tests: Dict[str, dict]) -> TestIndex:
+    """Índice completo, ordenando todos os testIds"""
+    ids = sorted(new_tests)
+    by_status: Dict[str, List[str]] = {}
+    for test_id in ids:
+        by_status.setdefault(new_tests[test_id]["status"], []).append(test_id)
+    return TestIndex(ids, by_status)
+
+
+def _update_index(new_tests: Dict[str, dict], changed: List[str]) -> TestIndex:
+    """
+    Índice com os testes alterados, a partir do publicado
+
+    Cada lista tocada é copiada uma vez e recebe as inserções e remoções
+    por busca binária; com muitas alterações, reordena tudo.
+    """
+    if len(changed) > INDEX_REBUILD_THRESHOLD:
+        return _build_index(new_tests)
+    ids = test_index.ids
+    by_status = dict(test_index.by_status)
+    copied = set()
+
+    def writable(status: str) -> List[str]:
+        if status not in copied:
+            by_status[status] = list(by_status.get(status, ()))
+            copied.add(status)
+        return by_status[status]
+
+    for test_id in changed:
+        old = tests.get(test_id)
+        new = new_tests.get(test_id)
+        old_status = old["status"] if old is not None else None
+        new_status = new["status"] if new is not None else None
+        if old is None and new is not None:
+            if ids is test_index.ids:
+                ids = list(ids)
+            bisect.insort(ids, test_id)
+        if old_status == new_status:
+            continue
+        if old_status is not None:
+            members = writable(old_status)
+            del members[bisect.bisect_left(members, test_id)]
+            if not members:
+                del by_status[old_status]
+                copied.discard(old_status)
+        if new_status is not None:
+            bisect.insort(writable(new_status), test_id)
+    return TestIndex(ids, by_status)
+
+
+def _publish_tests(
+    new_tests: Dict[str, dict],
+    changed: List[str],
+    index: Optional[TestIndex] = None
+) -> None:
+    """
+    Publica um novo dict de testes (chamada com `_tests_lock`).
+
+    Os testes vêm antes do índice e das versões: quem lê um índice ou uma
+    versão nova sempre encontra os testes correspondentes.
+    """
+    global tests, test_index, config_version
+    if index is None:
+        index = _update_index(new_tests, changed)
+    tests = new_tests
+    test_index = index
+    version = config_version + 1
+    for test_id in changed:
+        test_versions[test_id] = version
+    config_version = version
+
+
+def make_test(
+    test_id: str,
+    name: str,
+    variants: list,
+    status: str = "active",
+    start_at: Optional[float] = None,
+    end_at: Optional[float] = None,
+    allocation: float = 100.0
+) -> dict:
+    """Monta a definição armazenada de um teste (início/fim em epoch UTC)"""
+    return {
         "testId": test_id,
         "name": name,
         "variants": variants,
-        "status": status
+        "status": status,
+        "startAt": start_at,
+        "endAt": end_at,
+        "allocation": allocation
     }
 
 
-def add_impression(test_id: str, variant_id: str):
+def copy_test(test: dict) -> dict:
+    """Definição armazenada a partir de um dict de teste (campos de agenda opcionais)"""
+    return make_test(
+        test["testId"],
+        test["name"],
+        test["variants"],
+        test["status"],
+        test.get("startAt"),
+        test.get("endAt"),
+        test.get("allocation", 100.0)
+    )
+
+
+def save_test(
+    test_id: str,
+    name: str,
+    variants: list,
+    status: str = "active",
+    start_at: Optional[float] = None,
+    end_at: Optional[float] = None,
+    allocation: float = 100.0
+):
+    """Salva ou atualiza um teste"""
+    test = make_test(test_id, name, variants, status, start_at, end_at, allocation)
+    with _tests_lock:
+        updated = dict(tests)
+        updated[test_id] = test
+        _publish_tests(updated, [test_id])
+
+
+def save_tests(batch: List[dict]) -> None:
+    """Salva ou atualiza vários testes como uma única versão"""
+    with _tests_lock:
+        updated = dict(tests)
+        for test in batch:
+            updated[test["testId"]] = copy_test(test)
+        _publish_tests(updated, list(dict.fromkeys(test["testId"] for test in batch)))
+
+
+def replace_tests(new_tests: Dict[str, dict]) -> None:
+    """Substitui todas as definições de testes de uma vez"""
+    with _tests_lock:
+        changed = [
+            test_id for test_id, test in new_tests.items()
+            if tests.get(test_id) != test
+        ]
+        removed = set(test_versions) - set(new_tests)
+        for test_id in removed:
+            del test_versions[test_id]
+        _publish_tests(new_tests, changed, _build_index(new_tests) if removed else None)
+
+
+def get_config_version() -> int:
+    """Retorna a versão atual das definições de testes"""
+    return config_version
+
+
+def get_test_version(test_id: str) -> int:
+    """Retorna a versão de um teste (0 se não existir)"""
+    return test_versions.get(test_id, 0)
+
+
+def _count_impression(
+    shard: CounterShard, test_id: str, variant_id: str, timestamp: float
+) -> None:
+    """Atualiza contadores e rollups de uma impressão no shard da thread"""
+    key = (test_id, variant_id)
+    counts = shard.impression_counts
+    counts[key] = counts.get(key, 0) + 1
+    rollups = shard.impression_rollups
+    for granularity, step in ROLLUP_GRANULARITIES.items():
+        buckets = rollups.get((test_id, variant_id, granularity))
+        if buckets is None:
+            buckets = rollups.setdefault((test_id, variant_id, granularity), {})
+        bucket = int(timestamp // step) * step
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+
+
+def _count_conversion(
+    shard: CounterShard, test_id: str, variant_id: str, event: str, timestamp: float
+) -> None:
+    """Atualiza contadores e rollups de uma conversão no shard da thread"""
+    key = (test_id, variant_id)
+    counts = shard.conversion_counts
+    counts[key] = counts.get(key, 0) + 1
+    by_event = shard.conversion_event_counts.setdefault(key, {})
+    by_event[event] = by_event.get(event, 0) + 1
+    rollups = shard.conversion_rollups
+    for granularity, step in ROLLUP_GRANULARITIES.items():
+        buckets = rollups.get((test_id, variant_id, granularity))
+        if buckets is None:
+            buckets = rollups.setdefault((test_id, variant_id, granularity), {})
+        bucket = int(timestamp // step) * step
+        by_event = buckets.get(bucket)
+        if by_event is None:
+            by_event = buckets.setdefault(bucket, {})
+        by_event[event] = by_event.get(event, 0) + 1
+
+
+def add_impression(test_id: str, variant_id: str, timestamp: Optional[float] = None):
     """Adiciona uma impressão"""
-    impression = {
-        "id": str(uuid4()),
+    shard = _local.shard
+    with shard.lock:
+        event_id, timestamp = impressions.append(test_id, variant_id, timestamp=timestamp)
+        _count_impression(shard, test_id, variant_id, timestamp)
+    return {
+        "id": str(event_id),
         "testId": test_id,
         "variantId": variant_id,
-        "timestamp": datetime.utcnow()
+        "timestamp": to_datetime(timestamp)
     }
-    impressions.append(impression)
-    return impression
 
 
-def add_conversion(test_id: str, variant_id: str, event: str):
+def add_impressions(events: List[Tuple[str, str, float]]) -> None:
+    """Adiciona um lote de impressões (test_id, variant_id, timestamp)"""
+    shard = _local.shard
+    with shard.lock:
+        impressions.extend(events)
+        for test_id, variant_id, timestamp in events:
+            _count_impression(shard, test_id, variant_id, timestamp)
+
+
+def add_conversion(
+    test_id: str,
+    variant_id: str,
+    event: str,
+    timestamp: Optional[float] = None
+):
     """Adiciona uma conversão"""
-    conversion = {
-        "id": str(uuid4()),
+    shard = _local.shard
+    with shard.lock:
+        event_id, timestamp = conversions.append(test_id, variant_id, event, timestamp)
+        _count_conversion(shard, test_id, variant_id, event, timestamp)
+    return {
+        "id": str(event_id),
         "testId": test_id,
         "variantId": variant_id,
         "event": event,
-        "timestamp": datetime.utcnow()
+        "timestamp": to_datetime(timestamp)
     }
-    conversions.append(conversion)
-    return conversion
+
+
+def add_conversions(events: List[Tuple[str, str, str, float]]) -> None:
+    """Adiciona um lote de conversões (test_id, variant_id, event, timestamp)"""
+    shard = _local.shard
+    with shard.lock:
+        conversions.extend(events)
+        for test_id, variant_id, event, timestamp in events:
+            _count_conversion(shard, test_id, variant_id, event, timestamp)
 
 
 def count_impressions(test_id: str, variant_id: str) -> int:
     """Conta impressões para um teste e variante específicos"""
-    return sum(
-        1 for imp in impressions
-        if imp["testId"] == test_id and imp["variantId"] == variant_id
-    )
+    key = (test_id, variant_id)
+    return sum(shard.impression_counts.get(key, 0) for shard in _read_shards())
 
 
 def count_conversions(test_id: str, variant_id: str) -> int:
     """Conta conversões para um teste e variante específicos"""
-    return sum(
-        1 for conv in conversions
-        if conv["testId"] == test_id and conv["variantId"] == variant_id
-    )
+    key = (test_id, variant_id)
+    return sum(shard.conversion_counts.get(key, 0) for shard in _read_shards())
+
+
+def count_conversions_by_event(test_id: str, variant_id: str) -> Dict[str, int]:
+    """Conta conversões por nome de evento para um teste e variante"""
+    key = (test_id, variant_id)
+    counts: Dict[str, int] = {}
+    for shard in _read_shards():
+        by_event = shard.conversion_event_counts.get(key)
+        if by_event:
+            _add_counts(counts, by_event)
+    return counts
+
+
+def get_rollups(
+    test_id: str,
+    variant_id: str,
+    granularity: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None
+) -> List[Tuple[int, int, Dict[str, int]]]:
+    """
+    Retorna os buckets não vazios cujo início está em [start, end).
+
+    Returns:
+        Lista ordenada de (início do bucket, impressões, conversões por evento)
+    """
+    step = ROLLUP_GRANULARITIES[granularity]
+    key = (test_id, variant_id, granularity)
+    impression_buckets: Dict[int, int] = {}
+    conversion_buckets: Dict[int, Dict[str, int]] = {}
+    for shard in _read_shards():
+        buckets = shard.impression_rollups.get(key)
+        if buckets:
+            _add_counts(impression_buckets, buckets)
+        buckets = shard.conversion_rollups.get(key)
+        if buckets:
+            for bucket, by_event in list(buckets.items()):
+                _add_counts(conversion_buckets.setdefault(bucket, {}), by_event)
+
+    if start is not None and end is not None:
+        first = math.ceil(start / step) * step  # primeiro bucket >= start
+        window = range(first, math.ceil(end), step)
+    else:
+        window = None
+    existing = len(impression_buckets) + len(conversion_buckets)
+
+    if window is not None and len(window) <= existing:
+        # Janela pequena: consulta bucket a bucket
+        candidates = window
+    else:
+        candidates = sorted(set(impression_buckets) | set(conversion_buckets))
+
+    result = []
+    for bucket in candidates:
+        if start is not None and bucket < start:
+            continue
+        if end is not None and bucket >= end:
+            continue
+        impressions_count = impression_buckets.get(bucket, 0)
+        by_event = conversion_buckets.get(bucket)
+        if impressions_count or by_event:
+            result.append((bucket, impressions_count, by_event or {}))
+    return result
+
+
+def read_events(
+    kind: str,
+    test_id: str,
+    position: int,
+    limit: int,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    events: Optional[Collection[str]] = None
+) -> Tuple[EventBatch, Optional[int]]:
+    """
+    Lê os eventos brutos de um teste em lotes ("impression" ou "conversion").
+
+    Returns:
+        Tupla (lote, posição da próxima leitura ou None no fim do log)
+    """
+    log = conversions if kind == "conversion" else impressions
+    return log.read(test_id, position, limit, start, end, events)
+
+
+def delete_test_events(test_id: str) -> int:
+    """
+    Descarta os eventos brutos, contadores e rollups de um teste
+
+    Só a partição do teste e as chaves das variantes dele são tocadas: as
+    definidas no teste e as que já tiveram eventos registrados. Os shards
+    ficam travados durante a exclusão, então um evento concorrente entra
+    inteiro antes (e é descartado) ou depois (e é mantido).
+
+    Returns:
+        Quantidade de eventos brutos descartados
+    """
+    with _locked_shards() as shards:
+        variants = set(impressions.variants(test_id)) | set(conversions.variants(test_id))
+        test = tests.get(test_id)
+        if test is not None:
+            variants.update(variant["variantId"] for variant in test["variants"])
+        dropped = impressions.drop_test(test_id) + conversions.drop_test(test_id)
+        _drop_test_counts(shards, test_id, variants)
+    return dropped
+
+
+def _drop_test_counts(
+    shards: Tuple[CounterShard, ...], test_id: str, variants: Collection[str]
+) -> None:
+    for shard in shards:
+        for variant_id in variants:
+            key = (test_id, variant_id)
+            shard.impression_counts.pop(key, None)
+            shard.conversion_counts.pop(key, None)
+            shard.conversion_event_counts.pop(key, None)
+            for granularity in ROLLUP_GRANULARITIES:
+                shard.impression_rollups.pop((test_id, variant_id, granularity), None)
+                shard.conversion_rollups.pop((test_id, variant_id, granularity), None)
+
+
+def _prune_buckets(buckets: Dict[int, object], latest: int) -> int:
+    """
+    Remove os buckets que começam até `latest`, do início do dict
+
+    Os buckets são criados em ordem de tempo, então a varredura para no
+    primeiro bucket ainda válido. Um bucket antigo criado fora de ordem
+    (evento atrasado) sai quando os anteriores a ele expirarem.
+    """
+    stale = []
+    for bucket in list(buckets):
+        if bucket > latest:
+            break
+        stale.append(bucket)
+    for bucket in stale:
+        buckets.pop(bucket, None)
+    return len(stale)
+
+
+def drop_events_before(cutoff: float) -> Dict[str, int]:
+    """
+    Retenção: descarta eventos e buckets de rollup anteriores a `cutoff`
+
+    Os segmentos de eventos saem inteiros, quando todos os seus eventos
+    são anteriores a `cutoff`; os buckets saem quando terminam até
+    `cutoff`. Os contadores de todo o período são mantidos.
+
+    Returns:
+        Quantidade de segmentos, eventos e buckets descartados
+    """
+    with _locked_shards() as shards:
+        segments, events = impressions.drop_before(cutoff)
+        conversion_segments, conversion_events = conversions.drop_before(cutoff)
+        buckets = 0
+        for shard in shards:
+            for rollups in (shard.impression_rollups, shard.conversion_rollups):
+                for (_, _, granularity), by_bucket in list(rollups.items()):
+                    step = ROLLUP_GRANULARITIES[granularity]
+                    buckets += _prune_buckets(by_bucket, math.floor(cutoff - step))
+    return {
+        "segments": segments + conversion_segments,
+        "events": events + conversion_events,
+        "rollupBuckets": buckets,
+    }
 
 
 def get_all_tests() -> List[dict]:
     """Retorna todos os testes"""
     return list(tests.values())
 
+
+def list_tests(
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    status: Optional[str] = None,
+    name: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Página de testes em ordem de testId, a partir do índice ordenado
+
+    A página começa logo após `cursor` (o último testId da página
+    anterior). `status` usa o índice por status; `name` filtra por trecho
+    do nome, sem diferenciar maiúsculas, percorrendo o índice só até
+    completar a página.
+
+    Returns:
+        Tupla (testes da página, cursor da próxima página ou None)
+    """
+    # Índice antes dos testes: todo ID do índice está no dict publicado
+    index = test_index
+    current = tests
+    ids = index.ids if status is None else index.by_status.get(status, [])
+    position = bisect.bisect_right(ids, cursor) if cursor is not None else 0
+    needle = name.casefold() if name else None
+
+    page: List[dict] = []
+    for test_id in islice(ids, position, None):
+        test = current.get(test_id)
+        if (
+            test is None
+            or (status is not None and test["status"] != status)
+            or (needle is not None and needle not in test["name"].casefold())
+        ):
+            continue
+        if len(page) == limit:
+            # Há ao menos mais um teste depois da página
+            return page, page[-1]["testId"]
+        page.append(test)
+    return page, None
+
+
+def export_state() -> dict:
+    """
+    Exporta testes, contadores agregados e a numeração dos eventos de cada
+    teste (sem os eventos brutos)
+    """
+    merged = _merged()
+    return {
+        "tests": list(tests.values()),
+        "nextEventIds": {
+            "impressions": impressions.next_ids(),
+            "conversions": conversions.next_ids(),
+        },
+        "impressions": [
+            [test_id, variant_id, count]
+            for (test_id, variant_id), count in merged.impression_counts.items()
+        ],
+        "conversions": [
+            [test_id, variant_id, event, count]
+            for (test_id, variant_id), by_event in merged.conversion_event_counts.items()
+            for event, count in by_event.items()
+        ],
+        "impressionRollups": [
+            [test_id, variant_id, granularity, bucket, count]
+            for (test_id, variant_id, granularity), buckets in merged.impression_rollups.items()
+            for bucket, count in buckets.items()
+        ],
+        "conversionRollups": [
+            [test_id, variant_id, granularity, bucket, event, count]
+            for (test_id, variant_id, granularity), buckets in merged.conversion_rollups.items()
+            for bucket, by_event in buckets.items()
+            for event, count in by_event.items()
+        ],
+    }
+
+
+def import_state(state: dict) -> None:
+    """
+    Restaura testes e contadores exportados por `export_state`
+
+    Os contadores vão para o shard da thread atual, somados aos já existentes
+    (o estado é importado sobre um armazenamento vazio). A numeração dos
+    eventos continua da exportada, sem reutilizar IDs já entregues.
+    """
+    with _tests_lock:
+        updated = dict(tests)
+        for test in state.get("tests", []):
+            # Snapshots anteriores à agenda não têm startAt/endAt/allocation
+            updated[test["testId"]] = copy_test(test)
+        _publish_tests(updated, [test["testId"] for test in state.get("tests", [])])
+    imported = CounterShard()
+    for test_id, variant_id, count in state.get("impressions", []):
+        imported.impression_counts[(test_id, variant_id)] = count
+    for test_id, variant_id, event, count in state.get("conversions", []):
+        key = (test_id, variant_id)
+        imported.conversion_counts[key] = imported.conversion_counts.get(key, 0) + count
+        imported.conversion_event_counts.setdefault(key, {})[event] = count
+    for test_id, variant_id, granularity, bucket, count in state.get("impressionRollups", []):
+        imported.impression_rollups.setdefault((test_id, variant_id, granularity), {})[bucket] = count
+    for test_id, variant_id, granularity, bucket, event, count in state.get(
+        "conversionRollups", []
+    ):
+        buckets = imported.conversion_rollups.setdefault((test_id, variant_id, granularity), {})
+        buckets.setdefault(bucket, {})[event] = count
+    next_ids = state.get("nextEventIds", {})
+    impressions.reserve_ids(next_ids.get("impressions", {}))
+    conversions.reserve_ids(next_ids.get("conversions", {}))
+    shard = _local.shard
+    with shard.lock:
+        shard.merge(imported)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Quantidade de itens e memória estimada (bytes) das estruturas em memória"""
+    merged = _merged()
+    return {
+        "items": {
+            "tests": len(tests),
+            "impressions": len(impressions),
+            "conversions": len(conversions),
+            "interned_ids": len(interner),
+            "event_segments": impressions.segment_count() + conversions.segment_count(),
+            "counters": len(merged.impression_counts) + len(merged.conversion_event_counts),
+            "rollup_buckets": (
+                sum(len(buckets) for buckets in merged.impression_rollups.values())
+                + sum(len(buckets) for buckets in merged.conversion_rollups.values())
+            ),
+            "counter_shards": len(_read_shards()),
+        },
+        "bytes": {
+            "impressions": impressions.nbytes(),
+            "conversions": conversions.nbytes(),
+            "interned_ids": interner.nbytes(),
+        },
+    }
+
+
+def reset() -> None:
+    """
+    Limpa todo o estado em memória (testes, eventos e contadores)
+
+    Os shards ficam travados durante a limpeza, como em `delete_test_events`:
+    um evento concorrente é gravado (log, IDs internados e contadores)
+    inteiro antes dela ou inteiro depois.
+    """
+    with _tests_lock:
+        test_versions.clear()
+        _publish_tests({}, [], TestIndex([], {}))
+    with _locked_shards() as shards:
+        impressions.clear()
+        conversions.clear()
+        interner.clear()
+        for shard in shards:
+            shard.clear()
@@ -0,0 +1,188 @@
+"""
+Contagens exatas do armazenamento em memória sob escritas concorrentes
+
+Cada cenário roda threads escritoras de vida curta (os shards delas são
+incorporados ao shard de threads encerradas no meio da execução) junto com
+uma operação concorrente. As contagens finais são comparadas com o total
+escrito ou, quando a operação descarta eventos, com o próprio log: o log,
+os contadores e os rollups precisam concordar exatamente.
+"""
+import sys
+import threading
+from collections import Counter
+from typing import Callable, Dict, List
+
+import pytest
+
+import storage
+
+
+TIMESTAMP = 1_700_000_000.0
+VARIANTS = ("A", "B")
+WRITERS = 8
+EVENTS_PER_WRITER = 400
+
+
+@pytest.fixture(autouse=True)
+def clean_storage():
+    interval = sys.getswitchinterval()
+    # Trocas de thread frequentes para intercalar escritas e operações
+    sys.setswitchinterval(1e-5)
+    storage.reset()
+    yield
+    sys.setswitchinterval(interval)
+    storage.reset()
+
+
+def write(test_id: str, count: int, batch: bool = False) -> None:
+    if batch:
+        storage.add_impressions(
+            [(test_id, VARIANTS[i % 2], TIMESTAMP + i) for i in range(count)]
+        )
+        storage.add_conversions(
+            [(test_id, VARIANTS[i % 2], "click", TIMESTAMP + i) for i in range(count)]
+        )
+        return
+    for i in range(count):
+        storage.add_impression(test_id, VARIANTS[i % 2], TIMESTAMP + i)
+        storage.add_conversion(test_id, VARIANTS[i % 2], "click", TIMESTAMP + i)
+
+
+def run_concurrently(writers: List[Callable[[], None]], operation: Callable[[], None]) -> None:
+    """
+    Roda as escritoras em ondas de threads que encerram no meio da execução,
+    com `operation` em outra thread assim que a primeira onda começa
+    """
+    start = threading.Barrier(2)
+
+    def first_wave_started():
+        start.wait()
+        operation()
+
+    operator = threading.Thread(target=first_wave_started)
+    operator.start()
+    waves = [writers[i:i + WRITERS // 2] for i in range(0, len(writers), WRITERS // 2)]
+    for number, wave in enumerate(waves):
+        threads = [threading.Thread(target=target) for target in wave]
+        for thread in threads:
+            thread.start()
+        if number == 0:
+            start.wait()
+        for thread in threads:
+            thread.join()
+        # Leitura entre ondas: incorpora os shards das threads encerradas
+        storage.count_impressions("t", "A")
+    operator.join()
+
+
+def logged(test_id: str) -> Dict[str, Counter]:
+    """Eventos de cada variante presentes nos logs"""
+    result = {"impressions": Counter(), "conversions": Counter()}
+    for kind, log in (("impressions", storage.impressions), ("conversions", storage.conversions)):
+        for row in log:
+            if row["testId"] == test_id:
+                result[kind][row["variantId"]] += 1
+    return result
+
+
+def assert_consistent(test_id: str) -> Dict[str, Counter]:
+    """Contadores e rollups iguais aos eventos presentes nos logs"""
+    events = logged(test_id)
+    for variant_id in VARIANTS:
+        impressions = events["impressions"][variant_id]
+        conversions = events["conversions"][variant_id]
+        assert storage.count_impressions(test_id, variant_id) == impressions
+        assert storage.count_conversions(test_id, variant_id) == conversions
+        assert storage.count_conversions_by_event(test_id, variant_id) == (
+            {"click": conversions} if conversions else {}
+        )
+        for granularity in storage.ROLLUP_GRANULARITIES:
+            rollups = storage.get_rollups(test_id, variant_id, granularity)
+            assert sum(count for _, count, _ in rollups) == impressions
+            assert sum(by_event.get("click", 0) for _, _, by_event in rollups) == conversions
+    return events
+
+
+def test_threads_that_exit_mid_run_keep_their_counts():
+    writers = [
+        (lambda batch=bool(i % 2): write("t", EVENTS_PER_WRITER, batch))
+        for i in range(WRITERS * 2)
+    ]
+    stop = threading.Event()
+
+    def read_until_stopped():
+        while not stop.is_set():
+            storage.count_impressions("t", "A")
+            storage.get_rollups("t", "B", "minute")
+
+    reader = threading.Thread(target=read_until_stopped)
+    reader.start()
+    run_concurrently(writers, lambda: None)
+    stop.set()
+    reader.join()
+
+    expected = WRITERS * EVENTS_PER_WRITER
+    events = assert_consistent("t")
+    assert events["impressions"] == {"A": expected, "B": expected}
+    assert events["conversions"] == {"A": expected, "B": expected}
+    # Sobram o shard de threads encerradas e os das threads ainda vivas
+    assert storage.stats()["items"]["counter_shards"] <= 3
+
+
+def test_delete_test_events_during_writes():
+    writers = [
+        (lambda test_id=test_id: write(test_id, EVENTS_PER_WRITER))
+        for _ in range(WRITERS)
+        for test_id in ("t", "kept")
+    ]
+    deleted: List[int] = []
+
+    def delete_repeatedly():
+        for _ in range(20):
+            deleted.append(storage.delete_test_events("t"))
+
+    run_concurrently(writers, delete_repeatedly)
+
+    expected = WRITERS * EVENTS_PER_WRITER // 2
+    kept = assert_consistent("kept")
+    assert kept["impressions"] == {"A": expected, "B": expected}
+    assert kept["conversions"] == {"A": expected, "B": expected}
+    remaining = assert_consistent("t")
+    written = 2 * WRITERS * EVENTS_PER_WRITER
+    assert sum(deleted) + sum(remaining["impressions"].values()) + sum(
+        remaining["conversions"].values()
+    ) == written
+
+
+def test_reset_during_writes():
+    writers = [(lambda: write("t", EVENTS_PER_WRITER)) for _ in range(WRITERS * 2)]
+
+    def reset_repeatedly():
+        for _ in range(10):
+            storage.reset()
+
+    run_concurrently(writers, reset_repeatedly)
+
+    events = assert_consistent("t")
+    # Nenhum evento gravado com o ID internado de antes de um reset
+    assert set(events["impressions"]) <= set(VARIANTS)
+    assert set(events["conversions"]) <= set(VARIANTS)
+
+
+def test_import_state_during_writes():
+    storage.save_test("t", "Teste", [{"variantId": v, "name": v} for v in VARIANTS])
+    write("t", 100)
+    state = storage.export_state()
+    storage.reset()
+
+    writers = [(lambda: write("t", EVENTS_PER_WRITER)) for _ in range(WRITERS)]
+    run_concurrently(writers, lambda: storage.import_state(state))
+
+    expected = WRITERS * EVENTS_PER_WRITER // 2 + 50
+    for variant_id in VARIANTS:
+        assert storage.count_impressions("t", variant_id) == expected
+        assert storage.count_conversions("t", variant_id) == expected
+        for granularity in storage.ROLLUP_GRANULARITIES:
+            rollups = storage.get_rollups("t", variant_id, granularity)
+            assert sum(count for _, count, _ in rollups) == expected
+    assert storage.get_test("t") is not None